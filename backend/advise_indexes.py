@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Explains the product list queries for every combination of filters, and suggests indexes for the
+ones that scan the collection, sort in memory, or examine many more products than they return.
+
+Usage (from the backend directory):
+    ./advise_indexes.py                         # reports the queries with problems
+    ./advise_indexes.py --all                   # reports the plan of every query
+    ./advise_indexes.py --drop-superseded       # also lists the superseded indexes (dry run)
+    ./advise_indexes.py --drop-superseded --yes # and drops them
+"""
+
+import argparse
+
+from src.db.db_init import init_db
+from src.models.product import Product
+from src.utils.index_advisor import advise, undeclared_indexes, superseded_indexes, \
+    drop_superseded_indexes
+
+
+def parse_args():
+    parser= argparse.ArgumentParser(description= "Suggest indexes for the product list queries.")
+    parser.add_argument("--all", action= "store_true",
+        help= "also report the queries without problems")
+    parser.add_argument("--limit", type= int, default= 20,
+        help= "products per page of the explained page queries (default: 20)")
+    parser.add_argument("--drop-superseded", action= "store_true",
+        help= "list the product indexes that are superseded by a declared index, or retired "
+        "from the Product model, to be dropped with --yes")
+    parser.add_argument("--yes", action= "store_true",
+        help= "with --drop-superseded, drop the listed indexes instead of only listing them")
+    return parser.parse_args()
+
+
+def main():
+    args= parse_args()
+    init_db()
+
+    if args.drop_superseded:
+        drop_superseded(args.yes)
+
+    reports= advise(limit= args.limit)
+    if not reports:
+        print("No products to explain the queries on")
+        return
+
+    suggestions= set()
+    for report in reports:
+        if not report["problems"] and not args.all:
+            continue
+        print(f"{'+'.join(report['filters'])} ({report['query']}): " \
+            f"{' <- '.join(report['stages'])}, index {report['index']}, " \
+            f"{report['keys_examined']} keys and {report['docs_examined']} documents examined, " \
+            f"{report['returned']} returned")
+        for problem in report["problems"]:
+            print(f"    {problem}")
+        if report["problems"]:
+            exists= " (an index starting with these keys exists)" if report["exists"] else ""
+            print(f"    suggested index: {report['suggestion']}{exists}")
+            if not report["exists"]:
+                suggestions.add(report["suggestion"])
+
+    problems= sum(1 for report in reports if report["problems"])
+    print(f"\n{problems} of {len(reports)} queries have problems")
+    for suggestion in sorted(suggestions):
+        print(f"    {suggestion},")
+
+
+def drop_superseded(confirmed: bool):
+    """
+    Lists the superseded product indexes, and drops them if confirmed. Undeclared indexes that
+    are not superseded, e.g. created by hand, are listed as kept.
+    """
+    collection= Product._get_collection()  #pylint: disable=no-member
+    superseded= superseded_indexes(collection)
+    for name, key in undeclared_indexes(collection).items():
+        if name not in superseded:
+            print(f"Keeping index {name} {key}: not declared, but not superseded either")
+    if not superseded:
+        print("No superseded indexes")
+    elif not confirmed:
+        for name in superseded:
+            print(f"Superseded index {name}")
+        print("Dry run, run again with --yes to drop them")
+    else:
+        for name in drop_superseded_indexes(collection):
+            print(f"Dropped superseded index {name}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Load benchmark of the product endpoints, to compare the WSGI and ASGI stacks.
+
+Opens a number of keep-alive connections to a running server, and sends GET requests on each
+of them, one after the other, for a fixed duration. Reports the requests per second, and the
+median and 99th percentile latencies.
+
+Start each stack with the same number of worker processes, against the same database, e.g.
+
+    gunicorn src.wsgi:application --workers 4 --threads 16 --bind 127.0.0.1:8000
+    uvicorn src.asgi:application --workers 4 --port 8001 --no-access-log
+
+then run this script against both, with high concurrency, e.g.
+
+    ./benchmarks/load.py http://127.0.0.1:8000 http://127.0.0.1:8001 --concurrency 256
+
+Page caches are per process, so the listing paths default to a mix that includes cache misses
+(filters with varying values). Only the Python standard library is used.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS= (
+    "/products?limit=50&fields=name,price,quantity",
+    "/products?limit=50&price_less_than_e={n}",
+    "/products?limit=20&include_total=false&quantity_greater_than_e={n}",
+)
+
+
+async def fetch(reader, writer, host: str, path: str)-> tuple:
+    """
+    Sends a GET request on an open connection, and reads the whole response.
+
+    Returns:
+        tuple (status code of the response, whether the connection can be reused).
+    """
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n" \
+        .encode())
+    await writer.drain()
+
+    status_line= await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server")
+    headers= {}
+    while (line:= await reader.readline()) not in (b"\r\n", b""):
+        name, _, value= line.decode("latin-1").partition(":")
+        headers[name.strip().lower()]= value.strip()
+
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding")== "chunked":
+        while True:
+            size= int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size+ 2)
+            if size== 0:
+                break
+    else:
+        await reader.read()
+
+    keep_alive= status_line.startswith(b"HTTP/1.1") and headers.get("connection")!= "close" \
+        and ("content-length" in headers or "transfer-encoding" in headers)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def worker(url, paths: list, deadline: float, latencies: list, errors: list):
+    """
+    Sends requests on one connection until the deadline, reconnecting if it is closed.
+    """
+    port= url.port or 80
+    reader= writer= None
+    while time.monotonic()< deadline:
+        path= random.choice(paths).format(n= random.randint(1, 5000))
+        try:
+            if writer is None:
+                reader, writer= await asyncio.open_connection(url.hostname, port)
+            started= time.monotonic()
+            status, keep_alive= await fetch(reader, writer, url.netloc, path)
+            latencies.append(time.monotonic()- started)
+            if status>= 500:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                reader= writer= None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader= writer= None
+    if writer is not None:
+        writer.close()
+
+
+async def run(base_url: str, paths: list, concurrency: int, duration: float)-> dict:
+    """
+    Runs the benchmark against one server.
+
+    Returns:
+        dict with the number of requests and errors, requests per second, and the p50 and p99
+        latencies in milliseconds.
+    """
+    url= urlsplit(base_url)
+    latencies, errors= [], []
+    started= time.monotonic()
+    await asyncio.gather(*(
+        worker(url, paths, started+ duration, latencies, errors) for _ in range(concurrency)
+    ))
+    elapsed= time.monotonic()- started
+
+    quantiles= statistics.quantiles(latencies, n= 100) if len(latencies)> 1 else [0]* 99
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies)/ elapsed,
+        "p50": quantiles[49]* 1000,
+        "p99": quantiles[98]* 1000,
+    }
+
+
+def main():
+    parser= argparse.ArgumentParser(description= "Compares the throughput of running servers.")
+    parser.add_argument("urls", nargs= "+", help= "base URLs of the servers, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type= int, default= 256, help= "number of connections")
+    parser.add_argument("--duration", type= float, default= 30, help= "seconds per server")
+    parser.add_argument("--warmup", type= float, default= 5, help= "seconds of warmup per server")
+    parser.add_argument("--path", action= "append", dest= "paths",
+        help= "path to request, {n} is replaced by a random number (can be repeated)")
+    args= parser.parse_args()
+    paths= args.paths or list(DEFAULT_PATHS)
+
+    print(f"{'server':<32}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for base_url in args.urls:
+        if args.warmup:
+            asyncio.run(run(base_url, paths, args.concurrency, args.warmup))
+        result= asyncio.run(run(base_url, paths, args.concurrency, args.duration))
+        print(f"{base_url:<32}{result['requests']:>10}{result['errors']:>8}" \
+            f"{result['rps']:>10.1f}{result['p50']:>9.1f}{result['p99']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
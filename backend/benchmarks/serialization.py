@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for product response serialization.
+
+Compares the old path, where every Document is encoded with to_json(), parsed back with
+json.loads() and encoded again by JsonResponse, with the single pass json_response renderer,
+both for Documents and for the raw documents returned by the read-only (as_pymongo) path.
+No database is needed, the products are built in memory.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization [page size] [repetitions]
+"""
+
+import json
+import os
+import sys
+import timeit
+import warnings
+
+import django
+from bson import ObjectId
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.settings")
+django.setup()
+
+#pylint: disable=wrong-import-position
+from django.http import JsonResponse
+from src.models.product import Product
+from src.utils.response import json_response
+
+warnings.simplefilter("ignore", DeprecationWarning)  # to_json() without json_options
+
+
+def make_products(count: int)-> list:
+    """Builds count unsaved products, with ids assigned as if they were fetched."""
+    products= []
+    for i in range(count):
+        product= Product(
+            name= f"Product {i}",
+            price= 100+ i,
+            brand= "Brand",
+            quantity= i% 50,
+            description= "x"* 250,
+            category= "Electronics",
+        )
+        product.id= ObjectId()
+        products.append(product)
+    return products
+
+
+def old_path(products: list)-> bytes:
+    return JsonResponse({"data": [json.loads(product.to_json()) for product in products]}).content
+
+
+def new_path(products: list)-> bytes:
+    return json_response({"data": products}).content
+
+
+def raw_path(documents: list)-> bytes:
+    return json_response({"data": documents}).content
+
+
+def main():
+    page_size= int(sys.argv[1]) if len(sys.argv)> 1 else 250
+    repetitions= int(sys.argv[2]) if len(sys.argv)> 2 else 200
+    products= make_products(page_size)
+
+    documents= [product.to_mongo().to_dict() for product in products]
+
+    assert json.loads(old_path(products))== json.loads(new_path(products))
+    assert json.loads(old_path(products))== json.loads(raw_path(documents))
+
+    for name, function, page in (("to_json + json.loads + JsonResponse", old_path, products), \
+        ("json_response", new_path, products), ("json_response (raw documents)", raw_path, documents)):
+        seconds= min(timeit.repeat(lambda f=function, p=page: f(p), number= repetitions, repeat= 3))
+        print(f"{name:<40}{seconds/ repetitions* 1000:8.3f} ms per {page_size} item page")
+
+
+if __name__== "__main__":
+    main()
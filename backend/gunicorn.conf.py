@@ -0,0 +1,29 @@
+"""
+gunicorn configuration of the WSGI stack, picked up when gunicorn is started from this directory.
+
+Workers connect to the database after they are forked, never in the master process, and fill
+their connection pool (and in-memory indexes) before they accept requests.
+"""
+
+import multiprocessing
+
+from src.db.db_init import warm_up
+from src.utils.validation import load_category_titles
+from src.services.product_service import ProductService
+
+wsgi_app= "src.wsgi:application"
+workers= multiprocessing.cpu_count()
+threads= 8
+
+
+def post_worker_init(worker):
+    try:
+        stats= warm_up()
+        load_category_titles()
+        suggestions= ProductService.build_suggestions()
+    except Exception as e:  #pylint: disable=broad-exception-caught
+        # The connections and indexes are made on first use instead
+        worker.log.warning(f"Could not warm up the worker: {e}")
+        return
+    worker.log.info(f"Opened {stats['open']} database connections, indexed {suggestions} " \
+        "product names")
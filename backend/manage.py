@@ -4,6 +4,7 @@ import os
 import sys
 from src.db.db_init import init_db
 from src.utils.init_categories import initialize_categories
+from src.utils.validation import load_category_titles
 
 
 def main():
@@ -23,5 +24,6 @@ def main():
 if __name__ == "__main__":
     init_db()
     initialize_categories()
+    load_category_titles()
     main()
 
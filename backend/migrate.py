@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Runs the pending data migrations in src/migrations, resuming interrupted ones.
+
+Usage (from the backend directory):
+    ./migrate.py --dry-run                      # reports how many documents would be touched
+    ./migrate.py --ops-per-second 5000          # runs all pending migrations, throttled
+    ./migrate.py --target 0001                  # runs the migrations up to version 0001
+"""
+
+import argparse
+import sys
+
+from src.db.db_init import init_db
+from src.migrations import MIGRATIONS
+from src.utils.migrations import run_migrations
+
+
+def parse_args():
+    parser= argparse.ArgumentParser(description= "Run the pending data migrations.")
+    parser.add_argument("--dry-run", action= "store_true",
+        help= "only report how many documents each migration would touch")
+    parser.add_argument("--target", metavar= "VERSION",
+        help= "last migration version to run (default: all)")
+    parser.add_argument("--batch-size", type= int, default= 1000,
+        help= "documents per batch (default: 1000)")
+    parser.add_argument("--ops-per-second", type= float,
+        help= "maximum documents processed per second (default: no limit)")
+    return parser.parse_args()
+
+
+def main():
+    args= parse_args()
+    init_db()
+
+    def report(state):
+        print(f"\r{state.version}: {state.processed} processed, {state.modified} modified",
+            end= "", file= sys.stderr)
+
+    reports= run_migrations(
+        MIGRATIONS,
+        target= args.target,
+        batch_size= args.batch_size,
+        ops_per_second= args.ops_per_second,
+        dry_run= args.dry_run,
+        on_progress= report,
+    )
+    print(file= sys.stderr)
+    for result in reports:
+        if args.dry_run:
+            print(f"{result['version']} {result['name']}: {result['pending']} documents to process")
+        else:
+            print(f"{result['version']} {result['name']}: {result['processed']} processed, " \
+                f"{result['modified']} modified")
+
+
+if __name__ == "__main__":
+    main()
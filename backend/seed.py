@@ -1,14 +1,64 @@
 #!/usr/bin/env python
+"""
+Loads products into the database, from a file or generated synthetically.
 
-import json
+Usage (from the backend directory):
+    ./seed.py                                   # loads TEST_DATA.json
+    ./seed.py snapshot.ndjson --workers 8       # loads a JSON array or NDJSON file
+    ./seed.py --generate 2000000 --seed 42      # generates synthetic products
+"""
+
+import argparse
+import sys
+import time
 
 from src.db.db_init import init_db
-from src.models.product import Product
+from src.utils.init_categories import initialize_categories
+from src.utils.validation import get_category_titles
+from src.utils.bulk_loader import read_products, generate_products, load_products, CATEGORY_PRICES
+
+
+def parse_args():
+    parser= argparse.ArgumentParser(description= "Load products into the database.")
+    parser.add_argument("file", nargs= "?", default= "TEST_DATA.json",
+        help= "JSON array or NDJSON file of products (default: TEST_DATA.json)")
+    parser.add_argument("--generate", type= int, metavar= "N",
+        help= "generate N synthetic products instead of reading a file")
+    parser.add_argument("--seed", type= int, help= "random seed for --generate")
+    parser.add_argument("--batch-size", type= int, default= 1000,
+        help= "products per insert_many call (default: 1000)")
+    parser.add_argument("--workers", type= int, default= 4,
+        help= "batches written concurrently (default: 4)")
+    return parser.parse_args()
+
+
+def main():
+    args= parse_args()
+    init_db()
+    initialize_categories()
+
+    if args.generate:
+        # Known categories first, so they get the most products
+        titles= get_category_titles()
+        categories= [title for title in CATEGORY_PRICES if title in titles]
+        categories+= sorted(titles.difference(categories))
+        products= generate_products(args.generate, categories, args.seed)
+    else:
+        products= read_products(args.file)
+
+    started= time.monotonic()
+
+    def report(stats):
+        done= stats["created"]+ stats["failed"]
+        rate= done/ max(time.monotonic()- started, 1e-9)
+        print(f"\r{stats['created']} created, {stats['failed']} failed ({rate:.0f}/s)",
+            end= "", file= sys.stderr)
+
+    stats= load_products(products, args.batch_size, args.workers, report)
+    print(file= sys.stderr)
+    for error in stats["errors"]:
+        print(f"error: {error}", file= sys.stderr)
 
-init_db()
-file_path= "TEST_DATA.json"
-with open(file_path, "r") as f:
-    test_data = json.load(f)
 
-for product in test_data:
-    Product(**product).save()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
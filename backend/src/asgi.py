@@ -3,14 +3,54 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The ASGI stack uses the settings in src/settings_asgi.py, so the product and category endpoints
+are served by async views. Run it with e.g.
+
+    uvicorn src.asgi:application --workers 4
+
+The connection pools (and in-memory indexes) of the worker are filled on the lifespan startup
+event, before the worker accepts requests.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
+import asyncio
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
+from src.db.db_init import init_db, warm_up, warm_up_async
+from src.utils.validation import load_category_titles
+from src.services.product_service import ProductService
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.settings_asgi")
+
+logger = logging.getLogger(__name__)
+
+init_db()
+django_application = get_asgi_application()
+
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.settings")
+async def application(scope, receive, send):
+    """
+    Serves the lifespan events (which Django does not handle), and passes the rest to Django.
+    """
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
 
-application = get_asgi_application()
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await asyncio.to_thread(warm_up)
+                await asyncio.to_thread(load_category_titles)
+                await asyncio.to_thread(ProductService.build_suggestions)
+                await warm_up_async()
+            except Exception as e:  #pylint: disable=broad-exception-caught
+                # The connections and indexes are made on first use instead
+                logger.warning("Could not warm up the worker: %s", e)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
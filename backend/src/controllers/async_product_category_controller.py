@@ -0,0 +1,89 @@
+"""
+This module is the controller for the category-product endpoints served by the ASGI stack.
+
+Listing the products of a category is a coroutine, querying the database with
+AsyncProductService, one page at a time. Adding and removing products are the sync views of
+product_category_controller, which Django runs in a thread under ASGI.
+"""
+
+#pylint: disable=no-member
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
+from src.utils.error import generate_error_response
+from src.utils.pagination import InvalidCursorError
+from src.utils.validation import find_unknown_categories
+from src.controllers.product_controller import parse_page_params, page_cache_key, cached_page, \
+    cache_page, cursor_page_response
+from src.controllers.product_category_controller import add_product_to_category, \
+    remove_product_from_category
+from src.services.async_product_service import AsyncProductService
+from src.models.product import Product
+
+
+async def category_product_endpoint(request: HttpRequest, category_title: str):
+    """
+    This is the function that handles all requests to /category/<title>, as
+    product_category_controller.category_product_endpoint.
+
+    Args:
+        request: An HttpRequest instance created by Django
+        category_title: The slug (title) of the category
+
+    Returns:
+        JsonResponse based on the type of HTTP request
+    """
+
+    if request.method == "GET":
+        return await get_products_in_category(request, category_title)
+    if request.method == "POST":
+        return await sync_to_async(add_product_to_category)(request, category_title)
+    if request.method == "DELETE":
+        return await sync_to_async(remove_product_from_category)(request, category_title)
+    details = f"No endpoint for {request.method} request"
+    suggestion = "Use GET, POST, or DELETE on /category/<title>"
+    return generate_error_response(request, 405, details, suggestion)
+
+
+async def get_products_in_category(request: HttpRequest, category_title: str):
+    """
+    Controller to list the products of a category, one page at a time, as
+    product_category_controller.get_products_in_category.
+
+    Args:
+        request: HttpRequest object, with the query params of the sync view.
+        category_title: Title of the category
+
+    Returns:
+        HttpResponse with a JSON page of products, in the same format as GET /products
+    """
+    params = parse_page_params(request, Product.CATEGORY_SORTS, search=False, filters=False)
+    if isinstance(params, HttpResponse):
+        return params
+
+    # The category titles are cached, so this rarely queries the database
+    if await sync_to_async(find_unknown_categories)([category_title]):
+        details = f"Category with title '{category_title}' does not exist"
+        suggestion = "Use a valid category title"
+        return generate_error_response(request, 404, details, suggestion)
+
+    key = page_cache_key(request, **params)
+    cached = cached_page(key)
+    if cached is not None:
+        return cached
+
+    query = {"category": category_title}
+    num_products = await AsyncProductService.count_products(query) \
+        if params["include_total"] else None
+    cursor = request.GET.get("cursor", request.GET.get("after"))
+    try:
+        page, next_cursor = await AsyncProductService.get_keyset_page(query, params["limit"], \
+            cursor, params["fields"], params["sort"])
+    except InvalidCursorError as e:
+        details = f"cursor parameter {cursor} is invalid: {e}"
+        suggestion = "Omit the cursor parameter to get the first page, and use response " \
+            "navigation URIs to navigate"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return cache_page(key, cursor_page_response(request, page, cursor, next_cursor, \
+        params["limit"], num_products))
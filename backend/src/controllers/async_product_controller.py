@@ -0,0 +1,385 @@
+"""
+This module is the controller for the product endpoints served by the ASGI stack.
+
+The views are coroutines, that query the database with AsyncProductService, so a request
+waiting on MongoDB does not hold a thread. They take the same requests and send the same
+responses as the views of product_controller, whose helpers (pagination params, page cache,
+navigation, conditional requests) they reuse. Endpoints that are rarely called, or that write
+many products (POST /products, /products/bulk), are the sync views, which Django runs in a
+thread under ASGI.
+
+/products/export is async too: Django reads a sync streaming response to the end in a thread
+before sending it under ASGI, which would hold the whole export in memory. The async export
+streams from an async cursor instead, one batch at a time.
+"""
+
+#pylint: disable=no-member
+
+import json
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from src.utils.error import generate_error_response
+from src.utils.pagination import InvalidCursorError
+from src.utils.response import json_response
+from src.utils.export import ndjson_chunks, csv_chunks, async_gzip_chunks
+from src.utils.conditional import is_conditional, conditional_response, set_validators
+from src.controllers.product_controller import add_product, parse_page_params, \
+    page_cache_key, cached_page, cache_page, offset_page_response, cursor_page_response, \
+    parse_suggest_params, parse_export_params, export_response, parse_filters, page_sort, \
+    EXPORT_BATCH_SIZE
+from src.utils.suggest import product_suggestions
+
+from mongoengine.errors import DoesNotExist, ValidationError
+
+from src.services.async_product_service import AsyncProductService
+from src.services.product_service import ProductService
+
+
+async def product_endpoint(request: HttpRequest, request_id: str= None):
+    """
+    This is the function that handles all requests to /product and /product/<id>, as
+    product_controller.product_endpoint.
+
+    Args:
+        request: An HttpRequest instance created by Django
+        request_id: for /product/<id> request, the id of the product.
+
+    Returns:
+        The appropriate JsonResponse object, based on the request.
+    """
+
+    if request.method== "GET":
+        return await get_product(request, request_id)
+    if request.method== "POST":
+        return await sync_to_async(add_product)(request)
+    if request.method== "PATCH":
+        return await update_product(request, request_id)
+    if request.method== "DELETE":
+        return await delete_product(request, request_id)
+    details= f"No endpoint for {request.method} request"
+    suggestion= "Check the documentation at https://github.com/Alph3ga/interneers-lab " \
+        "for the available API endpoints"
+    return generate_error_response(request, 405, details, suggestion)
+
+
+async def product_stock_endpoint(request: HttpRequest, request_id: str):
+    """
+    This is the function that handles all requests to /products/<id>/stock.
+
+    Args:
+        request: An HttpRequest instance created by Django
+        request_id: the id of the product whose stock is adjusted.
+
+    Returns:
+        The appropriate JsonResponse object, based on the request.
+    """
+
+    if request.method== "POST":
+        return await adjust_stock(request, request_id)
+    details= f"No endpoint for {request.method} request"
+    suggestion= "Use POST on /products/<id>/stock to adjust the stock of a product"
+    return generate_error_response(request, 405, details, suggestion)
+
+
+async def adjust_stock(request: HttpRequest, request_id: str):
+    """
+    Controller to atomically adjust the stock of a product, as product_controller.adjust_stock.
+
+    Args:
+        request: An HttpRequest instance created by django. The request body must be of the form
+        {"delta": <int>}.
+
+    Returns:
+        JsonResponse instance, with payload {"id": <id>, "quantity": <updated stock>}.
+    """
+
+    try:
+        delta= json.loads(request.body).get("delta")
+    except (ValueError, AttributeError):
+        delta= None
+    if not isinstance(delta, int) or isinstance(delta, bool):
+        details= "'delta' field is required, and must be an integer"
+        suggestion= "Re-send the request with a body like {\"delta\": -2}"
+        return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        quantity= await AsyncProductService.modify_stock(request_id, delta)
+    except (DoesNotExist, ValidationError) as _:
+        details= f"Product with id {request_id} does not exist"
+        suggestion= "Use 'GET /products' to get a list of existing products with id"
+        return generate_error_response(request, 404, details, suggestion)
+    except ValueError as e:
+        details= f"Cannot adjust the stock by {delta}: {e}"
+        suggestion= "Check the current quantity of the product with 'GET /products/<id>'"
+        return generate_error_response(request, 409, details, suggestion)
+
+    return JsonResponse({"id": request_id, "quantity": quantity})
+
+
+async def get_product(request: HttpRequest, request_id: str):
+    """
+    Controller to fetch a product, or a page of products, as product_controller.get_product.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        request_id: the id of the product, None for the collection request.
+
+    Returns:
+        HttpResponse instance, with JSON payload containing the representation of requested
+        object, carrying ETag and Last-Modified headers, or an empty response with code 304.
+    """
+
+    if request_id is None:
+        return await get_product_paginated(request)
+
+    try:
+        if is_conditional(request):
+            version= await AsyncProductService.get_product_version(request_id)
+            not_modified= conditional_response(request, version["_id"], version.get("modified_at"))
+            if not_modified is not None:
+                return not_modified
+        product= await AsyncProductService.get_product_document(request_id)
+    except (DoesNotExist, ValidationError) as _:
+        details= f"Product with id {request_id} does not exist"
+        suggestion= "Use 'GET /products' to get a list of existing products with id"
+        return generate_error_response(request, 404, details, suggestion)
+    return set_validators(json_response(product), product["_id"], product.get("modified_at"))
+
+
+async def get_product_paginated(request: HttpRequest):
+    """
+    Controller to fetch paginated list of products, as product_controller.get_product_paginated.
+
+    Pages are shared with the sync views through the page cache.
+
+    Args:
+        request: An HttpRequest instance created by django, with the query params described in
+        product_controller.get_product_paginated.
+
+    Returns:
+        HttpResponse instance, in the same format as product_controller.get_product_paginated.
+    """
+
+    params= parse_page_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+
+    key= page_cache_key(request, **params)
+    cached= cached_page(key)
+    if cached is not None:
+        return cached
+    return cache_page(key, await build_product_page(request, **params))
+
+
+async def build_product_page(request: HttpRequest, start_index: int, limit: int, fields: list, \
+    sort: list, include_total: bool):
+    """
+    Fetches a page of products and builds its response, for get_product_paginated.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        start_index: The offset of the page, only used if the 'start' param is given.
+        limit: The maximum number of products in a page.
+        fields: Names of the fields to return, None for all fields.
+        sort: list of (field, direction) tuples, None to sort by id (or by relevance for q).
+        include_total: Whether to count the products matching the filters.
+
+    Returns:
+        HttpResponse instance, as described in product_controller.get_product_paginated.
+    """
+
+    query= filter_query(request)
+    num_products= await AsyncProductService.count_products(query) if include_total else None
+
+    if "start" not in request.GET:
+        cursor= request.GET.get("cursor", request.GET.get("after"))
+        try:
+            products, next_cursor= await AsyncProductService.get_keyset_page(query, limit, \
+                cursor, fields, sort)
+        except InvalidCursorError as e:
+            details= f"cursor parameter {cursor} is invalid: {e}"
+            suggestion= "Omit the cursor parameter to get the first page, and use response " \
+                "navigation URIs to navigate"
+            return generate_error_response(request, 400, details, suggestion)
+        return cursor_page_response(request, products, cursor, next_cursor, limit, num_products)
+
+    if num_products is None:
+        # Without the total, look one product ahead to find out if there is a next page
+        page= await AsyncProductService.get_offset_page(query, start_index, limit+ 1, fields, \
+            sort)
+        has_next= len(page)> limit
+        page= page[:limit]
+        end_index= start_index+ len(page)
+    else:
+        end_index= min(start_index+ limit, num_products)
+        has_next= end_index< num_products
+        page= await AsyncProductService.get_offset_page(query, start_index, \
+            end_index- start_index, fields, sort) if end_index> start_index else []
+
+    return offset_page_response(request, page, start_index, end_index, has_next, limit, \
+        num_products, page_sort(request, sort))
+
+
+def filter_query(request: HttpRequest)-> dict:
+    """
+    Builds the raw filter of the products matching the filters in the query params of a
+    request, as product_controller.filter_products.
+
+    Raises:
+        ValueError: If a numeric filter could not be converted to integer.
+    """
+
+    return AsyncProductService.build_query(**parse_filters(request))
+
+
+async def update_product(request: HttpRequest, request_id: str):
+    """
+    Controller to (partially) update a product, as product_controller.update_product.
+
+    Returns:
+        JsonResponse instance, with no content. Successful response code is 204.
+    """
+
+    data= json.loads(request.body)
+    if "id" in data:
+        details= "Product ID cannot be updated"
+        suggestion= "Remove 'id' field from your request, or check if it matches the URI"
+        return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        await AsyncProductService.update_product(request_id, data)
+    except DoesNotExist:
+        details= f"Product with id {request_id} does not exist"
+        suggestion= "Use 'GET /products' to get a list of existing products with id"
+        return generate_error_response(request, 404, details, suggestion)
+    except ValidationError as e:
+        details= f"Product could not be updated: {e}"
+        suggestion= "Check the field names and values in your request"
+        return generate_error_response(request, 400, details, suggestion)
+
+    response= JsonResponse({})
+    response.headers["Location"]= f"/products/{request_id}"  # Location of resource
+    response.status_code= 204  # No content in body
+    return response
+
+
+async def delete_product(request: HttpRequest, request_id: str):
+    """
+    Controller to delete a product, as product_controller.delete_product.
+
+    Returns:
+        JsonResponse instance, with no content. Successful response code is 204.
+    """
+
+    try:
+        await AsyncProductService.delete_product(request_id)
+    except (DoesNotExist, ValidationError) as _:
+        details= f"Product with id {request_id} does not exist"
+        suggestion= "Use 'GET /products' to get a list of existing products with id"
+        return generate_error_response(request, 404, details, suggestion)
+
+    response= JsonResponse({})
+    response.status_code= 204
+    return response
+
+
+async def product_suggest_endpoint(request: HttpRequest):
+    """
+    Controller to suggest products whose name starts with a prefix, as
+    product_controller.product_suggest_endpoint.
+
+    Suggestions are answered from memory in the event loop. Only building the index, if it was
+    not built at startup, is done in a thread.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to get suggestions"
+        return generate_error_response(request, 405, details, suggestion)
+
+    params= parse_suggest_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    if not product_suggestions.built:
+        await sync_to_async(ProductService.build_suggestions)()
+    return json_response({"data": ProductService.suggest_products(*params)})
+
+
+async def product_facets_endpoint(request: HttpRequest):
+    """
+    Controller to count the products per category, per brand, and per price bucket, as
+    product_controller.product_facets_endpoint.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to get the facets"
+        return generate_error_response(request, 405, details, suggestion)
+
+    try:
+        query= filter_query(request)
+    except ValueError:
+        details= "Numeric filter parameters could not be converted to integer"
+        suggestion= "Check if price and quantity filters are integers"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return json_response(await AsyncProductService.get_facets(query))
+
+
+async def product_export_endpoint(request: HttpRequest):
+    """
+    Controller to export all the products matching the filters, as one streamed response, as
+    product_controller.product_export_endpoint.
+
+    The response content is an async generator, so the products are read from the async
+    cursor, EXPORT_BATCH_SIZE at a time, only as fast as the client receives them.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to export products"
+        return generate_error_response(request, 405, details, suggestion)
+
+    params= parse_export_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+
+    try:
+        query= filter_query(request)
+    except ValueError:
+        details= "Numeric filter parameters could not be converted to integer"
+        suggestion= "Check if price and quantity filters are integers"
+        return generate_error_response(request, 400, details, suggestion)
+
+    cursor= AsyncProductService.stream_products(query, params["fields"], EXPORT_BATCH_SIZE)
+    chunks= export_chunks(cursor, params)
+    if params["gzip"]:
+        chunks= async_gzip_chunks(chunks)
+    return export_response(chunks, params)
+
+
+async def export_chunks(cursor, params: dict):
+    """
+    Renders the products of an async cursor in the format of an export, batch by batch.
+
+    Args:
+        cursor: AsyncCursor, as returned by AsyncProductService.stream_products.
+        params: the export params, as returned by parse_export_params.
+
+    Yields:
+        bytes, chunks of the rendered products.
+    """
+
+    header= True
+    while batch:= await cursor.to_list(EXPORT_BATCH_SIZE):
+        if params["format"]== "csv":
+            chunks= csv_chunks(batch, params["columns"], header= header)
+        else:
+            chunks= ndjson_chunks(batch)
+        header= False
+        for chunk in chunks:
+            yield chunk
+    if header and params["format"]== "csv":
+        # No products, the export is only the header row
+        for chunk in csv_chunks([], params["columns"]):
+            yield chunk
@@ -2,19 +2,63 @@
 This module is the controller for all category-product related endpoints.
 
 All requests to the /category/<title> endpoint are to be routed to 
-category_product_endpoint(request, category_title).
+category_product_endpoint(request, category_title), and requests to /categories to
+category_list_endpoint(request).
 Rest are functions that implement specific method endpoints, or helper functions.
 """
 
 #pylint: disable=no-member
 
 import json
-from django.http import HttpRequest, JsonResponse
+from django.http import HttpRequest, HttpResponse
 from src.utils.error import generate_error_response
+from src.utils.response import json_response
+from src.utils.pagination import keyset_page, InvalidCursorError
+from src.utils.validation import find_unknown_categories
+from src.controllers.product_controller import parse_page_params, page_cache_key, cached_page, \
+    cache_page, cursor_page_response
 from src.services.product_category_service import ProductCategoryService
+from src.services.product_service import ProductService
+from src.models.product import Product
 from mongoengine.errors import DoesNotExist, ValidationError
 
 
+def category_list_endpoint(request: HttpRequest):
+    """
+    This is the function that handles all requests to /categories.
+
+    Args:
+        request: An HttpRequest instance created by Django
+
+    Returns:
+        JsonResponse based on the type of HTTP request
+    """
+
+    if request.method == "GET":
+        return list_categories(request)
+    details = f"No endpoint for {request.method} request"
+    suggestion = "Use a GET request to list the categories"
+    return generate_error_response(request, 405, details, suggestion)
+
+
+def list_categories(request: HttpRequest):
+    """
+    Controller to list every category, with the number of products in it and their total
+    stock.
+
+    The counts are kept on the categories by every product write, so they are read with the
+    categories, without counting the products.
+
+    Args:
+        request: HttpRequest object
+
+    Returns:
+        HttpResponse with JSON of the form {"categories": [...]}, ordered by title, every
+        category having its _id, title, description, product_count, and total_stock
+    """
+    return json_response({"categories": ProductCategoryService.list_categories()}, status=200)
+
+
 def category_product_endpoint(request: HttpRequest, category_title: str):
     """
     This is the function that handles all requests to /category/<title>.
@@ -41,24 +85,54 @@ def category_product_endpoint(request: HttpRequest, category_title: str):
 
 def get_products_in_category(request: HttpRequest, category_title: str):
     """
-    Controller to list products under a specific category.
+    Controller to list the products of a category, one page at a time.
+
+    The category is resolved from the cached category titles, so usually only the page is
+    queried, in one round trip. Pages are fetched with a cursor, in the order of an index
+    starting with the category, so only the products of the page are read. Rendered pages
+    share the page cache of the product list.
 
     Args:
-        request: HttpRequest object
+        request: HttpRequest object. Accepts the 'cursor' (or 'after'), 'limit', 'fields',
+            and 'include_total' query params of GET /products (see
+            product_controller.get_product_paginated), but not 'start' or 'q'. 'sort' only
+            accepts the sorts of Product.CATEGORY_SORTS, served by indexes starting with the
+            category.
         category_title: Title of the category
 
     Returns:
-        JsonResponse with list of products
+        HttpResponse with a JSON page of products, in the same format as GET /products
     """
-    try:
-        category = ProductCategoryService.get_category_by_title(category_title)
-        products = ProductCategoryService.list_products_in_category(category.id)
-        return JsonResponse(json.loads(products.to_json()), safe=False)
-    except DoesNotExist:
+    params = parse_page_params(request, Product.CATEGORY_SORTS, search=False, filters=False)
+    if isinstance(params, HttpResponse):
+        return params
+
+    if find_unknown_categories([category_title]):
         details = f"Category with title '{category_title}' does not exist"
         suggestion = "Use a valid category title"
         return generate_error_response(request, 404, details, suggestion)
 
+    key = page_cache_key(request, **params)
+    cached = cached_page(key)
+    if cached is not None:
+        return cached
+
+    products = ProductCategoryService.list_products_in_category(
+        category_title, raw=True, fields=params["fields"]
+    )
+    num_products = ProductService.count_products(products) if params["include_total"] else None
+    cursor = request.GET.get("cursor", request.GET.get("after"))
+    try:
+        page, next_cursor = keyset_page(products, params["limit"], cursor, params["sort"])
+    except InvalidCursorError as e:
+        details = f"cursor parameter {cursor} is invalid: {e}"
+        suggestion = "Omit the cursor parameter to get the first page, and use response " \
+            "navigation URIs to navigate"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return cache_page(key, cursor_page_response(request, page, cursor, next_cursor, \
+        params["limit"], num_products))
+
 
 def add_product_to_category(request: HttpRequest, category_title: str):
     """
@@ -69,7 +143,7 @@ def add_product_to_category(request: HttpRequest, category_title: str):
         category_title: Title of the category
 
     Returns:
-        JsonResponse with the updated product
+        HttpResponse with JSON of the updated product
     """
     try:
         data = json.loads(request.body)
@@ -86,7 +160,7 @@ def add_product_to_category(request: HttpRequest, category_title: str):
 
         category = ProductCategoryService.get_category_by_title(category_title)
         product = ProductCategoryService.add_product_to_category(product_id, category.id)
-        return JsonResponse(json.loads(product.to_json()), safe=False, status=200)
+        return json_response(product, status=200)
     except DoesNotExist:
         return generate_error_response(request, 404, "Category or Product not found", "Check category title and product ID")
     except ValidationError:
@@ -102,7 +176,7 @@ def remove_product_from_category(request: HttpRequest, category_title: str):
         category_title: Title of the category (not used directly)
 
     Returns:
-        JsonResponse with the updated product
+        HttpResponse with JSON of the updated product
     """
     try:
         data = json.loads(request.body)
@@ -113,7 +187,7 @@ def remove_product_from_category(request: HttpRequest, category_title: str):
             )
 
         product = ProductCategoryService.remove_product_from_category(product_id)
-        return JsonResponse(json.loads(product.to_json()), safe=False, status=200)
+        return json_response(product, status=200)
     except DoesNotExist:
         return generate_error_response(request, 404, "Product not found", "Check product ID")
     except ValidationError:
@@ -9,9 +9,16 @@ Rest are functions that implement specific method endpoints, or helper functions
 
 import json
 import math
-from django.http import HttpRequest, JsonResponse
-from rest_framework_mongoengine import serializers
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from src.utils.error import generate_error_response
+from src.utils.pagination import keyset_page, parse_sort, with_tiebreaker, order_by_keys, \
+    encode_cursor, cursor_values, DEFAULT_SORT, SEARCH_SORT, TEXT_SCORE_FIELD, InvalidCursorError
+from src.utils.response import json_response
+from src.utils.projection import parse_fields, PROJECTABLE_FIELDS
+from src.utils.export import ndjson_chunks, csv_chunks, gzip_chunks, accepts_gzip
+from src.utils.conditional import is_conditional, conditional_response, set_validators
+from src.utils.cache import TTLCache, product_generation
 
 from src.models.product import create_product, Product
 
@@ -19,6 +26,19 @@ from mongoengine.errors import DoesNotExist, ValidationError
 
 from src.services.product_service import ProductService
 
+NDJSON_CONTENT_TYPES= ("application/x-ndjson", "application/ndjson")
+BULK_BATCH_SIZE= 1000
+EXPORT_BATCH_SIZE= 2000
+EXPORT_CONTENT_TYPES= {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+SUGGEST_MAX_LIMIT= 50
+NUMERIC_FILTER_PARAMS= ("price_less_than_e", "price_greater_than_e", "quantity_less_than_e", \
+    "quantity_greater_than_e")
+FILTER_PARAMS= ("q", "name", "category", "brand")+ NUMERIC_FILTER_PARAMS
+
+# Rendered listing pages (status code and body), for the current product generation. Writes
+# made by other processes are seen once the pages expire.
+PAGE_CACHE= TTLCache(ttl= 30, max_size= 2048)
+
 
 def product_endpoint(request: HttpRequest, request_id: str= None):
     """
@@ -52,6 +72,238 @@ def product_endpoint(request: HttpRequest, request_id: str= None):
         return generate_error_response(request, 405, details, suggestion)
 
 
+def product_stock_endpoint(request: HttpRequest, request_id: str):
+    """
+    This is the function that handles all requests to /products/<id>/stock.
+
+    Args:
+        request: An HttpRequest instance created by Django
+        request_id: the id of the product whose stock is adjusted.
+
+    Returns:
+        The appropriate JsonResponse object, based on the request.
+    """
+
+    if request.method== "POST":
+        return adjust_stock(request, request_id)
+    details= f"No endpoint for {request.method} request"
+    suggestion= "Use POST on /products/<id>/stock to adjust the stock of a product"
+    return generate_error_response(request, 405, details, suggestion)
+
+
+def adjust_stock(request: HttpRequest, request_id: str):
+    """
+    Controller to atomically adjust the stock of a product.
+
+    Called when the request is POST /products/<id>/stock. The adjustment is applied in a single
+    conditional write on the database, so concurrent adjustments are never lost, and the stock
+    never goes negative.
+
+    Args:
+        request: An HttpRequest instance created by django. The request body must be of the form
+        {"delta": <int>}, positive to increase the stock, negative to decrease it.
+
+    Returns:
+        JsonResponse instance, with payload {"id": <id>, "quantity": <updated stock>}. 
+        Successful response code is 200. Response code is 409 if the product does not have
+        enough stock for the decrease.
+    """
+
+    try:
+        delta= json.loads(request.body).get("delta")
+    except (ValueError, AttributeError):
+        delta= None
+    if not isinstance(delta, int) or isinstance(delta, bool):
+        details= "'delta' field is required, and must be an integer"
+        suggestion= "Re-send the request with a body like {\"delta\": -2}"
+        return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        quantity= ProductService.modify_stock(request_id, delta)
+    except (DoesNotExist, ValidationError) as _:
+        details= f"Product with id {request_id} does not exist"
+        suggestion= "Use 'GET /products' to get a list of existing products with id"
+        return generate_error_response(request, 404, details, suggestion)
+    except ValueError as e:
+        details= f"Cannot adjust the stock by {delta}: {e}"
+        suggestion= "Check the current quantity of the product with 'GET /products/<id>'"
+        return generate_error_response(request, 409, details, suggestion)
+
+    return JsonResponse({"id": request_id, "quantity": quantity})
+
+
+def product_bulk_endpoint(request: HttpRequest):
+    """
+    This is the function that handles all requests to /products/bulk.
+
+    Args:
+        request: An HttpRequest instance created by Django
+
+    Returns:
+        The appropriate JsonResponse object, based on the request.
+    """
+
+    if request.method== "POST":
+        return add_products_bulk(request)
+    if request.method== "PATCH":
+        return update_products_bulk(request)
+    details= f"No endpoint for {request.method} request"
+    suggestion= "Check the documentation at https://github.com/Alph3ga/interneers-lab " \
+        "for the available API endpoints"
+    return generate_error_response(request, 405, details, suggestion)
+
+
+def add_products_bulk(request: HttpRequest):
+    """
+    Controller to add many products to the database in one request.
+
+    Called when the request is POST /products/bulk. Every item is validated like in
+    add_product, and the valid ones are written in batches. Items that fail do not stop the
+    others from being created.
+
+    Args:
+        request: An HttpRequest instance created by django. The request body must either be
+        a json array of product objects, or (with content type application/x-ndjson) one json
+        product object per line, which is read and written as a stream.
+
+    Returns:
+        JsonResponse instance, with payload
+        {
+            created: Number of products created
+            failed: Number of items that were not created
+            results: List with one result per item, in order, either
+                {index, status: 201, id} or {index, status: 400, details, suggestion}
+        }
+        Successful response code is 201, or 207 if some items were not created.
+    """
+
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        items= parse_ndjson(request)
+    else:
+        try:
+            items= json.loads(request.body)
+        except ValueError:
+            items= None
+        if not isinstance(items, list):
+            details= "Request body must be a json array of products"
+            suggestion= "Send a json array, or one product per line with content type " \
+                "application/x-ndjson"
+            return generate_error_response(request, 400, details, suggestion)
+
+    results= []
+    batch= []
+
+    def flush():
+        created= ProductService.create_products([item for _, item in batch])
+        for (index, _), result in zip(batch, created):
+            if "id" in result:
+                results.append({"index": index, "status": 201, "id": result["id"]})
+            else:
+                results.append({"index": index, "status": 400, "details": result["error"], \
+                    "suggestion": "Fix this item and re-send it"})
+        batch.clear()
+
+    for index, item in enumerate(items):
+        validation= validate_product(item) if isinstance(item, dict) else {
+            "valid": False,
+            "details": "Item is not a json object",
+            "suggestion": "Re-send this item as a json object",
+        }
+        if not validation["valid"]:
+            results.append({"index": index, "status": 400, "details": validation["details"], \
+                "suggestion": validation["suggestion"]})
+            continue
+
+        batch.append((index, item))
+        if len(batch)>= BULK_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+    results.sort(key= lambda result: result["index"])
+    created= sum(1 for result in results if result["status"]== 201)
+    response= json_response({
+        "created": created,
+        "failed": len(results)- created,
+        "results": results,
+    })
+    response.status_code= 201 if created== len(results) else 207
+    return response
+
+
+def update_products_bulk(request: HttpRequest):
+    """
+    Controller to (partially) update many products in the database in one request.
+
+    Called when the request is PATCH /products/bulk. The updates are written without reading
+    the products first (see ProductService.update_products), following the same rules as
+    update_product. Invalid updates do not stop the others from being applied.
+
+    Args:
+        request: An HttpRequest instance created by django. The request body must be a json
+        array of objects of the form {"id": <id>, "changes": {<field>: <value>, ...}}.
+
+    Returns:
+        JsonResponse instance, with payload
+        {
+            matched: Number of products found
+            modified: Number of products changed
+            failed: Number of updates that were invalid, or whose product was not found
+            results: List with one result per update, in order, of the form
+                {id, status: 200, matched, modified}, {id, status: 404, matched: false, 
+                modified: false} or {id, status: 400, details}
+        }
+        Successful response code is 200, or 207 if some updates failed.
+    """
+
+    try:
+        updates= json.loads(request.body)
+    except ValueError:
+        updates= None
+    if not isinstance(updates, list):
+        details= "Request body must be a json array of updates"
+        suggestion= "Send a json array of objects of the form {\"id\": <id>, " \
+            "\"changes\": {<field>: <value>}}"
+        return generate_error_response(request, 400, details, suggestion)
+
+    results= []
+    for result in ProductService.update_products(updates):
+        if "error" in result:
+            results.append({"id": result["id"], "status": 400, "details": result["error"]})
+        else:
+            results.append(dict(result, status= 200 if result["matched"] else 404))
+
+    failed= sum(1 for result in results if result["status"]!= 200)
+    response= json_response({
+        "matched": sum(1 for result in results if result.get("matched")),
+        "modified": sum(1 for result in results if result.get("modified")),
+        "failed": failed,
+        "results": results,
+    })
+    response.status_code= 207 if failed else 200
+    return response
+
+
+def parse_ndjson(request: HttpRequest):
+    """
+    Reads the products of a NDJSON request body, one line at a time.
+
+    Args:
+        request: An HttpRequest instance created by django.
+
+    Yields:
+        The parsed object of every non-empty line, or None for lines that are not valid json.
+    """
+
+    for line in request:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
 def add_product(request: HttpRequest):
     """
     Controller to add a product to the database.
@@ -63,7 +315,7 @@ def add_product(request: HttpRequest):
         the json representation of a product object.
     
     Returns:
-        JsonResponse instance, with payload containing json representation of added object,
+        HttpResponse instance, with JSON payload containing the representation of added object,
         and header field Location containing location where it was added. Successful response
         code is 201.
     """
@@ -78,8 +330,7 @@ def add_product(request: HttpRequest):
 
     product= create_product(data)
 
-    response= JsonResponse(json.loads(product.to_json()), safe=False)
-    response.status_code= 201
+    response= json_response(product, status= 201)
     response.headers["Location"]= f"/products/{product.id}"  # Location of resource
     return response
 
@@ -96,18 +347,27 @@ def get_product(request: HttpRequest, request_id: str):
         pagination attributes for collection request.
     
     Returns:
-        JsonResponse instance, with payload containing json representation of requested object.
-        Successful response code is 200.
+        HttpResponse instance, with JSON payload containing the representation of requested object.
+        Successful response code is 200. The response carries ETag and Last-Modified headers,
+        and if the request has If-None-Match or If-Modified-Since headers matching the current
+        version of the product, an empty response with code 304 is returned instead.
     """
 
     if request_id is not None: # Reserve 0 id for collection requests
         try:
-            product= Product.objects.get(id= request_id)
+            if is_conditional(request):
+                # Revalidation only needs the timestamp, the document is loaded if it changed
+                version= ProductService.get_product_version(request_id)
+                not_modified= conditional_response(request, version["_id"], \
+                    version.get("modified_at"))
+                if not_modified is not None:
+                    return not_modified
+            product= ProductService.get_product_document(request_id)
         except (DoesNotExist, ValidationError) as _:
             details= f"Product with id {request_id} does not exist"
             suggestion= "Use 'GET /products' to get a list of existing products with id"
             return generate_error_response(request, 404, details, suggestion)
-        return JsonResponse(json.loads(product.to_json()), safe= False)
+        return set_validators(json_response(product), product["_id"], product.get("modified_at"))
     return get_product_paginated(request)
 
 
@@ -115,26 +375,95 @@ def get_product_paginated(request: HttpRequest):
     """
     Controller to fetch paginated list of products from the database.
 
-    Called when the request is POST /products. Pagination is done with a start offset and a 
-    page limit. 
+    Called when the request is POST /products. By default, pagination is done with an opaque
+    cursor and a page limit: the cursor encodes the sort key of the last product of the previous
+    page, so fetching any page costs one index seek. For compatibility, pagination with a start
+    offset is still done if the 'start' parameter is given.
+
+    Rendered pages are kept in PAGE_CACHE until the next write to the products, so repeated
+    listings are sent without querying or rendering. The X-Cache header tells if the page was
+    served from the cache.
 
     Args:
         request: An HttpRequest instance created by django. Query params can be used to specify
-        pagination attributes for collection request. 'start' denotes the offset of the page. 
+        pagination attributes for collection request. 'cursor' (or 'after') is the token of the
+        page to fetch, as found in the navigation URIs. 'start' denotes the offset of the page. 
         'limit' denotes the maximum number of products in a page. 'limit' cannot be more than 250.
+        'fields' is a comma separated list of the product fields to return, such as
+        "name,price,quantity", the id is always returned. 'include_total' tells whether to count
+        the products matching the filters: counting scans them all, so it defaults to false in
+        cursor mode, and to true with 'start'. 'sort' is a comma separated list of
+        fields, each prefixed with '-' for descending order, such as "price,-created_at", one of
+        the sorts in Product.SORTS or their opposites; products are sorted by id by default, and
+        always by id last. 'q' searches the name, brand, and description of the products: the
+        matching products are sorted by relevance, and carry their relevance score as
+        '_text_score'.
     
     Returns:
-        JsonResponse instance, with payload containing json representation of requested object.
+        HttpResponse instance, with JSON payload containing the representation of requested object.
         Successful response code is 206. Payload also contains navigation details in the form
         {
             self: URI of current page
             next: URI of next page
-            prev: URI of previous page
-            pages: Total number of pages
-            current: Current page number (calculated as ceil((index of first product+1)/limit))
+            prev: URI of previous page (null in cursor mode)
+            pages: Total number of pages (left out unless include_total)
+            current: Current page number (calculated as ceil((index of first product+1)/limit)),
+                null in cursor mode
         }
     """
 
+    params= parse_page_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+
+    key= page_cache_key(request, **params)
+    cached= cached_page(key)
+    if cached is not None:
+        return cached
+    return cache_page(key, build_product_page(request, **params))
+
+
+def cached_page(key: tuple):
+    """
+    Returns the response for a listing page from the page cache, or None if it is not cached.
+    """
+    cached= PAGE_CACHE.get(key)
+    if cached is None:
+        return None
+    status, content= cached
+    response= HttpResponse(content, content_type= "application/json", status= status)
+    response.headers["X-Cache"]= "HIT"
+    return response
+
+
+def cache_page(key: tuple, response: HttpResponse)-> HttpResponse:
+    """
+    Stores the response for a listing page in the page cache, if it is successful.
+    """
+    if response.status_code in (200, 206):
+        PAGE_CACHE.set(key, (response.status_code, response.content))
+    response.headers["X-Cache"]= "MISS"
+    return response
+
+
+def parse_page_params(request: HttpRequest, sorts: tuple= Product.SORTS, search: bool= True, \
+    filters: bool= True):
+    """
+    Parses and validates the pagination params of a listing request.
+
+    Args:
+        request: An HttpRequest instance created by django, with the query params described in
+        get_product_paginated.
+        sorts: the sorts the listing serves from an index, see parse_sort.
+        search: whether the listing supports the q param. If not, requests with q are rejected.
+        filters: whether the listing supports the filters of parse_filters, which are then
+        checked, so filter_products and filter_query do not raise on the request.
+
+    Returns:
+        dict with keys start_index, limit, fields, sort, and include_total, or the error
+        response to send if a param is invalid.
+    """
+
     try:
         start_index= int(request.GET.get("start", "0"))
     except ValueError:
@@ -159,21 +488,166 @@ def get_product_paginated(request: HttpRequest):
         suggestion= "Resubmit request with smaller limit"
         return generate_error_response(request, 400, details, suggestion)
 
-    data= ProductService.get_product_filtered(
-        name= request.GET.get("name", ""),
-        category= request.GET.get("category", ""),
-        brand= request.GET.get("brand", ""),
-        price_less_than_e= int(request.GET.get("price_less_than_e", "-1")),
-        price_greater_than_e= int(request.GET.get("price_greater_than_e", "-1")),
-        quantity_less_than_e= int(request.GET.get("quantity_less_than_e", "-1")),
-        quantity_greater_than_e= int(request.GET.get("quantity_greater_than_e", "-1")),
+    if filters:
+        try:
+            parse_filters(request)
+        except ValueError as e:
+            details= str(e)
+            suggestion= "Check if price and quantity filters are integers"
+            return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        fields= parse_fields(request.GET.get("fields", ""))
+    except ValueError as e:
+        details= f"fields parameter is invalid: {e}"
+        suggestion= "Check the spelling of the fields, or omit the fields parameter to get " \
+            "all fields"
+        return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        sort= parse_sort(request.GET.get("sort", ""), sorts)
+    except ValueError as e:
+        details= f"sort parameter is invalid: {e}"
+        suggestion= "Use one of the supported sorts, or omit the sort parameter to sort by id"
+        return generate_error_response(request, 400, details, suggestion)
+    if not search and "q" in request.GET:
+        details= "q parameter is not supported on this listing"
+        suggestion= "Omit the q parameter, or search all products with GET /products?q="
+        return generate_error_response(request, 400, details, suggestion)
+    if sort and request.GET.get("q", "").strip():
+        details= "sort parameter cannot be combined with q"
+        suggestion= "Omit the sort parameter, the products found by q are sorted by relevance"
+        return generate_error_response(request, 400, details, suggestion)
+
+    # Counting scans every matching product, so cursor pages, which cost one index seek, only
+    # count if asked to. Offset pages count by default, as they always did.
+    default_total= "true" if "start" in request.GET else "false"
+    include_total= request.GET.get("include_total", default_total).lower() not in ("false", "0")
+
+    return {
+        "start_index": start_index,
+        "limit": limit,
+        "fields": fields,
+        "sort": sort,
+        "include_total": include_total,
+    }
+
+
+def page_cache_key(request: HttpRequest, start_index: int, limit: int, fields: list, \
+    sort: list, include_total: bool)-> tuple:
+    """
+    Builds the key of a listing page in the page cache.
+
+    The key holds the normalized parameters of the page, so equivalent requests (e.g. with the
+    params in a different order, or the fields listed in a different order) share an entry,
+    and the current product generation, so every write to the products invalidates all pages.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        start_index, limit, fields, sort, include_total: The parsed parameters of the page.
+
+    Returns:
+        tuple, hashable key.
+    """
+
+    return (
+        product_generation.value,
+        request.path,
+        tuple(request.GET.get(name, "") for name in FILTER_PARAMS),
+        start_index if "start" in request.GET else None,
+        request.GET.get("cursor", request.GET.get("after")),
+        limit,
+        tuple(sorted(fields)) if fields else None,
+        tuple(sort) if sort else None,
+        include_total,
     )
 
-    num_products= data.count()
 
-    # Range ends at end_index-1
-    end_index= start_index+ limit if start_index+limit<num_products else num_products
-    pages= math.ceil(num_products/limit)
+def build_product_page(request: HttpRequest, start_index: int, limit: int, fields: list, \
+    sort: list, include_total: bool):
+    """
+    Fetches a page of products and builds its response, for get_product_paginated.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        start_index: The offset of the page, only used if the 'start' param is given.
+        limit: The maximum number of products in a page.
+        fields: Names of the fields to return, None for all fields.
+        sort: list of (field, direction) tuples, None to sort by id (or by relevance for q).
+        include_total: Whether to count the products matching the filters.
+
+    Returns:
+        HttpResponse instance, as described in get_product_paginated.
+    """
+
+    data= filter_products(request, fields)
+    num_products= ProductService.count_products(data) if include_total else None
+
+    if "start" not in request.GET:
+        return get_product_keyset_page(request, data, limit, num_products, sort)
+
+    # The id tiebreaker keeps the order of equal products the same from page to page
+    sort= page_sort(request, sort)
+    if request.GET.get("q", "").strip():
+        data= data.order_by("$text_score", "+id")
+    else:
+        data= data.order_by(*order_by_keys(sort))
+    if data._loaded_fields:
+        # The sort key of the last product makes the cursor of the next page
+        data= data.only(*[field for field, _ in sort if field!= TEXT_SCORE_FIELD])
+
+    if num_products is None:
+        # Without the total, look one product ahead to find out if there is a next page
+        page= list(data[start_index:start_index+ limit+ 1])
+        has_next= len(page)> limit
+        page= page[:limit]
+        end_index= start_index+ len(page)
+    else:
+        # Range ends at end_index-1
+        end_index= start_index+ limit if start_index+limit<num_products else num_products
+        has_next= end_index<num_products
+        page= list(data[start_index:end_index])
+
+    return offset_page_response(request, page, start_index, end_index, has_next, limit, \
+        num_products, sort)
+
+
+def page_sort(request: HttpRequest, sort: list)-> list:
+    """
+    Returns the full sort of the pages of a listing, with the id tiebreaker: the requested sort
+    (by id if None), or by relevance for a text search, as in cursor mode.
+    """
+
+    if request.GET.get("q", "").strip():
+        return with_tiebreaker(SEARCH_SORT)
+    return with_tiebreaker(sort or DEFAULT_SORT)
+
+
+def offset_page_response(request: HttpRequest, page: list, start_index: int, end_index: int, \
+    has_next: bool, limit: int, num_products: int, sort: list):
+    """
+    Builds the response for a page of products in offset mode.
+
+    The "next" link is the cursor of the last product of the page, so a client that starts
+    with 'start' then pages with cursors, and never pays for skipping deep into the listing.
+    'start' remains accepted as an input, and the "self" and "prev" links keep using it.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        page: The products of the page.
+        start_index: The offset of the first product of the page.
+        end_index: The offset after the last product of the page.
+        has_next: Whether there are products after the page.
+        limit: The maximum number of products in a page.
+        num_products: The total number of products matching the filters, None if not counted.
+        sort: The full sort of the page, as returned by page_sort.
+
+    Returns:
+        HttpResponse instance, in the same format as get_product_paginated.
+    """
+
+    next_cursor= encode_cursor(cursor_values(page[-1], sort), sort) \
+        if has_next and page else None
 
     # prev link always points to a valid URI, unlike next, which can be null
     # in case there are less than limit products before the current start,
@@ -181,32 +655,369 @@ def get_product_paginated(request: HttpRequest):
     # i.e., the product with the lowest existing id
     prev_index= start_index- limit if start_index>=limit else -1
 
-    class TestSerializer(serializers.DocumentSerializer):
-        class Meta:
-            model= Product
-            fields= '__all__'
-
-    response= JsonResponse({
-        "data":json.loads(data[start_index:end_index].to_json()),
-        "navigation":{
-            "self": f"{request.path}?start={start_index}&limit={limit}",
-            "next": f"{request.path}?start={end_index}&limit={limit}" \
-                if end_index<num_products else None,
-            "prev": f"{request.path}?start={prev_index}&limit={limit}" \
-                if prev_index>-1 else None,
-            "pages": pages,
-            "current": math.ceil((start_index+1)/limit)
-        }
-    }, safe= False)
-    response.status_code= 206 if num_products>limit else 200 # Partial content
+    navigation= {
+        "self": f"{request.path}?start={start_index}&limit={limit}",
+        "next": page_uri(request, cursor= next_cursor, limit= limit, \
+            include_total= num_products is not None) if next_cursor is not None else None,
+        "prev": f"{request.path}?start={prev_index}&limit={limit}" \
+            if prev_index>-1 else None,
+        "pages": math.ceil(num_products/limit) if num_products is not None else None,
+        "current": math.ceil((start_index+1)/limit)
+    }
+    if num_products is None:
+        del navigation["pages"]
+
+    response= json_response({
+        "data": page,
+        "navigation": navigation,
+    })
+    # Partial content
+    partial= num_products>limit if num_products is not None else has_next or start_index>0
+    response.status_code= 206 if partial else 200
+    return response
+
+
+def get_product_keyset_page(request: HttpRequest, data, limit: int, num_products: int, \
+    sort: list= None):
+    """
+    Builds the response for a page of products in cursor mode.
+
+    Args:
+        request: An HttpRequest instance created by django. 'cursor' (or 'after') query param
+        holds the token of the page, and is absent for the first page.
+        data: The filtered QuerySet of products.
+        limit: The maximum number of products in a page.
+        num_products: The total number of products matching the filters, None if not counted.
+        sort: list of (field, direction) tuples, None to sort by id.
+
+    Returns:
+        HttpResponse instance, in the same format as get_product_paginated.
+    """
+
+    cursor= request.GET.get("cursor", request.GET.get("after"))
+
+    try:
+        if request.GET.get("q", "").strip():
+            products, next_cursor= ProductService.search_products(data, limit, cursor)
+        else:
+            products, next_cursor= keyset_page(data, limit, cursor, sort)
+    except InvalidCursorError as e:
+        details= f"cursor parameter {cursor} is invalid: {e}"
+        suggestion= "Omit the cursor parameter to get the first page, and use response " \
+            "navigation URIs to navigate"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return cursor_page_response(request, products, cursor, next_cursor, limit, num_products)
+
+
+def cursor_page_response(request: HttpRequest, products, cursor: str, next_cursor: str, \
+    limit: int, num_products: int):
+    """
+    Builds the response for a page of products in cursor mode.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        products: The products of the page.
+        cursor: The cursor token of the page, None for the first page.
+        next_cursor: The cursor token of the next page, None for the last page.
+        limit: The maximum number of products in a page.
+        num_products: The total number of products matching the filters, None if not counted.
+
+    Returns:
+        HttpResponse instance, in the same format as get_product_paginated.
+    """
+
+    navigation= {
+        "self": page_uri(request, cursor= cursor, limit= limit),
+        "next": page_uri(request, cursor= next_cursor, limit= limit) \
+            if next_cursor is not None else None,
+        "prev": None,
+        "pages": math.ceil(num_products/limit) if num_products is not None else None,
+        "current": None
+    }
+    if num_products is None:
+        del navigation["pages"]
+
+    response= json_response({
+        "data": products,
+        "navigation": navigation,
+    })
+    # Partial content
+    partial= num_products>limit if num_products is not None else \
+        next_cursor is not None or cursor is not None
+    response.status_code= 206 if partial else 200
+    return response
+
+
+def page_uri(request: HttpRequest, cursor: str, limit: int, include_total: bool= False)-> str:
+    """
+    Builds the URI of a page in cursor mode, keeping the filters of the current request.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        cursor: The cursor token of the page, None for the first page.
+        limit: The maximum number of products in a page.
+        include_total: Whether to ask for the total, e.g. when leaving offset mode, where it is
+            counted by default.
+
+    Returns:
+        str, the path and query string of the page.
+    """
+
+    query= request.GET.copy()
+    for key in ("start", "cursor", "after"):
+        query.pop(key, None)
+    if cursor is not None:
+        query["cursor"]= cursor
+    query["limit"]= str(limit)
+    if include_total:
+        query["include_total"]= "true"
+    return f"{request.path}?{query.urlencode()}"
+
+
+def parse_filters(request: HttpRequest)-> dict:
+    """
+    Parses the filters in the query params of a request, for both the sync and async views.
+
+    Args:
+        request: An HttpRequest instance created by django. The filters are given as the query
+        params 'name', 'category', 'brand', 'price_less_than_e', 'price_greater_than_e',
+        'quantity_less_than_e', and 'quantity_greater_than_e', and 'q' holds the words of a
+        text search.
+
+    Returns:
+        dict of the filter arguments of ProductService.get_product_filtered (and
+        AsyncProductService.build_query).
+
+    Raises:
+        ValueError: If a numeric filter could not be converted to integer.
+    """
+
+    filters= {
+        "name": request.GET.get("name", ""),
+        "category": request.GET.get("category", ""),
+        "brand": request.GET.get("brand", ""),
+        "search": request.GET.get("q", "").strip(),
+    }
+    for param in NUMERIC_FILTER_PARAMS:
+        value= request.GET.get(param, "-1")
+        try:
+            filters[param]= int(value)
+        except ValueError as e:
+            raise ValueError(f"{param} parameter {value} could not be converted to " \
+                "integer") from e
+    return filters
+
+
+def filter_products(request: HttpRequest, fields: list= None):
+    """
+    Builds the queryset of the products matching the filters in the query params of a request.
+
+    Args:
+        request: An HttpRequest instance created by django, with the filters of parse_filters.
+        fields: Names of the fields to fetch, None to fetch all fields.
+
+    Returns:
+        QuerySet yielding raw documents.
+
+    Raises:
+        ValueError: If a numeric filter could not be converted to integer.
+    """
+
+    return ProductService.get_product_filtered(**parse_filters(request), raw= True, \
+        fields= fields)
+
+
+def product_export_endpoint(request: HttpRequest):
+    """
+    Controller to export all the products matching the filters, as one streamed response.
+
+    Called when the request is GET /products/export. Unlike GET /products, there is no page
+    limit: the products are read from a single database cursor, EXPORT_BATCH_SIZE at a time,
+    and written to the response as they arrive, so the memory used does not depend on the
+    size of the catalog.
+
+    Args:
+        request: An HttpRequest instance created by django. Accepts the same filters and
+        'fields' parameter as GET /products. 'format' is either "ndjson" (default) or "csv".
+        The response is gzip compressed if the Accept-Encoding header allows gzip (with a
+        q-value above 0), or if 'gzip' is set to true.
+
+    Returns:
+        StreamingHttpResponse instance, with one product per line. Successful response code
+        is 200.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to export products"
+        return generate_error_response(request, 405, details, suggestion)
+
+    params= parse_export_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+
+    try:
+        data= filter_products(request, params["fields"])
+    except ValueError:
+        details= "Numeric filter parameters could not be converted to integer"
+        suggestion= "Check if price and quantity filters are integers"
+        return generate_error_response(request, 400, details, suggestion)
+
+    products= ProductService.stream_products(data, EXPORT_BATCH_SIZE)
+    if params["format"]== "csv":
+        chunks= csv_chunks(products, params["columns"])
+    else:
+        chunks= ndjson_chunks(products)
+    if params["gzip"]:
+        chunks= gzip_chunks(chunks)
+    return export_response(chunks, params)
+
+
+def parse_export_params(request: HttpRequest):
+    """
+    Parses the params of an export request, other than the filters.
+
+    Returns:
+        dict with format ("ndjson" or "csv"), fields (None for all fields), columns (of the CSV
+        export), and gzip (whether to compress the response), or an error HttpResponse if a
+        param is invalid.
+    """
+
+    export_format= request.GET.get("format", "ndjson").lower()
+    if export_format not in EXPORT_CONTENT_TYPES:
+        details= f"format parameter {export_format} is not supported"
+        suggestion= f"Use one of {', '.join(EXPORT_CONTENT_TYPES)}, or omit the format " \
+            "parameter to export as ndjson"
+        return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        fields= parse_fields(request.GET.get("fields", ""))
+    except ValueError as e:
+        details= f"fields parameter is invalid: {e}"
+        suggestion= "Check the spelling of the fields, or omit the fields parameter to get " \
+            "all fields"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return {
+        "format": export_format,
+        "fields": fields,
+        "columns": ["id"]+ [field for field in fields if field!= "id"] if fields \
+            else list(PROJECTABLE_FIELDS),
+        "gzip": request.GET.get("gzip", "false").lower() in ("true", "1") \
+            or accepts_gzip(request.headers.get("Accept-Encoding", "")),
+    }
+
+
+def export_response(chunks, params: dict)-> StreamingHttpResponse:
+    """
+    Builds the streamed response of an export.
+
+    Args:
+        chunks: iterable, or async iterable, of the bytes of the content.
+        params: the export params, as returned by parse_export_params.
+    """
+    export_format= params["format"]
+    response= StreamingHttpResponse(chunks, content_type= EXPORT_CONTENT_TYPES[export_format])
+    response.headers["Content-Disposition"]= f'attachment; filename="products.{export_format}"'
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if params["gzip"]:
+        response.headers["Content-Encoding"]= "gzip"
     return response
 
 
+def product_facets_endpoint(request: HttpRequest):
+    """
+    Controller to count the products per category, per brand, and per price bucket.
+
+    Called when the request is GET /products/facets. All the facets are computed with one
+    aggregation, and cached per filter signature.
+
+    Args:
+        request: An HttpRequest instance created by django. Accepts the same filters as
+        GET /products. Every facet is counted with all the filters but its own.
+
+    Returns:
+        HttpResponse instance, with JSON payload {"total", "category", "brand", "price"}, as
+        described in ProductService.format_facets. Successful response code is 200.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to get the facets"
+        return generate_error_response(request, 405, details, suggestion)
+
+    try:
+        data= filter_products(request)
+    except ValueError:
+        details= "Numeric filter parameters could not be converted to integer"
+        suggestion= "Check if price and quantity filters are integers"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return json_response(ProductService.get_facets(data))
+
+
+def product_suggest_endpoint(request: HttpRequest):
+    """
+    Controller to suggest products whose name starts with a prefix, for type-ahead search.
+
+    Called when the request is GET /products/suggest. Suggestions are answered from an
+    in-memory index of the product names, without querying the database.
+
+    Args:
+        request: An HttpRequest instance created by django. 'prefix' is the start of the name,
+        as typed (case and accents are ignored). 'limit' is the maximum number of suggestions,
+        10 by default, and at most SUGGEST_MAX_LIMIT.
+
+    Returns:
+        HttpResponse instance, with JSON payload {"data": [{"_id", "name", "quantity"}, ...]},
+        the products with the most stock first. Successful response code is 200.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to get suggestions"
+        return generate_error_response(request, 405, details, suggestion)
+
+    params= parse_suggest_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    return json_response({"data": ProductService.suggest_products(*params)})
+
+
+def parse_suggest_params(request: HttpRequest):
+    """
+    Parses and validates the params of a suggestion request.
+
+    Returns:
+        tuple (prefix, limit), or the error response to send if a param is invalid.
+    """
+
+    prefix= request.GET.get("prefix", "").strip()
+    if not prefix:
+        details= "prefix parameter is required"
+        suggestion= "Resubmit the request with the start of a product name, e.g. ?prefix=cha"
+        return generate_error_response(request, 400, details, suggestion)
+
+    try:
+        limit= int(request.GET.get("limit", "10"))
+    except ValueError:
+        limit= 0
+    if not 0< limit<= SUGGEST_MAX_LIMIT:
+        details= f"limit parameter {request.GET.get('limit')} must be an integer between 1 " \
+            f"and {SUGGEST_MAX_LIMIT}"
+        suggestion= "Resubmit request with a smaller limit, or omit it to get 10 suggestions"
+        return generate_error_response(request, 400, details, suggestion)
+
+    return prefix, limit
+
+
 def update_product(request: HttpRequest, request_id: int):
     """
     Controller to (partially) update a product in the database.
 
     Called when the request is PATCH /products/<id>. Only the id field cannot be modified.
+    The update is sent as a single write, and the product is not read before.
 
     Args:
         request: An HttpRequest instance created by django. Payload must only contain the
@@ -218,23 +1029,26 @@ def update_product(request: HttpRequest, request_id: int):
 
     data= json.loads(request.body)
 
-    try:
-        request_product= Product.objects.get(id=request_id)
-    except DoesNotExist:
-        details= f"Product with id {request_id} does not exist"
-        suggestion= "Use 'GET /products' to get a list of existing products with id"
-        return generate_error_response(request, 404, details, suggestion)
-
     # Modify each key specified in the request
     for key in data.keys():
         if key=="id":
             details= "Product ID cannot be updated"
             suggestion= "Remove 'id' field from your request, or check if it matches the URI"
             return generate_error_response(request, 400, details, suggestion)
-    request_product.modify_fields(data)
+
+    try:
+        ProductService.update_product(request_id, data)
+    except DoesNotExist:
+        details= f"Product with id {request_id} does not exist"
+        suggestion= "Use 'GET /products' to get a list of existing products with id"
+        return generate_error_response(request, 404, details, suggestion)
+    except ValidationError as e:
+        details= f"Product could not be updated: {e}"
+        suggestion= "Check the field names and values in your request"
+        return generate_error_response(request, 400, details, suggestion)
 
     response= JsonResponse({})
-    response.headers["Location"]= f"/products/{request_product.id}"  # Location of resource
+    response.headers["Location"]= f"/products/{request_id}"  # Location of resource
     response.status_code= 204  # No content in body
     return response
 
@@ -243,7 +1057,8 @@ def delete_product(request: HttpRequest, request_id: str):
     """
     Controller to delete a product in the database.
 
-    Called when the request is DELETE /products/<id>. ID must be valid.
+    Called when the request is DELETE /products/<id>. ID must be valid. The delete is sent as
+    a single write, and the product is not read before.
 
     Args:
         request: An HttpRequest instance created by django. Payload does not matter.
@@ -253,8 +1068,8 @@ def delete_product(request: HttpRequest, request_id: str):
     """
 
     try:
-        Product.objects.get(id=request_id).delete()
-    except DoesNotExist:
+        ProductService.delete_product(request_id)
+    except (DoesNotExist, ValidationError) as _:
         details= f"Product with id {request_id} does not exist"
         suggestion= "Use 'GET /products' to get a list of existing products with id"
         return generate_error_response(request, 404, details, suggestion)
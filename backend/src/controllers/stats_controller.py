@@ -0,0 +1,64 @@
+"""
+This module is the controller for the /stats endpoints, which report on the internals of the
+server process that answers the request.
+"""
+
+from django.http import HttpRequest, JsonResponse
+from src.utils.error import generate_error_response
+from src.db.db_init import pool_stats
+from src.utils.cache import product_cache
+from src.utils.validation import CATEGORY_TITLES
+from src.services.product_service import COUNT_CACHE, FACET_CACHE
+from src.controllers.product_controller import PAGE_CACHE
+
+
+def cache_stats_endpoint(request: HttpRequest):
+    """
+    Controller to report the size, hits, and misses of the caches of this process.
+
+    Called when the request is GET /stats/caches. As every server process has its own caches,
+    the numbers are those of the process that answered.
+
+    Args:
+        request: An HttpRequest instance created by django.
+
+    Returns:
+        JsonResponse instance, with one entry per cache. Successful response code is 200.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to get the cache statistics"
+        return generate_error_response(request, 405, details, suggestion)
+
+    return JsonResponse({
+        "product_pages": PAGE_CACHE.stats(),
+        "product_counts": COUNT_CACHE.stats(),
+        "product_facets": FACET_CACHE.stats(),
+        "products": {"size": len(product_cache.local), **product_cache.stats},
+        "category_titles": CATEGORY_TITLES.stats(),
+    })
+
+
+def connection_stats_endpoint(request: HttpRequest):
+    """
+    Controller to report the options and the connection pool stats of the database clients of
+    this process.
+
+    Called when the request is GET /stats/connections. As every server process has its own
+    connection pools, the numbers are those of the process that answered.
+
+    Args:
+        request: An HttpRequest instance created by django.
+
+    Returns:
+        JsonResponse instance, with the client options, and the stats of the pools of the sync
+        and async views. Successful response code is 200.
+    """
+
+    if request.method!= "GET":
+        details= f"No endpoint for {request.method} request"
+        suggestion= "Use a GET request to get the connection statistics"
+        return generate_error_response(request, 405, details, suggestion)
+
+    return JsonResponse(pool_stats())
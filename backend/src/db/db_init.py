@@ -1,14 +1,277 @@
-from mongoengine import connect
-from bson.binary import UuidRepresentation
+"""
+Contains the connection manager of the database.
+
+The settings are read from .env once per process. init_db registers the mongoengine connection
+without connecting, so no socket is opened until the first query: a server that forks its
+workers after loading the application (e.g. gunicorn --preload) never shares a connection pool
+between processes. As a safeguard, a forked child forgets the clients of its parent, without
+closing them, and makes its own on first use.
+
+The pool is configured with the MONGO_* settings of POOL_SETTINGS, and can be filled before
+the first requests with warm_up (warm_up_async for the client of the async views). The
+connection pool events of both clients are counted by PoolStats.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from dotenv import dotenv_values
+from mongoengine import connect, Document
+from mongoengine import connection as mongoengine_connection
+from mongoengine.base.common import _get_documents_by_db
+from mongoengine.connection import get_db, DEFAULT_CONNECTION_NAME
+from pymongo import AsyncMongoClient, monitoring
+
+# Options of the clients, with the setting (in .env) that overrides them, and their default
+POOL_SETTINGS= {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", 100),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", 5),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", 300000),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", 5000),
+}
+
+_config= None
+# Database of the async views, connected on first use (in the event loop of the server)
+_async_db= None
+_connected= False
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Counts the connection pool events of a client.
+    """
+
+    def __init__(self):
+        self._lock= threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Sets all the counters to zero.
+        """
+        with self._lock:
+            self.created= 0
+            self.closed= 0
+            self.checked_out= 0
+            self.checked_in= 0
+            self.waiting= 0
+            self.max_in_use= 0
+            self.checkout_failures= 0
+            self.cleared= 0
+
+    def snapshot(self)-> dict:
+        """
+        Returns the current counters.
+
+        Returns:
+            dict with the connections open and in use (and the most in use at once), the
+            checkouts waiting for a connection, and the connections created, closed, and failed
+            checkouts, and pool clears since the process started.
+        """
+        with self._lock:
+            return {
+                "open": self.created- self.closed,
+                "in_use": self.checked_out- self.checked_in,
+                "max_in_use": self.max_in_use,
+                "waiting": self.waiting,
+                "created": self.created,
+                "closed": self.closed,
+                "checkout_failures": self.checkout_failures,
+                "cleared": self.cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.cleared+= 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created+= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed+= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting+= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting-= 1
+            self.checkout_failures+= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting-= 1
+            self.checked_out+= 1
+            self.max_in_use= max(self.max_in_use, self.checked_out- self.checked_in)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_in+= 1
+
+
+# Pool events of the mongoengine client, and of the client of the async views
+POOL_STATS= {"sync": PoolStats(), "async": PoolStats()}
+
+
+def get_config()-> dict:
+    """
+    Returns the settings in .env, read on the first call only.
+    """
+    global _config
+    if _config is None:
+        _config= dotenv_values(".env")
+    return _config
+
+
+def client_options()-> dict:
+    """
+    Returns the options of the clients, from the settings in .env.
+
+    Besides POOL_SETTINGS, MONGO_COMPRESSORS can be a comma separated list of the wire
+    compressors to negotiate with the server, in order of preference, such as "zstd,zlib"
+    (zstd and snappy need the zstandard and python-snappy packages).
+    """
+    config= get_config()
+    options= {
+        option: int(config.get(setting) or default)
+        for option, (setting, default) in POOL_SETTINGS.items()
+    }
+    if config.get("MONGO_COMPRESSORS"):
+        options["compressors"]= config["MONGO_COMPRESSORS"]
+    if config.get("MONGO_ZLIB_COMPRESSION_LEVEL"):
+        options["zlibCompressionLevel"]= int(config["MONGO_ZLIB_COMPRESSION_LEVEL"])
+    return options
+
+
+def connection_settings()-> dict:
+    """
+    Returns the server address, credentials, and options of the clients.
+    """
+    config= get_config()
+    return {
+        "username": config["MONGO_USER"],
+        "password": config["MONGO_PASSWORD"],
+        "host": config["MONGO_HOST"],
+        "port": int(config["MONGO_PORT"]),
+        "uuidRepresentation": 'standard',
+        **client_options(),
+    }
+
 
 def init_db():
-    config= dotenv_values(".env")
+    """
+    Registers the connection of mongoengine, without connecting.
+
+    The connection pool is created on the first query, in the process that makes it. Calling
+    init_db again has no effect.
+    """
+    global _connected
+    if _connected:
+        return
     connect(
-        db= config["DB_NAME"],
-        username= config["MONGO_USER"],
-        password= config["MONGO_PASSWORD"],
-        host= config["MONGO_HOST"],
-        port= int(config["MONGO_PORT"]),
-        uuidRepresentation= 'standard'
+        db= get_config()["DB_NAME"],
+        connect= False,
+        event_listeners= [POOL_STATS["sync"]],
+        **connection_settings()
     )
+    _connected= True
+
+
+def get_async_db():
+    """
+    Returns the database for the async views, through a pymongo AsyncMongoClient.
+
+    The client is configured like the mongoengine connection made by init_db, and is shared
+    by all the async views of the process.
+    """
+    global _async_db
+    if _async_db is None:
+        client= AsyncMongoClient(event_listeners= [POOL_STATS["async"]], **connection_settings())
+        _async_db= client[get_config()["DB_NAME"]]
+    return _async_db
+
+
+def warm_up(connections: int= None)-> dict:
+    """
+    Opens connections of the mongoengine pool, so the first requests do not wait for them.
+
+    Meant to be called once a worker process has started, see gunicorn.conf.py.
+
+    Args:
+        connections: number of connections to open, defaults to minPoolSize (at least one).
+
+    Returns:
+        dict, the pool stats after the warm-up.
+    """
+    init_db()
+    connections= connections or client_options()["minPoolSize"] or 1
+    db= get_db()
+    # Concurrent pings need as many connections at once
+    with ThreadPoolExecutor(max_workers= connections) as executor:
+        list(executor.map(lambda _: db.command("ping"), range(connections)))
+    return POOL_STATS["sync"].snapshot()
+
+
+async def warm_up_async(connections: int= None)-> dict:
+    """
+    Opens connections of the pool of the async views, as warm_up does.
+
+    Must be called from the event loop that serves the async views, see src/asgi.py.
+    """
+    connections= connections or client_options()["minPoolSize"] or 1
+    db= get_async_db()
+    await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+    return POOL_STATS["async"].snapshot()
+
+
+def pool_stats()-> dict:
+    """
+    Returns the options and the pool stats of both clients of this process.
+    """
+    return {
+        "options": client_options(),
+        "sync": POOL_STATS["sync"].snapshot(),
+        "async": POOL_STATS["async"].snapshot(),
+    }
+
+
+def _reset_after_fork():
+    """
+    Forgets the clients inherited from the parent process, so the child makes its own on its
+    first query.
+
+    The clients are not closed: their sockets are shared with the parent, which may still be
+    using them. Only the references are dropped (those of mongoengine, and the collections
+    cached by the documents), keeping the registered connection settings, and no I/O is done.
+    """
+    global _async_db
+    if _connected:
+        mongoengine_connection._connections.pop(DEFAULT_CONNECTION_NAME, None)
+        mongoengine_connection._dbs.pop(DEFAULT_CONNECTION_NAME, None)
+        for document in _get_documents_by_db(DEFAULT_CONNECTION_NAME, DEFAULT_CONNECTION_NAME):
+            if issubclass(document, Document):
+                document._disconnect()
+    _async_db= None
+    for stats in POOL_STATS.values():
+        stats.reset()
+
+
+os.register_at_fork(after_in_child= _reset_after_fork)
@@ -0,0 +1,14 @@
+"""
+Versioned data migrations, run in version order by migrate.py.
+
+Every migration is a module named after its version, defining a subclass of
+src.utils.migrations.Migration. New migrations are to be added to MIGRATIONS.
+"""
+
+from src.migrations.m0001_default_category import DefaultCategory
+from src.migrations.m0002_category_counters import CategoryCounters
+
+MIGRATIONS= [
+    DefaultCategory(),
+    CategoryCounters(),
+]
@@ -0,0 +1,16 @@
+from src.models.product import Product
+from src.utils.migrations import Migration
+
+
+class DefaultCategory(Migration):
+    """
+    Gives an empty category to the products created before products had categories.
+    """
+
+    version= "0001"
+    name= "default_category"
+    document= Product
+    query= {"category": {"$exists": False}}
+
+    def update(self)-> dict:
+        return {"$set": {"category": ""}}
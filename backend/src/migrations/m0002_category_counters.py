@@ -0,0 +1,29 @@
+from src.models.product_category import ProductCategory
+from src.utils.migrations import Migration, count_categories
+
+
+class CategoryCounters(Migration):
+    """
+    Counts the products and total stock of every category, for the categories created before
+    the counters were kept by the product writes.
+
+    The products are counted with one aggregation, when the first batch is applied. The
+    counters are set, not incremented, so applying a batch again only counts again. Products
+    written between the aggregation and the last batch may be miscounted, so it is to be run
+    before serving writes.
+    """
+
+    version= "0002"
+    name= "category_counters"
+    document= ProductCategory
+    query= {}
+    projection= {"title": 1}
+
+    def __init__(self):
+        self.counts= None
+
+    def transform(self, document: dict)-> dict:
+        if self.counts is None:
+            self.counts= count_categories()
+        products, stock= self.counts.get(document["title"], (0, 0))
+        return {"$set": {"product_count": products, "total_stock": stock}}
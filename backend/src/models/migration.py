@@ -0,0 +1,34 @@
+"""
+Migration checkpoint document schema
+{
+    version: <str> (required, unique)
+    name: <str>
+    status: <str> "running" or "done"
+    last_id: <ObjectId> (_id of the last document of the last batch applied)
+    processed: <int> (documents examined so far)
+    modified: <int> (documents modified so far)
+    started_at: <datetime.datetime>
+    finished_at: <datetime.datetime>
+}
+"""
+
+import datetime
+from mongoengine import Document, StringField, IntField, DateTimeField, ObjectIdField
+
+class MigrationState(Document):
+    """
+    Represents the progress of a data migration, checkpointed after every batch.
+    """
+    version= StringField(required= True, unique= True)
+    name= StringField()
+    status= StringField(choices= ("running", "done"), default= "running")
+    last_id= ObjectIdField()
+    processed= IntField(default= 0)
+    modified= IntField(default= 0)
+
+    started_at= DateTimeField(default= lambda: datetime.datetime.now(datetime.timezone.utc))
+    finished_at= DateTimeField()
+
+    meta = {
+        'collection': 'migrations',
+    }
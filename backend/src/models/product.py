@@ -16,8 +16,10 @@ from mongoengine import Document, StringField, IntField, DateTimeField
 from mongoengine.errors import ValidationError, DoesNotExist
 
 from src.utils.validation import validate_category
+from src.utils.cache import product_generation, product_cache
+from src.utils.suggest import product_suggestions
+from src.utils.category_counters import count_product, update_category_counters
 
-from src.utils.validation import validate_category
 class Product(Document):
     name= StringField(required= True)
     price= IntField(required= True, min_value=0)
@@ -29,15 +31,71 @@ class Product(Document):
     created_at= DateTimeField(default= lambda: datetime.datetime.now(datetime.timezone.utc))
     modified_at= DateTimeField(default= lambda: datetime.datetime.now(datetime.timezone.utc))
 
+    # Fields that can be given when creating or updating a product
+    WRITABLE_FIELDS= frozenset({"name", "price", "brand", "quantity", "description", "category"})
+
+    # Sorts of the product list (the sort param), each served by the index of its fields and
+    # the id, read backwards for the sort in the opposite directions. sort=price is completed to
+    # price,-created_at, so one index serves both
+    SORTS= (("name",), ("quantity",), ("created_at",), ("price", "-created_at"))
+    # Sorts of the products of a category, each served by the index of the category, its
+    # fields, and the id
+    CATEGORY_SORTS= (("price",), ("created_at",))
+    # Indexes removed from meta['indexes'], along with the declared indexes serving their
+    # queries. advise_indexes.py --drop-superseded drops them from existing databases
+    RETIRED_INDEXES= (
+        ('price', 'id'),  # ('price', '-created_at', 'id'), as sort=price is completed
+        ('category', 'price', 'quantity'),  # ('category', 'price', 'id')
+        ('id', 'name', 'price', 'quantity'),  # _id, reading the documents
+    )
+
     meta = {
+        # Every index is paid for on every write: an index that is the prefix of another one is
+        # not added
         'indexes': [
-            'name',
-            'quantity',
-            'category',
-            'price',
+            # Sorts, the first field of which is also filtered on
+            ('name', 'id'),
+            ('quantity', 'id'),
+            ('created_at', 'id'),
+            ('price', '-created_at', 'id'),
+            # Sorts of a category, the most common filter
+            ('category', 'price', 'id'),
+            ('category', 'created_at', 'id'),
+            # Cover the category views (fields=name,price,quantity), paged by id, and the price
+            # ranges of a category, also counted with ('category', 'price', 'id')
+            ('category', 'id', 'name', 'price', 'quantity'),
+            # Filter combinations of the list (see advise_indexes.py). Pages are sorted by id, so
+            # equality, then id, then ranges; counts are not sorted, so equality, then ranges
+            ('brand', 'id', 'price', 'quantity'),
+            ('brand', 'quantity', 'price'),
+            # Text search (q= on the product list), a match in the name counts the most
+            {
+                'fields': ['$name', '$brand', '$description'],
+                'weights': {'name': 10, 'brand': 5, 'description': 1},
+                'default_language': 'english',
+                'name': 'product_text',
+            },
         ]
     }
 
+    def __init__(self, *args, **values):
+        super().__init__(*args, **values)
+        # Category and stock as last counted in the category counters, None until first saved
+        self._counted= None if self._created else (self.category, self.quantity)
+
+    def _update_category_counters(self, exists: bool):
+        """
+        Updates the category counters for the saved (exists) or deleted product, from the
+        category and stock last counted.
+        """
+        deltas= {}
+        if self._counted is not None:
+            count_product(deltas, *self._counted, sign= -1)
+        if exists:
+            count_product(deltas, self.category, self.quantity)
+        update_category_counters(deltas)
+        self._counted= (self.category, self.quantity) if exists else None
+
     def modify_stock(self, amount: int):
         """
         Updates the product stock by increasing its quantity by the specified amount (integer).
@@ -55,7 +113,7 @@ class Product(Document):
         """
         if self.quantity+ amount< 0:
             raise ValueError("Stock cannot be negative.")
-        self.quantity-= amount
+        self.quantity+= amount
         self.save()
         return self.quantity
 
@@ -116,9 +174,8 @@ class Product(Document):
         Raises:
             KeyError: If an invalid field is included in the update.
         """
-        allowed_fields = {"name", "price", "brand", "quantity", "description", "category"}
         for key, value in data.items():
-            if key not in allowed_fields:
+            if key not in self.WRITABLE_FIELDS:
                 raise KeyError(f"Field {key} is not a valid field.")
             setattr(self, key, value)
         self.save()
@@ -131,7 +188,8 @@ class Product(Document):
         cascade=None, cascade_kwargs=None, _refs=None, save_condition=None, \
         signal_kwargs=None, **kwargs):
         """
-        Saves the product to the database, updating the modification timestamp.
+        Saves the product to the database, updating the modification timestamp, and the
+        counters of its category (or of both, if it moved).
 
         Args:
             Arguments for the `save` method of the parent 'Document' class from mongoengine.
@@ -143,6 +201,26 @@ class Product(Document):
         super().save(force_insert=force_insert, validate=validate, clean=clean, \
             write_concern=write_concern, cascade=cascade, cascade_kwargs=cascade_kwargs, \
             _refs=_refs, save_condition=save_condition, signal_kwargs=signal_kwargs, **kwargs)
+        self._update_category_counters(exists= True)
+        product_generation.bump()
+        product_cache.delete(str(self.id))
+        product_suggestions.update(self.id, self.name, self.quantity)
+
+    def delete(self, signal_kwargs=None, **write_concern):
+        """
+        Deletes the product from the database, removing it from the counters of its category.
+
+        Args:
+            Arguments for the `delete` method of the parent 'Document' class from mongoengine.
+
+        Returns:
+            None.
+        """
+        super().delete(signal_kwargs=signal_kwargs, **write_concern)
+        self._update_category_counters(exists= False)
+        product_generation.bump()
+        product_cache.delete(str(self.id))
+        product_suggestions.remove(self.id)
 
 def create_product(data: dict)-> Product:
     """
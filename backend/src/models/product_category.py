@@ -1,18 +1,21 @@
 import datetime
-from mongoengine import Document, StringField
+from mongoengine import Document, StringField, IntField
 
 class ProductCategory(Document):
     """
     Represents a category of products.
 
-    Each category has a title and an optional description.
+    Each category has a title and an optional description, and counts the products holding its
+    title and their total stock. The counters are kept up to date by the product writes (see
+    src.utils.category_counters), never set directly.
     """
     title = StringField(required=True, unique=True)
     description = StringField(max_length=250)
+    product_count = IntField(default=0)
+    total_stock = IntField(default=0)
 
     meta = {
         'indexes': [
             'title',
         ]
-    }
-    description = StringField(max_length=250)
\ No newline at end of file
+    }
\ No newline at end of file
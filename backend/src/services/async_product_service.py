@@ -0,0 +1,345 @@
+"""
+Service layer for the async views, on the products collection.
+
+Queries are made with pymongo's AsyncMongoClient (see get_async_db), so the views waiting on
+the database leave the event loop free to serve other requests. Validation, caches, and write
+generations are shared with ProductService, so a product written through either stack is seen
+the same way by both.
+"""
+
+import datetime
+from asgiref.sync import sync_to_async
+from bson import json_util, ObjectId
+from pymongo import ReturnDocument
+from mongoengine.errors import DoesNotExist
+from src.db.db_init import get_async_db
+from src.models.product import Product
+from src.models.product_category import ProductCategory
+from src.services.product_service import ProductService, COUNT_CACHE, FACET_CACHE, \
+    to_object_id
+from src.utils.cache import product_generation, product_cache
+from src.utils.category_counters import count_product, counter_updates
+from src.utils.pagination import async_keyset_page, db_field, keyset_stages, page_result, \
+    with_tiebreaker, DEFAULT_SORT, SEARCH_SORT, TEXT_SCORE_FIELD
+from src.utils.suggest import product_suggestions
+from src.utils.validation import find_unknown_categories
+
+#pylint: disable=no-member
+
+
+class AsyncProductService:
+    """
+    Async service layer for reading and writing products.
+    """
+
+    @staticmethod
+    def collection():
+        """
+        Returns the AsyncCollection of the products.
+        """
+        return get_async_db()[Product._get_collection_name()]
+
+    @staticmethod
+    async def update_category_counters(deltas: dict) -> None:
+        """
+        Applies category counter differences, in one unordered bulk_write, as
+        src.utils.category_counters.update_category_counters does.
+        """
+        operations = counter_updates(deltas)
+        if operations:
+            await get_async_db()[ProductCategory._get_collection_name()].bulk_write(
+                operations, ordered=False)
+
+    @staticmethod
+    def build_query(name: str, category: str, brand: str, price_less_than_e: int, \
+        price_greater_than_e: int, quantity_less_than_e: int, quantity_greater_than_e: int, \
+        search: str = "") -> dict:
+        """
+        Builds the raw filter of the products matching the given filters.
+
+        The filter has the same form as the query of the QuerySet built by
+        ProductService.get_product_filtered for the same filters, so both stacks share the
+        cached counts. Arguments are as for get_product_filtered.
+
+        Returns:
+            dict, raw MongoDB filter.
+        """
+        query = {}
+        if name != "":
+            query["name"] = name
+        if brand != "":
+            query["brand"] = brand
+        if category != "":
+            query["category"] = category
+
+        for field, upper, lower in (
+            ("price", price_less_than_e, price_greater_than_e),
+            ("quantity", quantity_less_than_e, quantity_greater_than_e),
+        ):
+            bounds = {}
+            if upper > -1:
+                bounds["$lte"] = upper
+            if lower > -1:
+                bounds["$gte"] = lower
+            if bounds:
+                query[field] = bounds
+
+        if search:
+            query["$text"] = {"$search": search}
+        return query
+
+    @staticmethod
+    def projection(fields: list) -> dict:
+        """
+        Converts the names of the fields to fetch to a raw projection, None for all fields.
+        """
+        return {db_field(field): True for field in fields} if fields else None
+
+    @staticmethod
+    async def count_products(query: dict) -> int:
+        """
+        Counts the products matched by a raw filter, as ProductService.count_products does.
+        """
+        if not query:
+            return await AsyncProductService.collection().estimated_document_count()
+
+        key = (product_generation.value, json_util.dumps(query, sort_keys=True))
+        count = COUNT_CACHE.get(key)
+        if count is None:
+            count = await AsyncProductService.collection().count_documents(query)
+            COUNT_CACHE.set(key, count)
+        return count
+
+    @staticmethod
+    async def get_facets(query: dict) -> dict:
+        """
+        Computes the facets of the products matched by a raw filter, as ProductService.get_facets
+        does, sharing its cache.
+        """
+        key = (product_generation.value, json_util.dumps(query, sort_keys=True))
+        facets = FACET_CACHE.get(key)
+        if facets is None:
+            cursor = await AsyncProductService.collection().aggregate(
+                ProductService.facet_pipeline(query))
+            facets = ProductService.format_facets((await cursor.to_list())[0])
+            FACET_CACHE.set(key, facets)
+        return facets
+
+    @staticmethod
+    async def get_offset_page(query: dict, start_index: int, limit: int, fields: list = None, \
+        sort: list = None) -> list:
+        """
+        Fetches limit products matched by a raw filter, skipping the first start_index.
+
+        The products are sorted by sort (by id if None), with the id tiebreaker. The products of
+        a text search are sorted by relevance, then by id, with their score. The fields of the
+        sort are always fetched, as the last product makes the cursor of the next page.
+
+        Returns:
+            list of raw documents.
+        """
+        projection = AsyncProductService.projection(fields)
+        sort = with_tiebreaker(sort or DEFAULT_SORT)
+        if projection:
+            projection.update({db_field(field): True for field, _ in sort})
+        cursor = AsyncProductService.collection()
+        if "$text" in query:
+            score = {"$meta": "textScore"}
+            cursor = cursor.find(query, {**(projection or {}), TEXT_SCORE_FIELD: score}) \
+                .sort([(TEXT_SCORE_FIELD, score), ("_id", 1)])
+        else:
+            cursor = cursor.find(query, projection).sort([
+                (db_field(field), direction) for field, direction in sort
+            ])
+        return await cursor.skip(start_index).limit(limit).to_list()
+
+    @staticmethod
+    def stream_products(query: dict, fields: list = None, batch_size: int = 1000):
+        """
+        Opens a cursor over all the products matched by a raw filter, in id order, as
+        ProductService.stream_products does.
+
+        Returns:
+            AsyncCursor, fetching batch_size documents per round trip, to be read with
+            to_list(batch_size) until it returns an empty list.
+        """
+        return AsyncProductService.collection() \
+            .find(query, AsyncProductService.projection(fields)) \
+            .sort([("_id", 1)]).batch_size(batch_size)
+
+    @staticmethod
+    async def get_keyset_page(query: dict, limit: int, cursor: str = None, fields: list = None, \
+        sort: list = None):
+        """
+        Fetches a page of the products matched by a raw filter, in cursor mode, sorted by sort
+        (by id if None).
+
+        The products of a text search are paged by relevance, with an aggregation, as
+        ProductService.search_products does.
+
+        Returns:
+            tuple (documents, next_cursor), as returned by async_keyset_page.
+
+        Raises:
+            InvalidCursorError: If the cursor token is invalid.
+        """
+        if "$text" in query:
+            sort = with_tiebreaker(SEARCH_SORT)
+            pipeline = [
+                {"$match": query},
+                {"$addFields": {TEXT_SCORE_FIELD: {"$meta": "textScore"}}},
+            ] + keyset_stages(sort, limit, cursor, AsyncProductService.projection(fields))
+            documents = await (await AsyncProductService.collection().aggregate(pipeline)) \
+                .to_list()
+            return page_result(documents, limit, sort)
+
+        return await async_keyset_page(AsyncProductService.collection(), query, limit, cursor, \
+            sort, AsyncProductService.projection(fields))
+
+    @staticmethod
+    async def get_product_document(product_id: str) -> dict:
+        """
+        Fetches the raw document of a product, through the product cache.
+
+        Returns:
+            The raw document, which is shared with the cache and must not be modified.
+
+        Raises:
+            DoesNotExist: If the product does not exist, or the id is not a valid ObjectId.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        key = str(ObjectId(product_id))
+        document = product_cache.peek(key)
+        if document is not None:
+            return document
+
+        generation = product_generation.value
+        document = await AsyncProductService.collection().find_one({"_id": ObjectId(product_id)})
+        if document is None:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        product_cache.put(key, document, generation)
+        return document
+
+    @staticmethod
+    async def get_product_version(product_id: str) -> dict:
+        """
+        Fetches only the id and modification timestamp of a product, as
+        ProductService.get_product_version does.
+
+        Raises:
+            DoesNotExist: If the product does not exist, or the id is not a valid ObjectId.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        cached = product_cache.peek_shared(str(ObjectId(product_id)))
+        if cached is not None:
+            return {"_id": cached["_id"], "modified_at": cached.get("modified_at")}
+        version = await AsyncProductService.collection().find_one(
+            {"_id": ObjectId(product_id)}, projection={"modified_at": True})
+        if version is None:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        return version
+
+    @staticmethod
+    async def update_product(product_id: str, data: dict) -> None:
+        """
+        Updates specified fields of a product, in a single write, as
+        ProductService.update_product does.
+
+        Raises:
+            DoesNotExist: If the product does not exist.
+            ValidationError: If the ID, a field, or a value is invalid.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        # The category titles are cached, so this rarely queries the database
+        unknown = await sync_to_async(find_unknown_categories)([data["category"]]) \
+            if isinstance(data.get("category"), str) else set()
+        object_id, changes = ProductService._validate_changes(
+            {"id": product_id, "changes": data}, unknown
+        )
+
+        changes["modified_at"] = datetime.datetime.now(datetime.timezone.utc)
+        collection = AsyncProductService.collection()
+        if "category" in changes or "quantity" in changes:
+            before = await collection.find_one_and_update(
+                {"_id": object_id},
+                {"$set": changes},
+                projection={"category": True, "quantity": True},
+                return_document=ReturnDocument.BEFORE,
+            )
+            if before is None:
+                raise DoesNotExist(f"Product with id {product_id} does not exist")
+            await AsyncProductService.update_category_counters(
+                ProductService._counter_deltas(before, changes))
+        elif (await collection.update_one({"_id": object_id}, {"$set": changes})) \
+            .matched_count == 0:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        product_generation.bump()
+        product_cache.delete(str(object_id))
+        product_suggestions.update(object_id, changes.get("name"), changes.get("quantity"))
+
+    @staticmethod
+    async def delete_product(product_id: str) -> None:
+        """
+        Deletes a product from the database, with a single find_one_and_delete write, as
+        ProductService.delete_product does.
+
+        Raises:
+            DoesNotExist: If the product does not exist.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        deleted = await AsyncProductService.collection().find_one_and_delete(
+            {"_id": ObjectId(product_id)}, projection={"category": True, "quantity": True})
+        if deleted is None:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        deltas = {}
+        count_product(deltas, deleted.get("category"), deleted.get("quantity"), sign=-1)
+        await AsyncProductService.update_category_counters(deltas)
+        product_generation.bump()
+        product_cache.delete(str(ObjectId(product_id)))
+        product_suggestions.remove(ObjectId(product_id))
+
+    @staticmethod
+    async def modify_stock(product_id: str, amount: int) -> int:
+        """
+        Modifies the stock of a product atomically, with a single conditional $inc, as
+        ProductService.modify_stock does.
+
+        Returns:
+            Updated stock quantity.
+
+        Raises:
+            DoesNotExist: If the product does not exist.
+            ValidationError: If the product ID is invalid.
+            ValueError: If stock would go negative.
+        """
+        object_id = to_object_id(product_id)
+        query = {"_id": object_id}
+        if amount < 0:
+            query["quantity"] = {"$gte": -amount}
+
+        collection = AsyncProductService.collection()
+        updated = await collection.find_one_and_update(
+            query,
+            {
+                "$inc": {"quantity": amount},
+                "$set": {"modified_at": datetime.datetime.now(datetime.timezone.utc)},
+            },
+            projection={"quantity": True, "category": True},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is None:
+            if amount < 0 and await collection.count_documents({"_id": object_id}, limit=1):
+                raise ValueError("Stock cannot be negative.")
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+
+        await AsyncProductService.update_category_counters(ProductService._counter_deltas(
+            {"category": updated.get("category"), "quantity": updated["quantity"] - amount},
+            {"quantity": updated["quantity"]}))
+        product_generation.bump()
+        product_cache.delete(str(object_id))
+        product_suggestions.update(object_id, quantity=updated["quantity"])
+        return updated["quantity"]
@@ -1,5 +1,6 @@
 from src.models.product_category import ProductCategory
 from src.models.product import Product
+from src.utils.validation import invalidate_category_titles
 
 #pylint: disable=no-member
 
@@ -22,8 +23,28 @@ class ProductCategoryService:
         """
         category = ProductCategory(title=title, description=description)
         category.save()
+        invalidate_category_titles()
         return category
 
+    @staticmethod
+    def list_categories() -> list:
+        """
+        Lists every product category, with its product count and total stock.
+
+        The counters are stored on the categories, so this is one query on the (small)
+        categories collection, however many products there are.
+
+        Returns:
+            List of raw documents (dicts) of the categories, ordered by title, with the id,
+            title, description, product_count, and total_stock.
+        """
+        categories = list(ProductCategory.objects.order_by("title").as_pymongo())
+        for category in categories:
+            # Categories created before the counters, until migration 0002 counts them
+            category.setdefault("product_count", 0)
+            category.setdefault("total_stock", 0)
+        return categories
+
     @staticmethod
     def get_category_by_id(category_id: str)-> ProductCategory:
         """
@@ -70,6 +91,7 @@ class ProductCategoryService:
         if description is not None:
             category.description= description
         category.save()
+        invalidate_category_titles()
         return category
 
     @staticmethod
@@ -85,19 +107,32 @@ class ProductCategoryService:
         """
         category = ProductCategory.objects.get(id=category_id)
         category.delete()
+        invalidate_category_titles()
 
     @staticmethod
-    def list_products_in_category(category_id: str):
+    def list_products_in_category(category_title: str, raw: bool = False, fields: list = None):
         """
         Lists all products belonging to a category.
 
+        Products hold the title of their category, so they are matched by title, with the
+        indexes starting with the category.
+
         Args:
-            category_id: ID of the category.
+            category_title: Title of the category.
+            raw: If True, yields raw documents (dicts) as fetched from the database, without
+                constructing a Product instance for each one. Meant for read-only use.
+            fields: Names of the fields to fetch (the id is always fetched). None fetches all.
 
         Returns:
-            List of Product instances in the category.
+            QuerySet of Product instances (or raw documents) in the category, to be paged or
+            iterated over.
         """
-        return Product.objects(category=category_id)
+        products = Product.objects(category=category_title)
+        if fields:
+            products = products.only(*fields)
+        if raw:
+            products = products.as_pymongo()
+        return products
 
     @staticmethod
     def add_product_to_category(product_id: str, category_id: str):
@@ -113,7 +148,7 @@ class ProductCategoryService:
         """
         product = Product.objects.get(id=product_id)
         category = ProductCategory.objects.get(id=category_id)
-        product.category = category
+        product.category = category.title
         product.save()
         return product
 
@@ -1,7 +1,50 @@
+import datetime
+import threading
+from bson import json_util, ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from mongoengine.errors import DoesNotExist, ValidationError
 from src.models.product import Product  # Assuming the Product model is in models/product.py
+from src.utils.cache import TTLCache, product_generation, product_cache
+from src.utils.category_counters import count_product, update_category_counters
+from src.utils.pagination import aggregate_keyset_page, SEARCH_SORT, TEXT_SCORE_FIELD
+from src.utils.suggest import product_suggestions
+from src.utils.validation import find_unknown_categories
 
 #pylint: disable=no-member
 
+# Totals of filtered listings, keyed by write generation and filter signature
+COUNT_CACHE= TTLCache(ttl= 60, max_size= 1024)
+# Facet counts of filtered listings, keyed like COUNT_CACHE
+FACET_CACHE= TTLCache(ttl= 60, max_size= 1024)
+
+# Lower bounds of the price buckets, the last bucket has no upper bound
+PRICE_BUCKETS= [0, 500, 1000, 2500, 5000, 10000, 25000]
+# Stages of every facet, run on the products matching the filters of the other facets
+FACET_STAGES= {
+    "category": [{"$sortByCount": "$category"}],
+    "brand": [{"$sortByCount": "$brand"}],
+    "price": [{"$bucket": {
+        "groupBy": "$price",
+        "boundaries": PRICE_BUCKETS,
+        "default": PRICE_BUCKETS[-1],
+    }}],
+}
+
+def to_object_id(product_id: str) -> ObjectId:
+    """
+    Converts a product ID to an ObjectId, for queries made directly on the collection.
+
+    Raises:
+        ValidationError: If the ID is not a valid ObjectId, like mongoengine does.
+    """
+    try:
+        return ObjectId(product_id)
+    except (InvalidId, TypeError) as e:
+        raise ValidationError(f"'{product_id}' is not a valid ObjectId") from e
+
+
 class ProductService:
     """
     Service layer for managing products in the database.
@@ -29,6 +72,202 @@ class ProductService:
         product.save()
         return product
 
+    @staticmethod
+    def create_products(items: list, batch_size: int = 1000) -> list:
+        """
+        Creates many products at once, with unordered insert_many writes.
+
+        The categories of all items are checked with a single query, then every item is
+        validated against the Product schema. Items that fail, including items that are not
+        dictionaries (e.g. a number in a loaded file), do not stop the others from being
+        inserted.
+
+        Args:
+            items: List of dictionaries containing product details, as for create_product.
+                Optional keys also include "category". Unknown keys are ignored.
+            batch_size: Maximum number of products sent in one insert_many call.
+
+        Returns:
+            List with a result for every item, in the same order: {"id": <str>} if the product
+            was created, {"error": <str>} otherwise.
+        """
+        results = [None] * len(items)
+        unknown = find_unknown_categories(
+            {item["category"] for item in items
+                if isinstance(item, dict) and isinstance(item.get("category"), str)}
+        )
+
+        documents, positions = [], []
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[position] = {"error": "Product must be a json object"}
+                continue
+            if item.get("category") in unknown:
+                results[position] = {"error": f"Category '{item['category']}' does not exist"}
+                continue
+
+            fields = {"brand": "", "description": ""}  # Defaults, as in create_product
+            fields.update({key: value for key, value in item.items() \
+                if key in Product.WRITABLE_FIELDS})
+            product = Product(**fields)
+            try:
+                product.validate()
+            except ValidationError as e:
+                results[position] = {"error": str(e)}
+                continue
+            document = product.to_mongo()
+            document["_id"] = ObjectId()
+            documents.append(document)
+            positions.append(position)
+
+        collection = Product._get_collection()
+        deltas = {}
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            try:
+                collection.insert_many(batch, ordered=False)
+                failed = {}
+            except BulkWriteError as e:
+                failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+
+            for offset, document in enumerate(batch):
+                results[positions[start + offset]] = {"error": failed[offset]} \
+                    if offset in failed else {"id": str(document["_id"])}
+            product_suggestions.add_many([
+                (document["_id"], document["name"], document["quantity"])
+                for offset, document in enumerate(batch) if offset not in failed
+            ])
+            for offset, document in enumerate(batch):
+                if offset not in failed:
+                    count_product(deltas, document.get("category"), document["quantity"])
+
+        if documents:
+            product_generation.bump()
+        update_category_counters(deltas)
+        return results
+
+    @staticmethod
+    def update_products(updates: list) -> list:
+        """
+        Updates specified fields of many products at once, without reading them first.
+
+        Changes follow the same rules as Product.modify_fields, and every value is validated
+        against the Product schema. Every valid update is written, with a new modification
+        timestamp, so a matched product is always modified. Updates that do not change the
+        category or stock are sent in one unordered bulk_write. Those that do are written one
+        by one with find_one_and_update, which returns the category and stock the product had
+        right before the write, for the category counters.
+
+        Args:
+            updates: List of dictionaries of the form {"id": <str>, "changes": <dict>}, the
+                changes being the fields to update and their new values.
+
+        Returns:
+            List with a result for every update, in the same order, of the form
+            {"id": <str>, "matched": <bool>, "modified": <bool>}, or {"id": <str>, "error": <str>}
+            if the update is invalid or could not be written.
+        """
+        results = [None] * len(updates)
+        unknown = find_unknown_categories({
+            update["changes"]["category"] for update in updates
+            if isinstance(update, dict) and isinstance(update.get("changes"), dict)
+            and isinstance(update["changes"].get("category"), str)
+        })
+
+        valid = []
+        for position, update in enumerate(updates):
+            try:
+                valid.append((position, *ProductService._validate_changes(update, unknown)))
+            except ValidationError as e:
+                product_id = update.get("id") if isinstance(update, dict) else None
+                results[position] = {"id": product_id, "error": str(e)}
+
+        collection = Product._get_collection()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        operations, written, deltas = [], [], {}
+        for position, object_id, changes in valid:
+            update = {"$set": dict(changes, modified_at=now)}
+            if "category" not in changes and "quantity" not in changes:
+                operations.append(UpdateOne({"_id": object_id}, update))
+                written.append((position, object_id, changes))
+                continue
+
+            try:
+                before = collection.find_one_and_update({"_id": object_id}, update, \
+                    projection={"category": True, "quantity": True}, \
+                    return_document=ReturnDocument.BEFORE)
+            except OperationFailure as e:
+                results[position] = {"id": str(object_id), "error": str(e)}
+                continue
+            results[position] = {"id": str(object_id), "matched": before is not None, \
+                "modified": before is not None}
+            if before is not None:
+                ProductService._counter_deltas(before, changes, deltas)
+
+        if operations:
+            failed = {}
+            try:
+                matched = collection.bulk_write(operations, ordered=False).matched_count
+            except BulkWriteError as e:
+                failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+                matched = e.details["nMatched"]
+            # Bulk writes only report totals: if some products were not matched, the ones
+            # that exist are looked up
+            found = None if matched == len(operations) - len(failed) else {
+                document["_id"] for document in collection.find(
+                    {"_id": {"$in": [object_id for _, object_id, _ in written]}}, {"_id": True})
+            }
+            for index, (position, object_id, _) in enumerate(written):
+                if index in failed:
+                    results[position] = {"id": str(object_id), "error": failed[index]}
+                else:
+                    exists = found is None or object_id in found
+                    results[position] = {"id": str(object_id), "matched": exists, \
+                        "modified": exists}
+
+        update_category_counters(deltas)
+        if valid:
+            product_generation.bump()
+        for position, object_id, changes in valid:
+            if results[position].get("matched"):
+                product_cache.delete(str(object_id))
+                product_suggestions.update(object_id, changes.get("name"), changes.get("quantity"))
+        return results
+
+    @staticmethod
+    def _validate_changes(update: dict, unknown_categories: set) -> tuple:
+        """
+        Validates one item of update_products.
+
+        Returns:
+            Tuple (ObjectId of the product, changes converted to database values).
+
+        Raises:
+            ValidationError: If the item is malformed, or a change is not allowed or invalid.
+        """
+        if not isinstance(update, dict) or not isinstance(update.get("changes"), dict) \
+            or not update["changes"]:
+            raise ValidationError('Update must be of the form {"id": <id>, "changes": {...}}')
+        object_id = to_object_id(update.get("id"))
+
+        changes = {}
+        for key, value in update["changes"].items():
+            if key not in Product.WRITABLE_FIELDS:
+                raise ValidationError(f"Field {key} is not a valid field.")
+            field = Product._fields[key]
+            if value is None:
+                if field.required:
+                    raise ValidationError(f"Field {key} is required.")
+            else:
+                try:
+                    field.validate(value)
+                except ValidationError as e:
+                    raise ValidationError(f"Field {key} is invalid: {e}") from e
+                if key == "category" and value in unknown_categories:
+                    raise ValidationError("Category does not exist in the database.")
+            changes[key] = field.to_mongo(value) if value is not None else None
+        return object_id, changes
+
     @staticmethod
     def get_product_by_id(product_id: str) -> Product:
         """
@@ -37,38 +276,141 @@ class ProductService:
         Args:
             product_id: The ID of the product to fetch.
 
+        The document is read through the product cache.
+
         Returns:
             Product instance if found.
         
         Raises:
             DoesNotExist: If the product does not exist.
         """
-        return Product.objects.get(id=product_id)
+        return Product._from_son(ProductService.get_product_document(product_id))
+
+    @staticmethod
+    def get_product_document(product_id: str) -> dict:
+        """
+        Fetches the raw document of a product, through the product cache.
+
+        Hot products are served from memory (or from the shared cache backend, if configured),
+        and every write to a product invalidates its cached document.
+
+        Args:
+            product_id: The ID of the product to fetch.
+
+        Returns:
+            The raw document, which is shared with the cache and must not be modified.
+
+        Raises:
+            DoesNotExist: If the product does not exist, or the id is not a valid ObjectId.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        return product_cache.get(str(ObjectId(product_id)), ProductService._load_product_document)
+
+    @staticmethod
+    def _load_product_document(product_id: str) -> dict:
+        """
+        Reads the raw document of a product from the database, for the product cache.
+        """
+        document = Product._get_collection().find_one({"_id": ObjectId(product_id)})
+        if document is None:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        return document
+
+    @staticmethod
+    def get_product_version(product_id: str) -> dict:
+        """
+        Fetches only the id and modification timestamp of a product, to validate cached copies
+        of it without loading the whole document. A fresh document in the shared tier of the
+        product cache is used instead of the database, if there is one; in-process copies are
+        not, as they can miss writes made by other processes, and answer 304 for a product
+        that changed.
+
+        Args:
+            product_id: The ID of the product.
+
+        Returns:
+            Raw document of the form {"_id": <ObjectId>, "modified_at": <datetime>}.
+
+        Raises:
+            DoesNotExist: If the product does not exist, or the id is not a valid ObjectId.
+        """
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        cached = product_cache.peek_shared(str(ObjectId(product_id)))
+        if cached is not None:
+            return {"_id": cached["_id"], "modified_at": cached.get("modified_at")}
+        version = Product._get_collection().find_one(
+            {"_id": ObjectId(product_id)}, projection={"modified_at": True})
+        if version is None:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        return version
 
     @staticmethod
-    def update_product(product_id: str, data: dict) -> Product:
+    def update_product(product_id: str, data: dict) -> None:
         """
-        Updates specified fields of a product.
+        Updates specified fields of a product, in a single write.
+
+        Changes follow the same rules as Product.modify_fields, and every value is validated
+        against the Product schema. The product is not read before the write: it is one
+        update_one, or if the category or stock change, one find_one_and_update returning their
+        previous values, for the category counters.
 
         Args:
             product_id: The ID of the product to update.
             data: Dictionary containing fields to update.
 
-        Returns:
-            Updated Product instance.
-        
         Raises:
             DoesNotExist: If the product does not exist.
-            KeyError: If an invalid field is provided.
+            ValidationError: If the ID, a field, or a value is invalid.
         """
-        product = Product.objects.get(id=product_id)
-        product.modify_fields(data)
-        return product
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        unknown = find_unknown_categories([data["category"]]) \
+            if isinstance(data.get("category"), str) else set()
+        object_id, changes = ProductService._validate_changes(
+            {"id": product_id, "changes": data}, unknown
+        )
+
+        changes["modified_at"] = datetime.datetime.now(datetime.timezone.utc)
+        collection = Product._get_collection()
+        if "category" in changes or "quantity" in changes:
+            before = collection.find_one_and_update({"_id": object_id}, {"$set": changes}, \
+                projection={"category": True, "quantity": True}, \
+                return_document=ReturnDocument.BEFORE)
+            if before is None:
+                raise DoesNotExist(f"Product with id {product_id} does not exist")
+            update_category_counters(ProductService._counter_deltas(before, changes))
+        elif collection.update_one({"_id": object_id}, {"$set": changes}).matched_count == 0:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        product_generation.bump()
+        product_cache.delete(str(object_id))
+        product_suggestions.update(object_id, changes.get("name"), changes.get("quantity"))
+
+    @staticmethod
+    def _counter_deltas(before: dict, changes: dict, deltas: dict = None) -> dict:
+        """
+        Computes the category counter differences of a product write.
+
+        Args:
+            before: Raw document of the product before the write, with its category and stock.
+            changes: Fields set by the write.
+            deltas: Differences of other writes to add these to, None to start from none.
+
+        Returns:
+            Counter differences, as collected by count_product.
+        """
+        deltas = {} if deltas is None else deltas
+        count_product(deltas, before.get("category"), before.get("quantity"), sign=-1)
+        count_product(deltas, changes.get("category", before.get("category")), \
+            changes.get("quantity", before.get("quantity")))
+        return deltas
 
     @staticmethod
     def delete_product(product_id: str) -> None:
         """
-        Deletes a product from the database.
+        Deletes a product from the database, with a single find_one_and_delete write, which
+        returns its category and stock for the category counters.
 
         Args:
             product_id: The ID of the product to delete.
@@ -76,13 +418,26 @@ class ProductService:
         Raises:
             DoesNotExist: If the product does not exist.
         """
-        product = Product.objects.get(id=product_id)
-        product.delete()
+        if not ObjectId.is_valid(product_id):
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        deleted = Product._get_collection().find_one_and_delete(
+            {"_id": ObjectId(product_id)}, projection={"category": True, "quantity": True})
+        if deleted is None:
+            raise DoesNotExist(f"Product with id {product_id} does not exist")
+        deltas = {}
+        count_product(deltas, deleted.get("category"), deleted.get("quantity"), sign=-1)
+        update_category_counters(deltas)
+        product_generation.bump()
+        product_cache.delete(str(ObjectId(product_id)))
+        product_suggestions.remove(ObjectId(product_id))
 
     @staticmethod
     def modify_stock(product_id: str, amount: int) -> int:
         """
-        Modifies the stock of a product.
+        Modifies the stock of a product, atomically.
+
+        The stock is adjusted with a single conditional $inc on the server, so concurrent
+        adjustments never overwrite each other, and stock never goes negative.
 
         Args:
             product_id: The ID of the product.
@@ -93,15 +448,19 @@ class ProductService:
         
         Raises:
             DoesNotExist: If the product does not exist.
+            ValidationError: If the product ID is invalid.
             ValueError: If stock would go negative.
         """
-        product = Product.objects.get(id=product_id)
-        return product.modify_stock(amount)
+        query = {"_id": to_object_id(product_id)}
+        if amount < 0:
+            query["quantity"] = {"$gte": -amount}
+        return ProductService._update_one_field(query, {"$inc": {"quantity": amount}}, \
+            "quantity", "Stock cannot be negative.")
 
     @staticmethod
     def set_stock(product_id: str, amount: int) -> int:
         """
-        Sets the stock of a product.
+        Sets the stock of a product, in a single write.
 
         Args:
             product_id: The ID of the product.
@@ -112,15 +471,18 @@ class ProductService:
         
         Raises:
             DoesNotExist: If the product does not exist.
+            ValidationError: If the product ID is invalid.
             ValueError: If stock amount is negative.
         """
-        product = Product.objects.get(id=product_id)
-        return product.set_stock(amount)
+        if amount < 0:
+            raise ValueError("Stock cannot be negative.")
+        return ProductService._update_one_field({"_id": to_object_id(product_id)}, \
+            {"$set": {"quantity": amount}}, "quantity")
 
     @staticmethod
     def set_price(product_id: str, amount: int) -> int:
         """
-        Updates the price of a product.
+        Updates the price of a product, in a single write.
 
         Args:
             product_id: The ID of the product.
@@ -131,17 +493,69 @@ class ProductService:
         
         Raises:
             DoesNotExist: If the product does not exist.
+            ValidationError: If the product ID is invalid.
             ValueError: If price amount is negative.
         """
-        product = Product.objects.get(id=product_id)
-        return product.set_price(amount)
+        if amount < 0:
+            raise ValueError("Price cannot be negative.")
+        return ProductService._update_one_field({"_id": to_object_id(product_id)}, \
+            {"$set": {"price": amount}}, "price")
+
+    @staticmethod
+    def _update_one_field(query: dict, update: dict, field: str, conflict: str = "") -> int:
+        """
+        Applies an update to the product matched by query with find_one_and_update, also
+        refreshing its modification timestamp. The previous value of field is returned by the
+        write, with the category, so stock changes are added to the category counters.
+
+        Args:
+            query: Raw query, matching the product by _id, with any extra conditions.
+            update: Raw update document.
+            field: The field whose updated value is returned.
+            conflict: Message of the ValueError raised if the product exists, but the extra
+                conditions of the query do not hold.
+
+        Returns:
+            The updated value of field.
+
+        Raises:
+            DoesNotExist: If no product has the given _id.
+            ValueError: If the extra conditions of the query do not hold.
+        """
+        update.setdefault("$set", {})["modified_at"] = datetime.datetime.now(datetime.timezone.utc)
+        collection = Product._get_collection()
+        before = collection.find_one_and_update(query, update, \
+            projection={field: True, "category": True}, return_document=ReturnDocument.BEFORE)
+
+        if before is None:
+            if len(query) > 1 and collection.count_documents({"_id": query["_id"]}, limit=1):
+                raise ValueError(conflict)
+            raise DoesNotExist(f"Product with id {query['_id']} does not exist")
+
+        value = before[field] + update["$inc"][field] if field in update.get("$inc", {}) \
+            else update["$set"][field]
+        product_generation.bump()
+        product_cache.delete(str(query["_id"]))
+        if field == "quantity":
+            update_category_counters(ProductService._counter_deltas(before, {"quantity": value}))
+            product_suggestions.update(query["_id"], quantity=value)
+        return value
 
     @staticmethod
     def get_product_filtered(name: str, category: str, brand: str, price_less_than_e: int, \
-        price_greater_than_e: int, quantity_less_than_e: int, quantity_greater_than_e: int):
+        price_greater_than_e: int, quantity_less_than_e: int, quantity_greater_than_e: int, \
+        raw: bool= False, fields: list= None, search: str= ""):
         """
         Retrieves products from the database filtered by name, category, brand, price, and quantity.
 
+        Given a search, only the products matching it in the weighted text index (on name,
+        brand, and description) are kept, most relevant first, and the relevance score of every
+        product is fetched as _text_score.
+
+        For read-only use, raw can be set, so the documents are returned as fetched from the 
+        database, without constructing (and validating) a Product instance for every document.
+        Given fields, only those are fetched (along with the id), as a server-side projection.
+
         Args:
             name (str): Name of the product to filter by. Use an empty string to ignore.
             category (str): Category of the product to filter by. Use an empty string to ignore.
@@ -150,9 +564,12 @@ class ProductService:
             price_greater_than_e (int): Lower bound for product price (inclusive). Use -1 to ignore.
             quantity_less_than_e (int): Upper bound for product quantity (inclusive). Use -1 to ignore.
             quantity_greater_than_e (int): Lower bound for product quantity (inclusive). Use -1 to ignore.
+            raw (bool): If True, the queryset yields raw documents (dicts) instead of Products.
+            fields (list): Names of the fields to fetch. Use None to fetch all fields.
+            search (str): Words to search for. Use an empty string to ignore.
 
         Returns:
-            QuerySet: A queryset of Product objects that match the specified filters.
+            QuerySet: A queryset of Product objects (or raw documents) that match the specified filters.
         """
 
         data= Product.objects
@@ -173,7 +590,198 @@ class ProductService:
             data= data.filter(quantity__lte= quantity_less_than_e)
         if quantity_greater_than_e > -1:
             data= data.filter(quantity__gte= quantity_greater_than_e)
-        
+
+        if search:
+            data= data.search_text(search).order_by("$text_score")
+
+        if fields:
+            data= data.only(*fields)
+        if raw:
+            data= data.as_pymongo()
 
         return data
-        
+
+    @staticmethod
+    def search_products(data, limit: int, cursor: str= None):
+        """
+        Fetches one page of the products of a text search, most relevant first.
+
+        Relevance scores are computed by the server, and cannot be filtered on with find, so the
+        page is fetched with an aggregation: the $text match (with the other filters) is followed
+        by a range condition on (score, _id) for the cursor, so pages do not overlap.
+
+        Args:
+            data: QuerySet of products, as returned by get_product_filtered with a search.
+            limit: the maximum number of products in the page.
+            cursor: the cursor token of the previous page, None for the first page.
+
+        Returns:
+            tuple (raw documents, next_cursor), the documents holding their score as _text_score.
+
+        Raises:
+            InvalidCursorError: If the cursor token is invalid.
+        """
+        pipeline= [
+            {"$match": data._query},
+            {"$addFields": {TEXT_SCORE_FIELD: {"$meta": "textScore"}}},
+        ]
+        return aggregate_keyset_page(Product._get_collection(), pipeline, limit, cursor, \
+            SEARCH_SORT, data._loaded_fields.as_dict() or None)
+
+    @staticmethod
+    def count_products(data) -> int:
+        """
+        Counts the products matched by a queryset, as returned by get_product_filtered.
+
+        Unfiltered counts are taken from the collection metadata (estimated_document_count), 
+        instead of scanning. Filtered counts are cached per filter signature, until the next
+        write to the product collection (or for a minute at most, for writes made by other
+        processes).
+
+        Args:
+            data: QuerySet of products.
+
+        Returns:
+            Number of products matched by the queryset.
+        """
+        query= data._query
+        if not query:
+            return Product._get_collection().estimated_document_count()
+
+        key= (product_generation.value, json_util.dumps(query, sort_keys= True))
+        count= COUNT_CACHE.get(key)
+        if count is None:
+            count= data.count()
+            COUNT_CACHE.set(key, count)
+        return count
+
+    @staticmethod
+    def facet_pipeline(query: dict) -> list:
+        """
+        Builds the aggregation computing the facets of the products matched by a raw filter,
+        in one pass over the matching products.
+
+        Every facet counts the products matching all the filters but its own, so the counts of
+        a facet are those the list would have with a different value of that filter, e.g. the
+        count of every category for the selected brand, even if a category is selected. The
+        total counts the products matching all the filters.
+
+        Args:
+            query: raw filter, as built by get_product_filtered (the _query of the queryset).
+
+        Returns:
+            list of pipeline stages, yielding one document with the total and every facet.
+        """
+        common = {key: value for key, value in query.items() if key not in FACET_STAGES}
+        facets = {}
+        for facet, stages in list(FACET_STAGES.items()) + [("total", [{"$count": "count"}])]:
+            own = {key: value for key, value in query.items()
+                   if key in FACET_STAGES and key != facet}
+            facets[facet] = ([{"$match": own}] if own else []) + stages
+        return [{"$match": common}, {"$facet": facets}]
+
+    @staticmethod
+    def format_facets(result: dict) -> dict:
+        """
+        Converts the document yielded by the facet_pipeline aggregation to the facets returned
+        by the API.
+
+        Returns:
+            dict with the total, the count of every category and brand, most products first,
+            and the count of every price bucket (including empty ones), as {"min", "max",
+            "count"}, max being exclusive, and None for the last bucket.
+        """
+        prices = {bucket["_id"]: bucket["count"] for bucket in result["price"]}
+        bounds = PRICE_BUCKETS[1:] + [None]
+        return {
+            "total": result["total"][0]["count"] if result["total"] else 0,
+            "category": [{"value": item["_id"], "count": item["count"]}
+                         for item in result["category"]],
+            "brand": [{"value": item["_id"], "count": item["count"]}
+                      for item in result["brand"]],
+            "price": [{"min": low, "max": high, "count": prices.get(low, 0)}
+                      for low, high in zip(PRICE_BUCKETS, bounds)],
+        }
+
+    @staticmethod
+    def get_facets(data) -> dict:
+        """
+        Computes the facets of the products matched by a queryset, as returned by
+        get_product_filtered, with a single aggregation.
+
+        Facets are cached per filter signature, until the next write to the product collection
+        (or for a minute at most, for writes made by other processes), as counts are.
+
+        Args:
+            data: QuerySet of products.
+
+        Returns:
+            dict of facets, as described in format_facets.
+        """
+        query = data._query
+        key = (product_generation.value, json_util.dumps(query, sort_keys=True))
+        facets = FACET_CACHE.get(key)
+        if facets is None:
+            result = next(Product._get_collection().aggregate(
+                ProductService.facet_pipeline(query)))
+            facets = ProductService.format_facets(result)
+            FACET_CACHE.set(key, facets)
+        return facets
+
+    @staticmethod
+    def build_suggestions() -> int:
+        """
+        Builds the index of product name suggestions, from one scan of the names and stock
+        of all products.
+
+        Returns:
+            Number of products indexed.
+        """
+        product_suggestions.build(Product._get_collection().find(
+            {}, projection={"name": True, "quantity": True}, batch_size=10000
+        ))
+        return len(product_suggestions)
+
+    @staticmethod
+    def suggest_products(prefix: str, limit: int = 10) -> list:
+        """
+        Suggests products whose name starts with a prefix, from the in-memory index.
+
+        The index is built on first use if it was not built at startup, and rebuilt when it is
+        older than its max_age (in the background, answering from the old index meanwhile).
+
+        Args:
+            prefix: The start of the name, case and accents are ignored.
+            limit: The maximum number of suggestions.
+
+        Returns:
+            List of raw documents of the form {"_id", "name", "quantity"}, the ones with the
+            most stock first.
+        """
+        if not product_suggestions.built:
+            ProductService.build_suggestions()
+        elif product_suggestions.claim_rebuild():
+            threading.Thread(target=ProductService.build_suggestions, daemon=True).start()
+
+        return [
+            {"_id": product_id, "name": name, "quantity": quantity}
+            for product_id, name, quantity in product_suggestions.query(prefix, limit)
+        ]
+
+    @staticmethod
+    def stream_products(data, batch_size: int= 1000):
+        """
+        Prepares a queryset, as returned by get_product_filtered, to be streamed in full.
+
+        The products are read from one server-side cursor in id order, batch_size documents per
+        round trip, and the queryset does not keep the documents it has yielded, so iterating
+        over it uses the same memory for any number of products.
+
+        Args:
+            data: QuerySet of products.
+            batch_size: number of documents fetched from the database per round trip.
+
+        Returns:
+            QuerySet, that is to be iterated over only once.
+        """
+        return data.order_by("id").no_cache().batch_size(batch_size)
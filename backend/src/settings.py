@@ -130,4 +130,19 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-APPEND_SLASH= False
\ No newline at end of file
+APPEND_SLASH= False
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# Alias of the cache (in CACHES) shared by all processes for product documents, e.g. a
+# django.core.cache.backends.redis.RedisCache. None caches products in process only.
+PRODUCT_CACHE_ALIAS= None
+# Seconds during which an expired product document is still served while it is reloaded in
+# the background (stale-while-revalidate). Only used with PRODUCT_CACHE_ALIAS, 0 disables it.
+PRODUCT_CACHE_STALE_TTL= 0
@@ -0,0 +1,10 @@
+"""
+Django settings for the ASGI stack (see src/asgi.py).
+
+Same as src.settings, except for the URL configuration, which serves the product and category
+endpoints with async views.
+"""
+
+from src.settings import *  # pylint: disable=wildcard-import,unused-wildcard-import
+
+ROOT_URLCONF = "src.urls_async"
@@ -0,0 +1,72 @@
+"""
+Integration tests for atomic stock adjustments, through ProductService and the
+/products/<id>/stock endpoint. Many threads adjust the stock of one product at the same time,
+to check that no adjustment is lost, and that the stock never goes negative.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from django.test import Client
+from src.models.product import Product
+from src.services.product_service import ProductService
+from src.db.db_init import init_db
+
+#pylint: disable=no-member
+
+THREADS= 32
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    """Connect to the test database, and clean up the products created by the tests."""
+    init_db()
+    yield
+    Product.objects(brand="StockTest").delete()
+
+
+@pytest.fixture
+def product():
+    """A product with 100 items in stock."""
+    product= Product(name="Stock Test Product", price=10, quantity=100, brand="StockTest")
+    product.save()
+    return product
+
+
+def test_concurrent_decrements_are_not_lost(product):
+    """Test that 100 concurrent decrements of 1 leave exactly zero stock."""
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results= list(executor.map(lambda _: ProductService.modify_stock(str(product.id), -1), \
+            range(100)))
+
+    assert sorted(results)== list(range(100))  # Every intermediate quantity seen exactly once
+    assert Product.objects.get(id=product.id).quantity== 0
+
+
+def test_concurrent_decrements_never_oversell(product):
+    """Test that concurrent decrements of 3 stop at the last possible one, without going negative."""
+    def decrement(_):
+        try:
+            return ProductService.modify_stock(str(product.id), -3)
+        except ValueError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results= list(executor.map(decrement, range(50)))
+
+    assert len([result for result in results if result is not None])== 33
+    assert Product.objects.get(id=product.id).quantity== 1
+
+
+def test_concurrent_mixed_adjustments_via_endpoint(product):
+    """Test that concurrent increments and decrements through the endpoint all apply."""
+    def adjust(delta):
+        return Client().post(f"/products/{product.id}/stock", json.dumps({"delta": delta}), \
+            content_type="application/json").status_code
+
+    deltas= [5, -5]* 40
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        statuses= list(executor.map(adjust, deltas))
+
+    assert statuses== [200]* len(deltas)
+    assert Product.objects.get(id=product.id).quantity== 100
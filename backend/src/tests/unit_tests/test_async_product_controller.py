@@ -0,0 +1,237 @@
+"""
+Unit tests for the async product and category views of the ASGI stack.
+
+The async service is mocked, and the views are run to completion with asyncio.run. Covers
+single products (with revalidation), listings in cursor and offset mode, writes, streamed
+exports, and the category listing, along with the raw filters built for the listing params.
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from unittest.mock import patch, AsyncMock, MagicMock
+from django.test import TestCase, RequestFactory
+from bson import ObjectId
+from mongoengine.errors import DoesNotExist
+from src.controllers.async_product_controller import product_endpoint, product_stock_endpoint, \
+    product_facets_endpoint, product_export_endpoint
+from src.controllers.async_product_category_controller import category_product_endpoint
+from src.controllers.product_controller import PAGE_CACHE
+from src.services.async_product_service import AsyncProductService
+from src.services.product_service import ProductService
+from src.utils.conditional import make_etag
+
+OID = "65f1c2a4e13b0a6d2c8b4567"
+MODIFIED_AT = datetime(2025, 3, 5, 18, 54, 48, 123000)
+SERVICE = "src.controllers.async_product_controller.AsyncProductService"
+
+
+class AsyncProductEndpointTests(TestCase):
+    """
+    TestCase class for the async /products views.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        PAGE_CACHE.clear()
+        self.product = {"_id": "1", "name": "Sample Product", "price": 100, "quantity": 10, \
+            "modified_at": MODIFIED_AT}
+
+    @patch(f"{SERVICE}.get_product_document", new_callable=AsyncMock)
+    def test_get_product_by_id(self, mock_document):
+        """Test retrieving a product returns 200 with its validators."""
+        mock_document.return_value = self.product
+
+        response = asyncio.run(product_endpoint(self.factory.get("/products/1"), "1"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["name"], "Sample Product")
+        self.assertEqual(response["ETag"], make_etag("1", MODIFIED_AT))
+
+    @patch(f"{SERVICE}.get_product_document", new_callable=AsyncMock)
+    @patch(f"{SERVICE}.get_product_version", new_callable=AsyncMock)
+    def test_get_product_not_modified(self, mock_version, mock_document):
+        """Test revalidating an unchanged product returns 304 without loading the document."""
+        mock_version.return_value = {"_id": "1", "modified_at": MODIFIED_AT}
+
+        request = self.factory.get("/products/1", HTTP_IF_NONE_MATCH=make_etag("1", MODIFIED_AT))
+        response = asyncio.run(product_endpoint(request, "1"))
+
+        self.assertEqual(response.status_code, 304)
+        mock_document.assert_not_called()
+
+    @patch(f"{SERVICE}.get_product_document", new_callable=AsyncMock)
+    def test_get_product_not_found(self, mock_document):
+        """Test retrieving a missing product returns 404."""
+        mock_document.side_effect = DoesNotExist
+
+        response = asyncio.run(product_endpoint(self.factory.get("/products/2"), "2"))
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch(f"{SERVICE}.get_keyset_page", new_callable=AsyncMock)
+    @patch(f"{SERVICE}.count_products", new_callable=AsyncMock)
+    def test_get_products_cursor_mode(self, mock_count, mock_page):
+        """Test listing products in cursor mode, with filters, without counting them unless asked
+        to, and from the page cache."""
+        mock_count.return_value = 3
+        mock_page.return_value = ([self.product, self.product], "next-token")
+
+        request = self.factory.get("/products?limit=2&brand=Nova&price_less_than_e=500")
+        response = asyncio.run(product_endpoint(request))
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["X-Cache"], "MISS")
+        data = json.loads(response.content)
+        self.assertEqual(len(data["data"]), 2)
+        self.assertNotIn("pages", data["navigation"])
+        mock_count.assert_not_awaited()
+        self.assertIn("cursor=next-token", data["navigation"]["next"])
+        mock_page.assert_awaited_once_with({"brand": "Nova", "price": {"$lte": 500}}, 2, \
+            None, None, None)
+
+        response = asyncio.run(product_endpoint(request))
+        self.assertEqual(response["X-Cache"], "HIT")
+        mock_page.assert_awaited_once()
+
+        request = self.factory.get("/products?limit=2&include_total=true")
+        data = json.loads(asyncio.run(product_endpoint(request)).content)
+        self.assertEqual(data["navigation"]["pages"], 2)
+
+    @patch(f"{SERVICE}.get_offset_page", new_callable=AsyncMock)
+    @patch(f"{SERVICE}.count_products", new_callable=AsyncMock)
+    def test_get_products_offset_mode(self, mock_count, mock_page):
+        """Test listing products with a start offset fetches only the rest of the products."""
+        mock_count.return_value = 3
+        mock_page.return_value = [self.product]
+
+        request = self.factory.get("/products?start=2&limit=2&fields=name")
+        data = json.loads(asyncio.run(product_endpoint(request)).content)
+
+        mock_page.assert_awaited_once_with({}, 2, 1, ["name"], None)
+        self.assertIsNone(data["navigation"]["next"])
+        self.assertEqual(data["navigation"]["prev"], "/products?start=0&limit=2")
+
+        mock_count.return_value = 5
+        mock_page.return_value = [dict(self.product, _id=ObjectId(OID))] * 2
+        request = self.factory.get("/products?start=0&limit=2&q=chair")
+        data = json.loads(asyncio.run(product_endpoint(request)).content)
+        self.assertIn("q=chair", data["navigation"]["next"])
+        self.assertNotIn("start", data["navigation"]["next"])
+
+    def test_get_products_invalid_filter(self):
+        """Test a numeric filter that is not an integer returns 400."""
+        request = self.factory.get("/products?price_less_than_e=cheap")
+        response = asyncio.run(product_endpoint(request))
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch(f"{SERVICE}.update_product", new_callable=AsyncMock)
+    def test_update_product(self, mock_update):
+        """Test a PATCH is sent to the async service, and returns 204."""
+        request = self.factory.patch("/products/1", json.dumps({"price": 5}), \
+            content_type="application/json")
+        response = asyncio.run(product_endpoint(request, "1"))
+
+        self.assertEqual(response.status_code, 204)
+        mock_update.assert_awaited_once_with("1", {"price": 5})
+
+    @patch(f"{SERVICE}.delete_product", new_callable=AsyncMock)
+    def test_delete_product_not_found(self, mock_delete):
+        """Test deleting a missing product returns 404."""
+        mock_delete.side_effect = DoesNotExist
+
+        response = asyncio.run(product_endpoint(self.factory.delete("/products/2"), "2"))
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch(f"{SERVICE}.modify_stock", new_callable=AsyncMock)
+    def test_adjust_stock_conflict(self, mock_stock):
+        """Test a decrease below zero returns 409."""
+        mock_stock.side_effect = ValueError("Stock cannot be negative.")
+
+        request = self.factory.post("/products/1/stock", json.dumps({"delta": -20}), \
+            content_type="application/json")
+        response = asyncio.run(product_stock_endpoint(request, "1"))
+
+        self.assertEqual(response.status_code, 409)
+
+    @patch("src.controllers.async_product_category_controller.find_unknown_categories", \
+        return_value=set())
+    @patch("src.controllers.async_product_category_controller.AsyncProductService")
+    def test_list_category_products(self, mock_service, _mock_unknown):
+        """Test the category listing pages the products matched by category title."""
+        mock_service.count_products = AsyncMock(return_value=1)
+        mock_service.get_keyset_page = AsyncMock(return_value=([self.product], None))
+
+        request = self.factory.get("/categories/Books?fields=name&sort=price")
+        response = asyncio.run(category_product_endpoint(request, "Books"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)["data"]), 1)
+        mock_service.get_keyset_page.assert_awaited_once_with({"category": "Books"}, 100, \
+            None, ["name"], [("price", 1)])
+
+    @patch("src.controllers.async_product_category_controller.find_unknown_categories", \
+        return_value={"x"})
+    def test_list_unknown_category(self, _mock_unknown):
+        """Test listing a category that does not exist returns 404."""
+        response = asyncio.run(category_product_endpoint(self.factory.get("/categories/x"), "x"))
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch(f"{SERVICE}.get_facets", new_callable=AsyncMock)
+    def test_facets(self, mock_facets):
+        """Test facets are computed for the raw filter of the request."""
+        mock_facets.return_value = {"total": 1, "category": [], "brand": [], "price": []}
+
+        request = self.factory.get("/products/facets?category=Books&quantity_greater_than_e=1")
+        response = asyncio.run(product_facets_endpoint(request))
+
+        self.assertEqual(response.status_code, 200)
+        mock_facets.assert_awaited_once_with({"category": "Books", "quantity": {"$gte": 1}})
+
+    @patch(f"{SERVICE}.stream_products")
+    def test_export_streams_async(self, mock_stream):
+        """Test the export content is an async iterator, reading the cursor batch by batch."""
+        cursor = MagicMock(to_list=AsyncMock(side_effect=[
+            [{"_id": "1", "name": "A"}], [{"_id": "2", "name": "B"}], [],
+        ]))
+        mock_stream.return_value = cursor
+
+        request = self.factory.get("/products/export?format=csv&fields=name&brand=Nova", \
+            HTTP_ACCEPT_ENCODING="gzip")
+        response = asyncio.run(product_export_endpoint(request))
+
+        self.assertTrue(response.is_async)
+        self.assertTrue(hasattr(response.streaming_content, "__aiter__"))
+        cursor.to_list.assert_not_awaited()
+
+        async def read(content):
+            return b"".join([chunk async for chunk in content])
+
+        body = gzip.decompress(asyncio.run(read(response.streaming_content)))
+        self.assertEqual(body, b"id,name\r\n1,A\r\n2,B\r\n")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        mock_stream.assert_called_once_with({"brand": "Nova"}, ["name"], 2000)
+        self.assertEqual(cursor.to_list.await_count, 3)
+
+    def test_export_invalid_params(self):
+        """Test an unsupported format, or a non-integer filter, returns 400."""
+        for query in ("format=xml", "price_less_than_e=cheap"):
+            response = asyncio.run(product_export_endpoint(self.factory.get( \
+                f"/products/export?{query}")))
+            self.assertEqual(response.status_code, 400, query)
+
+
+@patch("src.models.product.Product._get_collection")
+def test_build_query_matches_queryset_query(_mock_collection):
+    """Test the raw filter is the query of the equivalent queryset, so counts share a cache key."""
+    filters = dict(name="", category="Books", brand="Nova", price_less_than_e=500, \
+        price_greater_than_e=100, quantity_less_than_e=-1, quantity_greater_than_e=0)
+
+    assert AsyncProductService.build_query(**filters) == \
+        ProductService.get_product_filtered(**filters)._query
+    assert AsyncProductService.build_query(**filters, search="chair") == \
+        ProductService.get_product_filtered(**filters, search="chair")._query
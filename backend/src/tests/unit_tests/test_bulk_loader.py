@@ -0,0 +1,68 @@
+"""
+Unit tests for the bulk loader in src.utils.bulk_loader.
+
+Covers incremental parsing of JSON arrays across reads, NDJSON input, the synthetic product
+generator, and batched loading with ProductService.create_products mocked.
+"""
+
+import io
+import json
+import pytest
+from unittest.mock import patch
+from src.utils.bulk_loader import iter_json_array, iter_ndjson, generate_products, \
+    batched, load_products
+
+CATEGORIES= ["Electronics", "Groceries", "Books & Stationery"]
+
+
+def test_json_array_split_across_reads():
+    """Test that elements split between reads, and nested separators, are parsed correctly."""
+    products= [{"name": "Chair, plastic [2]", "price": 799}, {"name": "Bulb", "price": 1080}]
+    text= " [\n" + ",\n ".join(json.dumps(product) for product in products) + "\n] "
+
+    assert list(iter_json_array(io.StringIO(text), read_size= 3))== products
+    assert list(iter_json_array(io.StringIO("[ 12 , 345 ]"), read_size= 1))== [12, 345]
+    assert list(iter_json_array(io.StringIO("[]")))== []
+
+
+@pytest.mark.parametrize("text", ['{"name": "Bulb"}', "[1 2]", "[1,", '[{"name"]'])
+def test_json_array_invalid(text):
+    """Test that input which is not a complete JSON array raises ValueError."""
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size= 2))
+
+
+def test_ndjson_skips_blank_lines():
+    """Test that NDJSON is parsed one value per line, ignoring blank lines."""
+    text= '{"name": "Chair"}\n\n{"name": "Bulb"}\n'
+    assert list(iter_ndjson(io.StringIO(text)))== [{"name": "Chair"}, {"name": "Bulb"}]
+
+
+def test_generate_products_is_reproducible():
+    """Test that generated products are valid, skewed towards the first category, and seeded."""
+    products= list(generate_products(2000, CATEGORIES, seed= 7))
+
+    assert products== list(generate_products(2000, CATEGORIES, seed= 7))
+    assert all(product["category"] in CATEGORIES for product in products)
+    assert all(product["price"]>= 0 and product["quantity"]>= 0 for product in products)
+    counts= [sum(product["category"]== category for product in products) for category in CATEGORIES]
+    assert counts[0]> counts[1]> counts[2]
+
+
+def test_batched():
+    """Test that batches hold at most size items, the last one holding the rest."""
+    assert list(batched(range(5), 2))== [[0, 1], [2, 3], [4]]
+
+
+@patch("src.utils.bulk_loader.ProductService.create_products")
+def test_load_products_counts_results(mock_create):
+    """Test that every batch is written, and results are counted with the first errors kept."""
+    mock_create.side_effect= lambda batch, _size: [
+        {"error": "invalid"} if item["price"]< 0 else {"id": "1"} for item in batch
+    ]
+    products= [{"price": price} for price in (1, -1, 2, 3, -1)]
+
+    stats= load_products(products, batch_size= 2, workers= 2)
+
+    assert mock_create.call_count== 3
+    assert stats== {"created": 3, "failed": 2, "errors": ["invalid", "invalid"]}
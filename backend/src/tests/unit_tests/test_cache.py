@@ -0,0 +1,232 @@
+"""
+Unit tests for the in-process cache building blocks in src.utils.cache.
+"""
+
+import threading
+from unittest.mock import patch, MagicMock
+from django.core.cache import caches
+from django.test import override_settings
+from mongoengine.errors import DoesNotExist
+from src.utils.cache import TTLCache, Generation, TieredCache
+
+
+def test_ttl_cache_get_and_set():
+    """Test that cached values are returned, and missing keys give the default."""
+    cache= TTLCache(ttl= 10)
+    cache.set("a", 1)
+    assert cache.get("a")== 1
+    assert cache.get("b", "default")== "default"
+
+
+@patch("src.utils.cache.time")
+def test_ttl_cache_expiry(mock_time):
+    """Test that entries expire once their TTL has passed."""
+    mock_time.monotonic.return_value= 100
+    cache= TTLCache(ttl= 10)
+    cache.set("a", 1)
+
+    mock_time.monotonic.return_value= 111
+    assert cache.get("a") is None
+    assert len(cache)== 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test that a full cache evicts the entry that was used least recently."""
+    cache= TTLCache(ttl= 10, max_size= 2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a")== 1
+    assert cache.get("b") is None
+    assert cache.get("c")== 3
+
+
+def test_ttl_cache_stats():
+    """Test that hits and misses are counted."""
+    cache= TTLCache(ttl= 10)
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+    assert cache.stats()== {"size": 1, "hits": 1, "misses": 1}
+
+def test_generation_bump():
+    """Test that bumping a generation increments its value."""
+    generation= Generation()
+    assert generation.value== 0
+    assert generation.bump()== 1
+    assert generation.value== 1
+
+
+def wait_for_refreshes(cache):
+    """Waits until the background reloads of a TieredCache are done."""
+    for _ in range(500):
+        if not cache._refreshing:
+            return
+        threading.Event().wait(0.01)
+
+
+def test_tiered_cache_loads_once():
+    """Test that a value is loaded on the first get only, until it is deleted."""
+    cache= TieredCache("test", ttl= 10)
+    loader= MagicMock(return_value= {"price": 5})
+
+    assert cache.get("a", loader)== {"price": 5}
+    assert cache.get("a", loader)== {"price": 5}
+    loader.assert_called_once_with("a")
+
+    cache.delete("a")
+    cache.get("a", loader)
+    assert loader.call_count== 2
+    assert cache.stats== {"hits": 1, "stale_hits": 0, "misses": 2}
+
+
+def test_tiered_cache_skips_values_read_during_a_write():
+    """Test that a value loaded while the generation changed is not cached."""
+    generation= Generation()
+    cache= TieredCache("test", ttl= 10, generation= generation)
+
+    def loader(_key):
+        generation.bump()  # A write happening while the value is read
+        return "old"
+
+    cache.get("a", loader)
+    assert cache.peek("a") is None
+
+
+@patch("src.utils.cache.time")
+def test_tiered_cache_serves_stale_while_revalidating(mock_time):
+    """Test that an expired value is served while it is reloaded in the background."""
+    mock_time.time.return_value= 100
+    mock_time.monotonic.return_value= 100
+    cache= TieredCache("test", ttl= 10, stale_ttl= 60)
+    cache.get("a", lambda _key: "old")
+
+    mock_time.time.return_value= 120
+    mock_time.monotonic.return_value= 120
+    reloaded= threading.Event()
+
+    def slow_loader(_key):
+        reloaded.wait(5)
+        return "new"
+
+    assert cache.get("a", slow_loader)== "old"
+    assert cache.stats["stale_hits"]== 1
+    reloaded.set()
+    wait_for_refreshes(cache)
+    assert cache.get("a", slow_loader)== "new"
+
+
+@patch("src.utils.cache.time")
+def test_tiered_cache_drops_deleted_values_on_revalidation(mock_time):
+    """Test that a value whose reload raises DoesNotExist stops being served."""
+    mock_time.time.return_value= 100
+    mock_time.monotonic.return_value= 100
+    cache= TieredCache("test", ttl= 10, stale_ttl= 60)
+    cache.get("a", lambda _key: "old")
+
+    mock_time.time.return_value= 120
+    mock_time.monotonic.return_value= 120
+    loader= MagicMock(side_effect= DoesNotExist)
+    cache.get("a", loader)
+    wait_for_refreshes(cache)
+
+    assert cache.local.get("a") is None
+
+
+@override_settings(TEST_CACHE_ALIAS= "default")
+def test_tiered_cache_shared_tier():
+    """Test that values are shared through the Django cache, and deleted from it."""
+    caches["default"].clear()
+    writer= TieredCache("test", ttl= 10, backend_setting= "TEST_CACHE_ALIAS")
+    reader= TieredCache("test", ttl= 10, backend_setting= "TEST_CACHE_ALIAS")
+
+    writer.get("a", lambda _key: "value")
+    assert reader.get("a", MagicMock())== "value"
+
+    writer.delete("a")
+    reader.clear()
+    assert reader.peek("a") is None
+
+
+@override_settings(TEST_CACHE_ALIAS= "default")
+def test_tiered_cache_local_copy_rechecks_shared_tier():
+    """Test that a value deleted by another process stops being served after local_ttl."""
+    caches["default"].clear()
+    writer= TieredCache("test", ttl= 10, backend_setting= "TEST_CACHE_ALIAS")
+    reader= TieredCache("test", ttl= 10, backend_setting= "TEST_CACHE_ALIAS", local_ttl= 0)
+    writer.get("a", lambda _key: "old")
+    assert reader.get("a", MagicMock())== "old"
+
+    writer.delete("a")
+    assert reader.get("a", lambda _key: "new")== "new"
+
+
+@patch("src.utils.cache.time")
+def test_tiered_cache_stale_setting_needs_shared_tier(mock_time):
+    """Test that a stale_ttl read from a setting is ignored without a shared tier."""
+    mock_time.time.return_value= 100
+    mock_time.monotonic.return_value= 100
+    cache= TieredCache("test", ttl= 10, stale_setting= "TEST_STALE_TTL")
+    with override_settings(TEST_STALE_TTL= 60):
+        cache.get("a", lambda _key: "old")
+
+        mock_time.time.return_value= 120
+        mock_time.monotonic.return_value= 120
+        assert cache.get("a", lambda _key: "new")== "new"
+        assert cache.stats["stale_hits"]== 0
+
+
+@override_settings(TEST_CACHE_ALIAS= "default", TEST_STALE_TTL= 60)
+@patch("src.utils.cache.time")
+def test_tiered_cache_stale_setting_with_shared_tier(mock_time):
+    """Test that a stale_ttl read from a setting serves expired values with a shared tier."""
+    caches["default"].clear()
+    mock_time.time.return_value= 100
+    mock_time.monotonic.return_value= 100
+    cache= TieredCache("test", ttl= 10, backend_setting= "TEST_CACHE_ALIAS",
+        stale_setting= "TEST_STALE_TTL", local_ttl= 60)
+    cache.get("a", lambda _key: "old")
+
+    mock_time.time.return_value= 120
+    mock_time.monotonic.return_value= 120
+    loaded= threading.Event()
+    assert cache.get("a", lambda _key: loaded.set() or "new")== "old"
+    assert loaded.wait(5)
+    wait_for_refreshes(cache)
+
+
+@override_settings(TEST_CACHE_ALIAS= "default")
+def test_tiered_cache_peek_shared_ignores_local_copy():
+    """Test that peek_shared only answers from the shared tier."""
+    caches["default"].clear()
+    local= TieredCache("test", ttl= 10)
+    local.get("a", lambda _key: "value")
+    assert local.peek("a")== "value"
+    assert local.peek_shared("a") is None
+
+    shared= TieredCache("test", ttl= 10, backend_setting= "TEST_CACHE_ALIAS")
+    shared.get("a", lambda _key: "value")
+    assert shared.peek_shared("a")== "value"
+    caches["default"].delete("test:a")
+    assert shared.peek("a")== "value"
+    assert shared.peek_shared("a") is None
+
+
+@patch("src.utils.cache.time")
+def test_tiered_cache_logs_failed_refresh(mock_time, caplog):
+    """Test that a background reload that fails is logged, and the stale value kept."""
+    mock_time.time.return_value= 100
+    mock_time.monotonic.return_value= 100
+    cache= TieredCache("test", ttl= 10, stale_ttl= 60)
+    cache.get("a", lambda _key: "old")
+
+    mock_time.time.return_value= 120
+    mock_time.monotonic.return_value= 120
+    with caplog.at_level("ERROR", logger= "src.utils.cache"):
+        assert cache.get("a", MagicMock(side_effect= TimeoutError))== "old"
+        wait_for_refreshes(cache)
+
+    assert "Could not refresh test:a" in caplog.text
+    assert cache.get("a", MagicMock())== "old"
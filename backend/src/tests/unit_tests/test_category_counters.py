@@ -0,0 +1,40 @@
+"""
+Unit tests for the upkeep of the category counters, in src.utils.category_counters.
+"""
+
+from unittest.mock import patch
+from src.utils.category_counters import count_product, counter_updates, update_category_counters
+
+
+def test_count_product():
+    """Test that moves and stock changes net out per category, and uncategorized are skipped."""
+    deltas= {}
+    count_product(deltas, "Furniture", 4, sign= -1)
+    count_product(deltas, "Lighting", 4)
+    count_product(deltas, "Lighting", 4, sign= -1)
+    count_product(deltas, "Lighting", 9)
+    count_product(deltas, "", 3)
+    count_product(deltas, None, 3, sign= -1)
+
+    assert deltas== {"Furniture": [-1, -4], "Lighting": [1, 9]}
+
+
+def test_counter_updates_skip_unchanged():
+    """Test that only the categories whose counters change are written, with $inc."""
+    operations= counter_updates({"Furniture": [0, 0], "Lighting": [0, -2]})
+
+    assert len(operations)== 1
+    assert operations[0]._filter== {"title": "Lighting"}
+    assert operations[0]._doc== {"$inc": {"product_count": 0, "total_stock": -2}}
+
+
+@patch("src.utils.category_counters.ProductCategory")
+def test_update_category_counters(mock_category):
+    """Test that the changes are one unordered bulk_write, and no changes no write."""
+    update_category_counters({"Furniture": [0, 0]})
+    mock_category._get_collection.return_value.bulk_write.assert_not_called()
+
+    update_category_counters({"Furniture": [1, 5], "Lighting": [-1, -5]})
+    (operations,), kwargs= mock_category._get_collection.return_value.bulk_write.call_args
+    assert len(operations)== 2
+    assert kwargs== {"ordered": False}
@@ -0,0 +1,56 @@
+"""
+Unit tests for the conditional request helpers in src.utils.conditional.
+
+Covers the ETag format, the validator headers, and the evaluation of If-None-Match and
+If-Modified-Since against a document version.
+"""
+
+from datetime import datetime, timezone
+from django.test import RequestFactory
+from src.utils.conditional import make_etag, conditional_response, is_conditional
+
+MODIFIED_AT= datetime(2025, 3, 5, 18, 54, 48, 123000)
+DOCUMENT_ID= "65f1c2a4e13b0a6d2c8b4567"
+
+
+def test_etag_changes_with_timestamp():
+    """Test that the ETag is strong, and differs between versions a millisecond apart."""
+    etag= make_etag(DOCUMENT_ID, MODIFIED_AT)
+
+    assert etag.startswith(f'"{DOCUMENT_ID}-') and etag.endswith('"')
+    assert etag!= make_etag(DOCUMENT_ID, MODIFIED_AT.replace(microsecond= 124000))
+    assert etag== make_etag(DOCUMENT_ID, MODIFIED_AT.replace(tzinfo= timezone.utc))
+
+
+def test_if_none_match_current_version():
+    """Test that a matching ETag is answered with 304, carrying the validators."""
+    request= RequestFactory().get("/", HTTP_IF_NONE_MATCH= make_etag(DOCUMENT_ID, MODIFIED_AT))
+    response= conditional_response(request, DOCUMENT_ID, MODIFIED_AT)
+
+    assert is_conditional(request)
+    assert response.status_code== 304
+    assert response["Last-Modified"]== "Wed, 05 Mar 2025 18:54:48 GMT"
+
+
+def test_if_none_match_old_version():
+    """Test that an ETag of an older version means the full response is to be sent."""
+    old_etag= make_etag(DOCUMENT_ID, MODIFIED_AT.replace(second= 0))
+    request= RequestFactory().get("/", HTTP_IF_NONE_MATCH= old_etag)
+
+    assert conditional_response(request, DOCUMENT_ID, MODIFIED_AT) is None
+
+
+def test_if_modified_since():
+    """Test If-Modified-Since at, and before, the modification time of the document."""
+    factory= RequestFactory()
+    unchanged= factory.get("/", HTTP_IF_MODIFIED_SINCE= "Wed, 05 Mar 2025 18:54:48 GMT")
+    changed= factory.get("/", HTTP_IF_MODIFIED_SINCE= "Wed, 05 Mar 2025 18:54:47 GMT")
+
+    assert conditional_response(unchanged, DOCUMENT_ID, MODIFIED_AT).status_code== 304
+    assert conditional_response(changed, DOCUMENT_ID, MODIFIED_AT) is None
+
+
+def test_document_without_timestamp():
+    """Test that documents without a modification timestamp are never answered with 304."""
+    request= RequestFactory().get("/", HTTP_IF_NONE_MATCH= "*")
+    assert conditional_response(request, DOCUMENT_ID, None) is None
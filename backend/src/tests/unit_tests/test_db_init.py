@@ -0,0 +1,115 @@
+"""
+Unit tests for the connection manager in src.db.db_init.
+
+Covers reading the settings once, building the client options, the lazy mongoengine
+connection, resetting the clients after a fork, and counting pool events.
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from mongoengine import connection as mongoengine_connection
+from mongoengine.connection import DEFAULT_CONNECTION_NAME
+from src.db import db_init
+from src.db.db_init import PoolStats
+
+CONFIG= {
+    "DB_NAME": "shop",
+    "MONGO_USER": "user",
+    "MONGO_PASSWORD": "secret",
+    "MONGO_HOST": "localhost",
+    "MONGO_PORT": "27018",
+}
+
+
+@pytest.fixture(autouse= True)
+def fresh_state():
+    """Resets the module state around every test."""
+    saved= (db_init._config, db_init._async_db, db_init._connected)
+    db_init._config, db_init._async_db, db_init._connected= None, None, False
+    yield
+    db_init._config, db_init._async_db, db_init._connected= saved
+
+
+@patch("src.db.db_init.dotenv_values", return_value= CONFIG)
+def test_config_read_once(mock_dotenv):
+    """Test that .env is only read on the first call."""
+    assert db_init.get_config()== CONFIG
+    assert db_init.get_config()== CONFIG
+    mock_dotenv.assert_called_once_with(".env")
+
+
+def test_client_options_defaults_and_overrides():
+    """Test that unset pool settings use the defaults, and set ones override them."""
+    db_init._config= dict(CONFIG, MONGO_MAX_POOL_SIZE= "20", MONGO_COMPRESSORS= "zstd,zlib")
+
+    options= db_init.client_options()
+
+    assert options["maxPoolSize"]== 20
+    assert options["minPoolSize"]== db_init.POOL_SETTINGS["minPoolSize"][1]
+    assert options["compressors"]== "zstd,zlib"
+    assert "zlibCompressionLevel" not in options
+
+
+@patch("src.db.db_init.connect")
+def test_init_db_connects_lazily_once(mock_connect):
+    """Test that the connection is registered without connecting, and only once."""
+    db_init._config= CONFIG
+
+    db_init.init_db()
+    db_init.init_db()
+
+    mock_connect.assert_called_once()
+    kwargs= mock_connect.call_args.kwargs
+    assert kwargs["connect"] is False
+    assert kwargs["db"]== "shop"
+    assert kwargs["port"]== 27018
+    assert kwargs["maxPoolSize"]== 100
+
+
+@patch("src.db.db_init.connect")
+def test_reset_after_fork(mock_connect):
+    """Test that a forked child forgets the inherited clients without closing them or
+    connecting, and counts its own pool events."""
+    db_init._config= CONFIG
+    db_init.init_db()
+    inherited= MagicMock()
+    db_init._async_db= MagicMock()
+    db_init.POOL_STATS["sync"].connection_created(None)
+
+    with patch.dict(mongoengine_connection._connections, {DEFAULT_CONNECTION_NAME: inherited}), \
+        patch.dict(mongoengine_connection._dbs, {DEFAULT_CONNECTION_NAME: inherited.shop}):
+        db_init._reset_after_fork()
+        assert DEFAULT_CONNECTION_NAME not in mongoengine_connection._connections
+        assert DEFAULT_CONNECTION_NAME not in mongoengine_connection._dbs
+
+    inherited.close.assert_not_called()
+    mock_connect.assert_called_once()
+    assert db_init._connected
+    assert db_init._async_db is None
+    assert db_init.POOL_STATS["sync"].snapshot()["created"]== 0
+
+
+def test_pool_stats_counts_events():
+    """Test that checkouts, check-ins, and connections are counted."""
+    stats= PoolStats()
+    event= SimpleNamespace()
+    for _ in range(2):
+        stats.connection_created(event)
+        stats.connection_check_out_started(event)
+        stats.connection_checked_out(event)
+    stats.connection_checked_in(event)
+    stats.connection_check_out_started(event)
+    stats.connection_check_out_failed(event)
+    stats.connection_closed(event)
+
+    assert stats.snapshot()== {
+        "open": 1,
+        "in_use": 1,
+        "max_in_use": 2,
+        "waiting": 0,
+        "created": 2,
+        "closed": 1,
+        "checkout_failures": 1,
+        "cleared": 0,
+    }
@@ -0,0 +1,89 @@
+"""
+Unit tests for the streamed export renderers in src.utils.export.
+
+Covers NDJSON and CSV rendering of raw documents, the grouping of rows into chunks, the gzip
+compression of a chunk stream (sync or async), and the Accept-Encoding check.
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from bson import ObjectId
+from src.utils.export import ndjson_chunks, csv_chunks, gzip_chunks, async_gzip_chunks, \
+    accepts_gzip
+
+OID= ObjectId("65f1c2a4e13b0a6d2c8b4567")
+DOCUMENTS= [
+    {"_id": OID, "name": "Chair, plastic", "price": 799, "created_at": datetime(2025, 3, 5, 18, 54)},
+    {"_id": OID, "name": "Bulb", "price": 99, "created_at": None},
+]
+
+
+def test_ndjson_one_document_per_line():
+    """Test that every document is one JSON line, in extended JSON."""
+    lines= b"".join(ndjson_chunks(DOCUMENTS)).decode().splitlines()
+
+    assert len(lines)== 2
+    assert json.loads(lines[0])["_id"]== {"$oid": str(OID)}
+    assert json.loads(lines[1])["name"]== "Bulb"
+
+
+def test_ndjson_chunks_hold_complete_lines():
+    """Test that rows are grouped into chunks, and never split across them."""
+    chunks= list(ndjson_chunks(DOCUMENTS* 10, chunk_size= 100))
+
+    assert 1< len(chunks)< 20
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+
+
+def test_csv_header_and_values():
+    """Test the header row, the id column, quoting, and conversion of BSON values."""
+    body= b"".join(csv_chunks(DOCUMENTS, ["id", "name", "created_at"])).decode()
+
+    assert body.splitlines()== [
+        "id,name,created_at",
+        f'{OID},"Chair, plastic",2025-03-05T18:54:00',
+        f"{OID},Bulb,",
+    ]
+
+
+def test_csv_without_documents_has_header():
+    """Test that an empty export still has the header row."""
+    assert b"".join(csv_chunks([], ["id", "name"]))== b"id,name\r\n"
+
+
+def test_csv_continued_without_header():
+    """Test that a continued CSV stream does not repeat the header row."""
+    assert b"".join(csv_chunks(DOCUMENTS[1:], ["name"], header= False))== b"Bulb\r\n"
+
+
+def test_gzip_chunks_round_trip():
+    """Test that the compressed chunks form one valid gzip stream."""
+    chunks= [b"first line\n", b"", b"second line\n"]
+    assert gzip.decompress(b"".join(gzip_chunks(chunks)))== b"first line\nsecond line\n"
+
+
+def test_async_gzip_chunks_round_trip():
+    """Test that the compressed chunks of an async stream form one valid gzip stream."""
+    async def chunks():
+        for chunk in (b"first line\n", b"", b"second line\n"):
+            yield chunk
+
+    async def compress():
+        return b"".join([chunk async for chunk in async_gzip_chunks(chunks())])
+
+    assert gzip.decompress(asyncio.run(compress()))== b"first line\nsecond line\n"
+
+
+def test_accepts_gzip():
+    """Test that gzip is accepted with a q-value above 0, or through *, and refused with q=0."""
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("deflate, gzip ; q=0.000")
+    assert not accepts_gzip("gzip;q=0, *")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip("gzip;q=abc")
@@ -0,0 +1,132 @@
+"""
+Unit tests for the index advisor in src.utils.index_advisor.
+
+Covers the filter combinations and their arguments, summarizing explain() output of both query
+engines, flagging plans, and suggesting indexes in equality-sort-range order.
+"""
+
+from unittest.mock import MagicMock, patch
+from src.utils.index_advisor import filter_combinations, filter_kwargs, plan_summary, \
+    plan_problems, suggest_index, has_index, advise, undeclared_indexes, superseded_indexes, \
+    drop_superseded_indexes, index_keys
+
+SAMPLE= {"name": "Chair", "brand": "Nilkamal", "category": "Furniture", "price": 100,
+    "quantity": 30}
+
+
+def explain_output(plan: dict, keys: int, docs: int, returned: int)-> dict:
+    return {
+        "queryPlanner": {"winningPlan": plan},
+        "executionStats": {"totalKeysExamined": keys, "totalDocsExamined": docs,
+            "nReturned": returned},
+    }
+
+
+COLLSCAN_SORT= {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+INDEX_SCAN= {"queryPlan": {"stage": "LIMIT", "inputStage": {"stage": "FETCH",
+    "inputStage": {"stage": "IXSCAN", "indexName": "brand_1__id_1_price_1_quantity_1"}}}}
+
+
+def test_filter_combinations():
+    """Test that every non-empty combination of the five filters is listed once."""
+    combinations= filter_combinations()
+    assert len(combinations)== 31
+    assert len(set(combinations))== 31
+    assert ("brand", "quantity") in combinations
+
+
+def test_filter_kwargs():
+    """Test that the arguments filter on the sample values, and ignore the other filters."""
+    kwargs= filter_kwargs(("category", "price"), SAMPLE)
+
+    assert kwargs["category"]== "Furniture"
+    assert kwargs["brand"]== ""
+    assert (kwargs["price_greater_than_e"], kwargs["price_less_than_e"])== (50, 200)
+    assert kwargs["quantity_greater_than_e"]== -1
+
+
+def test_plan_summary_and_problems():
+    """Test that plans of both engines are summarized, and only bad ones flagged."""
+    good= plan_summary(explain_output(INDEX_SCAN, keys= 21, docs= 21, returned= 21))
+    assert good["stages"]== ["LIMIT", "FETCH", "IXSCAN"]
+    assert good["index"]== "brand_1__id_1_price_1_quantity_1"
+    assert plan_problems(good)== []
+
+    bad= plan_summary(explain_output(COLLSCAN_SORT, keys= 0, docs= 5000, returned= 3))
+    assert bad["index"] is None
+    assert plan_problems(bad)== ["scans the whole collection", "sorts in memory",
+        "examines 5000 keys or documents for 3 products"]
+
+
+def test_suggest_index():
+    """Test that suggestions put the equalities first, then the id for pages, then the ranges."""
+    assert suggest_index(("brand", "quantity"), sorted_by_id= True)== ("brand", "id", "quantity")
+    assert suggest_index(("category", "price"), sorted_by_id= False)== ("category", "price")
+
+
+def test_has_index():
+    """Test that an index starting with the keys counts, and a different order does not."""
+    collection= MagicMock()
+    collection.index_information.return_value= {
+        "_id_": {"key": [("_id", 1)]},
+        "category_1_price_1_quantity_1": {"key": [("category", 1), ("price", 1), ("quantity", 1)]},
+    }
+
+    assert has_index(collection, ("category", "price"))
+    assert not has_index(collection, ("price", "category"))
+    assert has_index(collection, ("id",))
+
+
+def test_drop_superseded_indexes():
+    """Test that only the undeclared indexes that are a prefix of a declared one, or retired,
+    are dropped, and never _id_, indexes created by hand, or text indexes."""
+    collection= MagicMock()
+    collection.index_information.return_value= {
+        "_id_": {"key": [("_id", 1)]},
+        "name_1__id_1": {"key": [("name", 1), ("_id", 1)]},
+        "name_1": {"key": [("name", 1)]},
+        "price_1__id_1": {"key": [("price", 1), ("_id", 1)]},
+        "price_1_created_at_-1__id_1": {"key": [("price", 1), ("created_at", -1), ("_id", 1)]},
+        "created_at_-1": {"key": [("created_at", -1)]},
+        "sku_1": {"key": [("sku", 1)]},
+        "product_text": {"key": [("_fts", "text"), ("_ftsx", 1)],
+            "weights": {"name": 10, "brand": 5, "description": 1}},
+        "name_text": {"key": [("_fts", "text"), ("_ftsx", 1)], "weights": {"name": 1}},
+    }
+
+    assert list(undeclared_indexes(collection))== ["name_1", "price_1__id_1", "created_at_-1",
+        "sku_1", "name_text"]
+    assert superseded_indexes(collection)== ["name_1", "price_1__id_1"]
+    assert drop_superseded_indexes(collection)== ["name_1", "price_1__id_1"]
+    assert [call.args for call in collection.drop_index.call_args_list]== \
+        [("name_1",), ("price_1__id_1",)]
+
+
+@patch("src.utils.index_advisor.sample_values", return_value= SAMPLE)
+@patch("src.utils.index_advisor.Product")
+@patch("src.utils.index_advisor.ProductService.get_product_filtered")
+def test_advise(mock_filtered, mock_product, _mock_sample):
+    """Test that every combination is explained as a page and unsorted, with suggestions."""
+    mock_product._get_collection.return_value.index_information.return_value= {}
+    queryset= mock_filtered.return_value
+    queryset.explain.return_value= explain_output(COLLSCAN_SORT, 0, 100, 100)
+    queryset.order_by.return_value.limit.return_value.explain.return_value= \
+        explain_output(INDEX_SCAN, 21, 21, 21)
+
+    reports= advise(limit= 20)
+
+    assert len(reports)== 62
+    queryset.order_by.assert_called_with("id")
+    queryset.order_by.return_value.limit.assert_called_with(21)
+    pages= [report for report in reports if report["query"]== "page"]
+    assert all(not report["problems"] for report in pages)
+    unsorted= next(report for report in reports
+        if report["query"]== "unsorted" and report["filters"]== ("brand", "price"))
+    assert unsorted["suggestion"]== ("brand", "price")
+    assert unsorted["exists"] is False
+
+
+def test_index_keys():
+    """Test that the model notation is converted to database keys, id to _id."""
+    assert index_keys(("price", "-created_at", "id"))== [("price", 1), ("created_at", -1),
+        ("_id", 1)]
@@ -0,0 +1,161 @@
+"""
+Unit tests for the migration runner in src.utils.migrations.
+
+Covers both ways of applying a batch, batching keyed by _id with checkpoints, resuming after a
+checkpoint, dry runs, and throttling, with the collection and the checkpoints mocked.
+"""
+
+from unittest.mock import patch, MagicMock
+from bson import ObjectId
+from src.utils.cache import product_generation
+from src.utils.migrations import Migration, Throttle, apply_batch, run_migration, run_migrations, \
+    recount_categories
+from src.migrations.m0002_category_counters import CategoryCounters
+
+IDS= [ObjectId() for _ in range(5)]
+
+
+def make_migration(mock_collection, version= "0001", transform= None):
+    """Builds a migration over a mocked collection, using update_many unless transform is given."""
+    document= MagicMock()
+    document._get_collection.return_value= mock_collection
+
+    class TestMigration(Migration):
+        query= {"category": {"$exists": False}}
+
+        def update(self):
+            return None if transform else {"$set": {"category": ""}}
+
+    TestMigration.version= version
+    TestMigration.document= document
+    if transform:
+        TestMigration.transform= lambda self, doc: transform(doc)
+    return TestMigration()
+
+
+def test_apply_batch_update_many():
+    """Test that an update migration is one update_many on the ids of the batch."""
+    collection= MagicMock()
+    collection.update_many.return_value.modified_count= 2
+    migration= make_migration(collection)
+
+    assert apply_batch(migration, [{"_id": IDS[0]}, {"_id": IDS[1]}])== 2
+    collection.update_many.assert_called_once_with(
+        {"category": {"$exists": False}, "_id": {"$in": IDS[:2]}},
+        {"$set": {"category": ""}},
+    )
+
+
+def test_apply_batch_transform_skips_unchanged():
+    """Test that a transform migration is one bulk_write, without the unchanged documents."""
+    collection= MagicMock()
+    collection.bulk_write.return_value.modified_count= 1
+    migration= make_migration(collection, transform= lambda doc: {"$set": {"brand": "X"}} \
+        if doc["brand"]!= "X" else None)
+
+    assert apply_batch(migration, [{"_id": IDS[0], "brand": "y"}, {"_id": IDS[1], "brand": "X"}])== 1
+    operations= collection.bulk_write.call_args.args[0]
+    assert [operation._filter for operation in operations]== [{"_id": IDS[0]}]
+
+
+@patch("src.utils.migrations.product_cache")
+@patch("src.utils.migrations.Product")
+def test_apply_batch_products_stamped_and_invalidated(mock_product, mock_cache):
+    """Test that migrated products get a new modification timestamp, and are dropped from the
+    product cache."""
+    collection= MagicMock()
+    collection.update_many.return_value.modified_count= 1
+    migration= make_migration(collection)
+    migration.document= mock_product
+    mock_product._fields= {"modified_at": None}
+    mock_product._get_collection.return_value= collection
+    generation= product_generation.value
+
+    apply_batch(migration, [{"_id": IDS[0]}])
+
+    update= collection.update_many.call_args.args[1]
+    assert update["$set"]["category"]== ""
+    assert "modified_at" in update["$set"]
+    mock_cache.delete.assert_called_once_with(str(IDS[0]))
+    assert product_generation.value== generation+ 1
+
+
+@patch("src.utils.migrations.ProductCategory")
+@patch("src.utils.migrations.Product")
+def test_recount_categories(mock_product, mock_category):
+    """Test that every category gets the counts of its products, zero if it has none."""
+    mock_product._get_collection.return_value.aggregate.return_value= [
+        {"_id": "Furniture", "products": 2, "stock": 35},
+    ]
+    collection= mock_category._get_collection.return_value
+    collection.find.return_value= [{"_id": IDS[0], "title": "Furniture"},
+        {"_id": IDS[1], "title": "Lighting"}]
+
+    recount_categories()
+
+    (operations,), _= collection.bulk_write.call_args
+    assert [operation._doc["$set"] for operation in operations]== [
+        {"product_count": 2, "total_stock": 35}, {"product_count": 0, "total_stock": 0}]
+
+
+@patch("src.utils.migrations.MigrationState")
+def test_run_migration_resumes_after_checkpoint(mock_state):
+    """Test that batches are keyed by _id after the checkpoint, and each one is checkpointed."""
+    collection= MagicMock()
+    collection.update_many.return_value.modified_count= 2
+    batches= [[{"_id": IDS[3]}, {"_id": IDS[4]}], []]
+    collection.find.return_value.sort.return_value.limit.side_effect= batches
+    migration= make_migration(collection)
+
+    checkpoint= MagicMock(status= "running", last_id= IDS[2], processed= 5, modified= 5)
+    modify= mock_state.objects.return_value.modify
+    modify.side_effect= [checkpoint, MagicMock(last_id= IDS[4]), MagicMock(processed= 7, modified= 7)]
+
+    report= run_migration(migration, batch_size= 2)
+
+    first_query= collection.find.call_args_list[0].args[0]
+    assert first_query["_id"]== {"$gt": IDS[2]}
+    collection.find.return_value.sort.return_value.limit.assert_called_with(2)
+    assert modify.call_args_list[1].kwargs["set__last_id"]== IDS[4]
+    assert modify.call_args_list[2].kwargs["set__status"]== "done"
+    assert report["processed"]== 7
+
+
+@patch("src.utils.migrations.MigrationState")
+def test_run_migrations_dry_run_and_target(mock_state):
+    """Test that a dry run only counts, and migrations after the target are not run."""
+    mock_state.objects.return_value.first.return_value= None
+    collection= MagicMock()
+    collection.count_documents.return_value= 12
+    migrations= [make_migration(collection, "0002"), make_migration(collection, "0001")]
+
+    reports= run_migrations(migrations, target= "0001", dry_run= True)
+
+    assert reports== [{"version": "0001", "name": "", "status": "pending", "pending": 12}]
+    collection.update_many.assert_not_called()
+    mock_state.objects.return_value.modify.assert_not_called()
+
+
+@patch("src.utils.migrations.time")
+def test_throttle_sleeps_to_target_rate(mock_time):
+    """Test that the throttle sleeps for the time the operations should have taken."""
+    mock_time.monotonic.side_effect= [0.0, 0.5]
+    throttle= Throttle(ops_per_second= 1000)
+
+    throttle.wait(2000)
+    mock_time.sleep.assert_called_once_with(1.5)
+
+
+@patch("src.utils.migrations.Product")
+def test_category_counters_aggregates_once(mock_product):
+    """Test that the category counters are set from one aggregation of the products."""
+    mock_product._get_collection.return_value.aggregate.return_value= [
+        {"_id": "Furniture", "products": 2, "stock": 35},
+    ]
+    migration= CategoryCounters()
+
+    assert migration.transform({"_id": IDS[0], "title": "Furniture"})== \
+        {"$set": {"product_count": 2, "total_stock": 35}}
+    assert migration.transform({"_id": IDS[1], "title": "Lighting"})== \
+        {"$set": {"product_count": 0, "total_stock": 0}}
+    mock_product._get_collection.return_value.aggregate.assert_called_once()
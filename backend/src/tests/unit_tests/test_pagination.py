@@ -0,0 +1,197 @@
+"""
+Unit tests for the keyset pagination helpers in src.utils.pagination.
+
+Covers cursor encoding round trips, rejection of malformed cursors and of cursors replayed under
+another sort, the raw range filters built for single and compound sort keys, and page fetching
+on a mocked queryset.
+"""
+
+import asyncio
+import base64
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, AsyncMock
+from bson import ObjectId, json_util
+from src.utils.pagination import (
+    encode_cursor,
+    decode_cursor,
+    cursor_values,
+    keyset_filter,
+    keyset_page,
+    async_keyset_page,
+    keyset_stages,
+    with_tiebreaker,
+    order_by_keys,
+    parse_sort,
+    InvalidCursorError,
+)
+
+OID= ObjectId("65f1c2a4e13b0a6d2c8b4567")
+
+
+def test_cursor_round_trip_keeps_types():
+    """Test that ObjectId and datetime values survive encoding and decoding."""
+    sort= [("created_at", -1), ("id", 1)]
+    values= [datetime(2025, 3, 5, 18, 54, 48), OID]
+    token= encode_cursor(values, sort)
+
+    assert "=" not in token
+    assert decode_cursor(token, sort)== values
+
+
+def test_decode_cursor_rejects_garbage():
+    """Test that a token which is not a cursor raises InvalidCursorError."""
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor!", [("id", 1)])
+
+
+def test_decode_cursor_rejects_other_sort():
+    """Test that a cursor made for a different sort raises InvalidCursorError, even one with as
+    many keys, or the same keys in other directions."""
+    token= encode_cursor([100, OID], [("quantity", 1), ("id", 1)])
+    for sort in ([("id", 1)], [("name", 1), ("id", 1)], [("quantity", -1), ("id", -1)]):
+        with pytest.raises(InvalidCursorError, match= "sort order"):
+            decode_cursor(token, sort)
+    assert decode_cursor(token, [("quantity", 1), ("_id", 1)])== [100, OID]
+
+
+def test_decode_cursor_rejects_unsigned_values():
+    """Test that a token holding only the values, without the sort, is rejected."""
+    token= base64.urlsafe_b64encode(json_util.dumps([100, OID]).encode()).decode()
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token, [("quantity", 1), ("id", 1)])
+
+
+def test_with_tiebreaker():
+    """Test that the id tiebreaker is appended exactly once, at the end."""
+    assert with_tiebreaker([("price", 1)])== [("price", 1), ("id", 1)]
+    assert with_tiebreaker([("id", -1), ("price", 1)])== [("price", 1), ("id", 1)]
+    assert order_by_keys([("price", -1), ("id", 1)])== ["-price", "+id"]
+
+
+def test_with_tiebreaker_follows_first_key():
+    """Test that the tiebreaker takes the direction of the first key, unless given last."""
+    assert with_tiebreaker([("price", -1), ("created_at", 1)])== \
+        [("price", -1), ("created_at", 1), ("id", -1)]
+    assert with_tiebreaker([("_text_score", -1), ("id", 1)])== [("_text_score", -1), ("id", 1)]
+
+
+def test_parse_sort():
+    """Test that declared sorts and their opposites are accepted, and others rejected."""
+    sorts= (("name",), ("price", "-created_at"))
+
+    assert parse_sort("", sorts) is None
+    assert parse_sort("-name", sorts)== [("name", -1)]
+    assert parse_sort("price, -created_at", sorts)== [("price", 1), ("created_at", -1)]
+    assert parse_sort("-price,created_at", sorts)== [("price", -1), ("created_at", 1)]
+    with pytest.raises(ValueError, match= "-price,created_at"):
+        parse_sort("price,created_at", sorts)
+    with pytest.raises(ValueError):
+        parse_sort("brand", sorts)
+
+
+def test_parse_sort_completes_prefix():
+    """Test that the beginning of a declared sort is completed to it, in either direction."""
+    sorts= (("price",), ("price", "-created_at"), ("quantity", "created_at"))
+
+    assert parse_sort("price", sorts)== [("price", 1)]
+    assert parse_sort("quantity", sorts)== [("quantity", 1), ("created_at", 1)]
+    assert parse_sort("-quantity", sorts)== [("quantity", -1), ("created_at", -1)]
+    assert parse_sort("price", sorts[1:])== [("price", 1), ("created_at", -1)]
+    assert parse_sort("-price", sorts[1:])== [("price", -1), ("created_at", 1)]
+
+
+def test_keyset_page_keeps_sort_fields_in_projection():
+    """Test that a projected queryset also fetches the fields of the sort key."""
+    queryset= MagicMock(_loaded_fields= {"name": 1})
+    projected= queryset.only.return_value
+    projected.order_by.return_value.__getitem__.return_value= []
+
+    keyset_page(queryset, 2, sort= [("price", -1)])
+
+    queryset.only.assert_called_once_with("price", "id")
+    projected.order_by.assert_called_once_with("-price", "-id")
+
+
+def test_keyset_filter_id_only():
+    """Test that sorting only by id gives a single range condition."""
+    assert keyset_filter([("id", 1)], [OID])== {"_id": {"$gt": OID}}
+
+
+def test_keyset_filter_compound():
+    """Test the expanded tuple comparison for a compound, mixed-direction sort."""
+    query= keyset_filter([("price", -1), ("id", 1)], [500, OID])
+    assert query== {"$or": [
+        {"price": {"$lt": 500}},
+        {"price": 500, "_id": {"$gt": OID}},
+    ]}
+
+
+def test_cursor_values_from_document_and_dict():
+    """Test that sort key values are read from both Document-like objects and raw documents."""
+    sort= [("price", 1), ("id", 1)]
+    document= MagicMock(price= 10, pk= OID)
+    assert cursor_values(document, sort)== [10, OID]
+    assert cursor_values({"price": 10, "_id": OID}, sort)== [10, OID]
+
+
+def test_keyset_page_next_cursor():
+    """Test that a full page returns a cursor pointing after its last item."""
+    queryset= MagicMock(_loaded_fields= {})
+    rows= [{"_id": ObjectId(), "name": str(i)} for i in range(3)]
+    queryset.order_by.return_value.__getitem__.return_value= rows
+
+    items, next_cursor= keyset_page(queryset, 2)
+
+    queryset.order_by.assert_called_once_with("+id")
+    queryset.order_by.return_value.__getitem__.assert_called_once_with(slice(None, 3))
+    assert items== rows[:2]
+    assert decode_cursor(next_cursor, [("id", 1)])== [rows[1]["_id"]]
+
+
+def test_keyset_page_last_page():
+    """Test that a page with a valid cursor and no further items returns no next cursor."""
+    queryset= MagicMock(_loaded_fields= {})
+    filtered= queryset.filter.return_value
+    filtered.order_by.return_value.__getitem__.return_value= [{"_id": OID}]
+
+    items, next_cursor= keyset_page(queryset, 2, encode_cursor([OID], [("id", 1)]))
+
+    queryset.filter.assert_called_once_with(__raw__= {"_id": {"$gt": OID}})
+    assert items== [{"_id": OID}]
+    assert next_cursor is None
+
+
+def test_async_keyset_page_combines_cursor_with_filter():
+    """Test that the async variant ands the cursor range with the filter, and sorts by _id."""
+    documents= [{"_id": ObjectId()} for _ in range(3)]
+    cursor_mock= MagicMock()
+    cursor_mock.sort.return_value.limit.return_value.to_list= AsyncMock(return_value= documents)
+    collection= MagicMock()
+    collection.find.return_value= cursor_mock
+
+    token= encode_cursor([OID], [("id", 1)])
+    page, next_cursor= asyncio.run(
+        async_keyset_page(collection, {"brand": "Nova"}, 2, token, projection= {"name": True}))
+
+    collection.find.assert_called_once_with(
+        {"$and": [{"brand": "Nova"}, {"_id": {"$gt": OID}}]}, {"name": True, "_id": True})
+    cursor_mock.sort.assert_called_once_with([("_id", 1)])
+    cursor_mock.sort.return_value.limit.assert_called_once_with(3)
+    assert page== documents[:2]
+    assert decode_cursor(next_cursor, [("id", 1)])== [documents[1]["_id"]]
+
+
+def test_keyset_stages_keep_sort_fields():
+    """Test that the stages filter after the cursor, and never project the sort key away."""
+    sort= [("_text_score", -1), ("id", 1)]
+    token= encode_cursor([1.5, OID], sort)
+
+    stages= keyset_stages(sort, 10, token, {"name": True})
+
+    assert stages[0]== {"$match": {"$or": [
+        {"_text_score": {"$lt": 1.5}},
+        {"_text_score": 1.5, "_id": {"$gt": OID}},
+    ]}}
+    assert stages[1:3]== [{"$sort": {"_text_score": -1, "_id": 1}}, {"$limit": 11}]
+    assert stages[3]== {"$project": {"name": True, "_text_score": True, "_id": True}}
@@ -65,8 +65,8 @@ def test_modify_stock_increase(mock_datetime: MagicMock, product_instance: Produ
     """Test increasing stock updates quantity correctly and refreshes timestamp."""
     mock_datetime.datetime.utcnow.return_value = FIXED_TIME
     result: int = product_instance.modify_stock(5)
-    assert result == 5  # Should return the amount added
-    assert product_instance.quantity == 5  # Updated from default 10 to 5
+    assert result == 15  # Should return the new quantity
+    assert product_instance.quantity == 15  # Updated from default 10 to 15
     Product.save.assert_called_once()
     assert_valid_modified_at(product_instance.modified_at)
 
@@ -76,8 +76,8 @@ def test_modify_stock_decrease_valid(mock_datetime: MagicMock, product_instance:
     """Test decreasing stock with a valid value updates quantity correctly and refreshes timestamp."""
     mock_datetime.datetime.utcnow.return_value = FIXED_TIME
     result: int = product_instance.modify_stock(-3)
-    assert result == 13  # Increase because initial is 10
-    assert product_instance.quantity == 13
+    assert result == 7  # Decrease from initial 10
+    assert product_instance.quantity == 7
     Product.save.assert_called_once()
     assert_valid_modified_at(product_instance.modified_at)
 
@@ -184,3 +184,10 @@ def test_negative_quantity_on_creation_raises(mock_datetime: MagicMock) -> None:
     mock_datetime.datetime.now.return_value = FIXED_TIME.replace(tzinfo=timezone.utc)
     with pytest.raises(ValidationError):
         Product(name="X", price=10, quantity=-1).validate()
+
+
+def test_every_sort_has_an_index():
+    """Test that every sort of the product list is backed by an index ending with the id."""
+    indexes = [index for index in Product._meta["indexes"] if isinstance(index, tuple)]
+    for sort in Product.SORTS:
+        assert sort + ("id",) in indexes
@@ -9,11 +9,14 @@ from unittest.mock import patch, MagicMock
 from django.test import RequestFactory
 from django.http import JsonResponse
 from src.controllers.product_category_controller import (
+    category_list_endpoint,
     category_product_endpoint,
     get_products_in_category,
     add_product_to_category,
     remove_product_from_category,
 )
+from mongoengine import Document
+from src.controllers.product_controller import PAGE_CACHE
 from mongoengine.errors import DoesNotExist, ValidationError
 
 
@@ -23,34 +26,77 @@ def factory():
     return RequestFactory()
 
 
+@pytest.fixture(autouse=True)
+def empty_page_cache():
+    """Starts every test with an empty page cache."""
+    PAGE_CACHE.clear()
+
+
+def test_list_categories(factory):
+    """Test GET /categories returns every category with its counters, without counting products."""
+    categories = [{"_id": "1", "title": "Furniture", "description": "", "product_count": 2,
+        "total_stock": 35}]
+
+    with patch("src.controllers.product_category_controller.ProductCategoryService.list_categories",
+               return_value=categories), \
+         patch("src.controllers.product_category_controller.ProductService.count_products") as mock_count:
+        response = category_list_endpoint(factory.get("/categories"))
+
+    assert response.status_code == 200
+    assert json.loads(response.content) == {"categories": categories}
+    mock_count.assert_not_called()
+
+
+def test_list_categories_wrong_method(factory):
+    """Test that only GET is allowed on /categories."""
+    response = category_list_endpoint(factory.post("/categories"))
+    assert response.status_code == 405
+
+
 def test_get_products_in_category_success(factory):
-    """Test GET request returns list of products in category."""
-    mock_category = MagicMock(id="cat123")
-    mock_products = MagicMock()
-    mock_products.to_json.return_value = json.dumps([{"name": "Chair"}])
+    """Test GET request returns a page of the products in the category, matched by title."""
+    mock_products = [{"_id": "1", "name": "Chair"}]
 
-    with patch("src.services.product_category_service.ProductCategoryService.get_category_by_title", return_value=mock_category), \
-         patch("src.services.product_category_service.ProductCategoryService.list_products_in_category", return_value=mock_products):
+    with patch("src.controllers.product_category_controller.find_unknown_categories", return_value=set()), \
+         patch("src.controllers.product_category_controller.ProductService.count_products", return_value=3), \
+         patch("src.services.product_category_service.ProductCategoryService.list_products_in_category") as mock_list, \
+         patch("src.controllers.product_category_controller.keyset_page", return_value=(mock_products, "abc")) as mock_page:
 
-        request = factory.get("/category/Furniture")
+        request = factory.get("/categories/Furniture?limit=1&fields=name&sort=-price&include_total=true")
         response = get_products_in_category(request, "Furniture")
-        assert response.status_code == 200
-        assert json.loads(response.content) == [{"name": "Chair"}]
+
+        assert response.status_code == 206
+        data = json.loads(response.content)
+        assert data["data"] == mock_products
+        assert data["navigation"]["pages"] == 3
+        assert "cursor=abc" in data["navigation"]["next"]
+        mock_list.assert_called_once_with("Furniture", raw=True, fields=["name"])
+        mock_page.assert_called_once_with(mock_list.return_value, 1, None, [("price", -1)])
 
 
 def test_get_products_in_category_not_found(factory):
     """Test GET request for non-existent category returns 404."""
-    with patch("src.services.product_category_service.ProductCategoryService.get_category_by_title", side_effect=DoesNotExist):
+    with patch("src.controllers.product_category_controller.find_unknown_categories", return_value={"Nonexistent"}):
         request = factory.get("/category/Nonexistent")
         response = get_products_in_category(request, "Nonexistent")
         assert response.status_code == 404
 
 
+def test_get_products_in_category_invalid_params(factory):
+    """Test invalid paging params return 400 before the category is resolved."""
+    with patch("src.controllers.product_category_controller.find_unknown_categories") as mock_unknown:
+        for query in ("limit=300", "fields=secret", "sort=brand", "sort=name", "sort=quantity",
+                      "sort=price,-created_at", "q=chair"):
+            response = get_products_in_category(factory.get(f"/categories/Furniture?{query}"), "Furniture")
+            assert response.status_code == 400
+        mock_unknown.assert_not_called()
+
+
 def test_add_product_to_category_success(factory):
     """Test POST request to add a product to a category."""
     mock_category = MagicMock(id="cat123")
-    mock_product = MagicMock()
-    mock_product.to_json.return_value = json.dumps({"name": "Product A"})
+    mock_product = MagicMock(spec=Document)
+    mock_product.to_mongo.return_value = {"name": "Product A"}
 
     with patch("src.services.product_category_service.ProductCategoryService.get_category_by_title", return_value=mock_category), \
          patch("src.services.product_category_service.ProductCategoryService.add_product_to_category", return_value=mock_product):
@@ -101,8 +147,8 @@ def test_add_product_to_category_validation_error(factory):
 
 def test_remove_product_from_category_success(factory):
     """Test DELETE request to remove product from category."""
-    mock_product = MagicMock()
-    mock_product.to_json.return_value = json.dumps({"name": "Removed Product"})
+    mock_product = MagicMock(spec=Document)
+    mock_product.to_mongo.return_value = {"name": "Removed Product"}
 
     with patch("src.services.product_category_service.ProductCategoryService.remove_product_from_category", return_value=mock_product):
         request = factory.delete(
@@ -30,6 +30,20 @@ def test_create_category_success(mock_category_class, sample_category):
     assert result == mock_instance
 
 
+@patch("src.services.product_category_service.ProductCategory.objects")
+def test_list_categories_defaults_counters(mock_objects):
+    mock_objects.order_by.return_value.as_pymongo.return_value = [
+        {"_id": 1, "title": "Electronics", "product_count": 3, "total_stock": 40},
+        {"_id": 2, "title": "Furniture"},
+    ]
+
+    result = ProductCategoryService.list_categories()
+
+    mock_objects.order_by.assert_called_once_with("title")
+    assert result[0]["product_count"] == 3
+    assert (result[1]["product_count"], result[1]["total_stock"]) == (0, 0)
+
+
 @patch("src.services.product_category_service.ProductCategory.objects")
 def test_get_category_by_id(mock_objects):
     mock_category = MagicMock()
@@ -67,13 +81,15 @@ def test_update_category_success(mock_objects):
     assert result == mock_category
 
 
+@patch("src.services.product_category_service.invalidate_category_titles")
 @patch("src.services.product_category_service.ProductCategory.objects")
-def test_delete_category_success(mock_objects):
+def test_delete_category_success(mock_objects, mock_invalidate):
     mock_category = MagicMock()
     mock_objects.get.return_value = mock_category
 
     ProductCategoryService.delete_category("cat123")
     mock_category.delete.assert_called_once()
+    mock_invalidate.assert_called_once()
 
 
 @patch("src.services.product_category_service.Product.objects")
@@ -85,6 +101,16 @@ def test_list_products_in_category(mock_objects):
     assert len(result) == 2
 
 
+@patch("src.services.product_category_service.Product.objects")
+def test_list_products_in_category_raw(mock_objects):
+    raw_products = [{"name": "Chair"}]
+    mock_objects.return_value.as_pymongo.return_value = raw_products
+    result = ProductCategoryService.list_products_in_category("cat123", raw=True)
+
+    mock_objects.assert_called_once_with(category="cat123")
+    assert result == raw_products
+
+
 @patch("src.services.product_category_service.Product.objects")
 @patch("src.services.product_category_service.ProductCategory.objects")
 def test_add_product_to_category(mock_category_objects, mock_product_objects):
@@ -95,7 +121,7 @@ def test_add_product_to_category(mock_category_objects, mock_product_objects):
 
     result = ProductCategoryService.add_product_to_category("prod123", "cat123")
 
-    assert mock_product.category == mock_category
+    assert mock_product.category == mock_category.title
     mock_product.save.assert_called_once()
     assert result == mock_product
 
@@ -5,12 +5,22 @@ This module verifies CRUD functionality, pagination behavior, and validation che
 for the /product endpoint in the Django application.
 """
 
+import gzip
 import json
+from datetime import datetime
 from django.test import TestCase, RequestFactory
 from unittest.mock import patch, MagicMock
-from src.controllers.product_controller import product_endpoint
+from src.controllers.product_controller import product_endpoint, product_stock_endpoint, \
+    product_bulk_endpoint, product_export_endpoint, product_suggest_endpoint, \
+    product_facets_endpoint, PAGE_CACHE
 from src.models.product import Product
-from mongoengine.errors import DoesNotExist
+from mongoengine import Document
+from mongoengine.errors import DoesNotExist, ValidationError
+from src.utils.conditional import make_etag
+from src.utils.cache import product_generation
+from src.utils.pagination import decode_cursor
+
+MODIFIED_AT = datetime(2025, 3, 5, 18, 54, 48, 123000)
 
 class ProductEndpointTests(TestCase):
     """
@@ -22,6 +32,7 @@ class ProductEndpointTests(TestCase):
 
     def setUp(self):
         self.factory = RequestFactory()
+        PAGE_CACHE.clear()
         self.valid_product = {
             "name": "Sample Product",
             "price": 100,
@@ -29,23 +40,54 @@ class ProductEndpointTests(TestCase):
             "details": "Sample details"
         }
 
-    @patch("src.controllers.product_controller.Product.objects")
-    def test_get_product_by_id_success(self, mock_objects):
+    @patch("src.controllers.product_controller.ProductService.get_product_document")
+    def test_get_product_by_id_success(self, mock_document):
         """Test retrieving a product by valid ID returns 200 and correct data."""
-        mock_product = MagicMock()
-        mock_product.to_json.return_value = json.dumps(self.valid_product)
-        mock_objects.get.return_value = mock_product
+        mock_document.return_value = dict(self.valid_product, _id="1", modified_at=MODIFIED_AT)
 
         request = self.factory.get("/product/1")
         response = product_endpoint(request, "1")
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(json.loads(response.content), self.valid_product)
+        data = json.loads(response.content)
+        self.assertEqual(data["name"], self.valid_product["name"])
+        self.assertEqual(data["modified_at"], {"$date": 1741200888123})
+        self.assertEqual(response["ETag"], make_etag("1", MODIFIED_AT))
+        self.assertEqual(response["Last-Modified"], "Wed, 05 Mar 2025 18:54:48 GMT")
+
+    @patch("src.controllers.product_controller.ProductService.get_product_document")
+    @patch("src.controllers.product_controller.ProductService.get_product_version")
+    def test_get_product_not_modified(self, mock_version, mock_document):
+        """Test revalidating an unchanged product returns 304 without loading the document."""
+        mock_version.return_value = {"_id": "1", "modified_at": MODIFIED_AT}
+
+        request = self.factory.get("/product/1", HTTP_IF_NONE_MATCH=make_etag("1", MODIFIED_AT))
+        response = product_endpoint(request, "1")
 
-    @patch("src.controllers.product_controller.Product.objects")
-    def test_get_product_by_invalid_id(self, mock_objects):
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], make_etag("1", MODIFIED_AT))
+        mock_document.assert_not_called()
+
+    @patch("src.controllers.product_controller.ProductService.get_product_document")
+    @patch("src.controllers.product_controller.ProductService.get_product_version")
+    def test_get_product_modified_since(self, mock_version, mock_document):
+        """Test revalidating a product changed since the client's copy returns the product."""
+        mock_version.return_value = {"_id": "1", "modified_at": MODIFIED_AT}
+        mock_document.return_value = dict(self.valid_product, _id="1", modified_at=MODIFIED_AT)
+
+        request = self.factory.get(
+            "/product/1",
+            HTTP_IF_MODIFIED_SINCE="Wed, 05 Mar 2025 18:00:00 GMT"
+        )
+        response = product_endpoint(request, "1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["price"], self.valid_product["price"])
+
+    @patch("src.controllers.product_controller.ProductService.get_product_document")
+    def test_get_product_by_invalid_id(self, mock_document):
         """Test retrieving a non-existent product returns 404."""
-        mock_objects.get.side_effect = DoesNotExist
+        mock_document.side_effect = DoesNotExist
 
         request = self.factory.get("/product/999")
         response = product_endpoint(request, "999")
@@ -55,8 +97,8 @@ class ProductEndpointTests(TestCase):
     @patch("src.controllers.product_controller.create_product")
     def test_post_product_success(self, mock_create):
         """Test creating a product with valid data returns 201 and saves the product."""
-        mock_product = MagicMock()
-        mock_product.to_json.return_value = json.dumps(self.valid_product)
+        mock_product = MagicMock(spec=Document)
+        mock_product.to_mongo.return_value = self.valid_product
         mock_product.id = "1"
         mock_product.save = MagicMock()
         mock_create.return_value = mock_product
@@ -107,14 +149,9 @@ class ProductEndpointTests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("price", response.content.decode())
 
-    @patch("src.controllers.product_controller.Product.objects")
-    def test_patch_update_product(self, mock_objects):
-        """Test updating product fields returns 204 and saves the updated product."""
-        mock_product = MagicMock()
-        mock_product.id = "1"
-        mock_product.save = MagicMock()
-        mock_objects.get.return_value = mock_product
-
+    @patch("src.controllers.product_controller.ProductService.update_product")
+    def test_patch_update_product(self, mock_update):
+        """Test updating product fields returns 204 and writes the changes."""
         request = self.factory.patch(
             "/product/1",
             data=json.dumps({"price": 200}),
@@ -123,6 +160,23 @@ class ProductEndpointTests(TestCase):
 
         response = product_endpoint(request, "1")
         self.assertEqual(response.status_code, 204)
+        self.assertEqual(response["Location"], "/products/1")
+        mock_update.assert_called_once_with("1", {"price": 200})
+
+    @patch("src.controllers.product_controller.ProductService.update_product")
+    def test_patch_update_invalid_field(self, mock_update):
+        """Test updating with an invalid field returns 400."""
+        mock_update.side_effect = ValidationError("Field colour is not a valid field.")
+
+        request = self.factory.patch(
+            "/product/1",
+            data=json.dumps({"colour": "red"}),
+            content_type="application/json"
+        )
+
+        response = product_endpoint(request, "1")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("colour", response.content.decode())
 
     @patch("src.controllers.product_controller.Product.objects")
     def test_patch_update_with_id_field_should_fail(self, mock_objects):
@@ -141,10 +195,10 @@ class ProductEndpointTests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("Product ID cannot be updated", response.content.decode())
 
-    @patch("src.controllers.product_controller.Product.objects")
-    def test_patch_product_not_found(self, mock_objects):
+    @patch("src.controllers.product_controller.ProductService.update_product")
+    def test_patch_product_not_found(self, mock_update):
         """Test updating non-existent product returns 404."""
-        mock_objects.get.side_effect = DoesNotExist
+        mock_update.side_effect = DoesNotExist
 
         request = self.factory.patch(
             "/product/999",
@@ -155,38 +209,35 @@ class ProductEndpointTests(TestCase):
 
         self.assertEqual(response.status_code, 404)
 
-    @patch("src.controllers.product_controller.Product.objects")
-    def test_delete_product_success(self, mock_objects):
+    @patch("src.controllers.product_controller.ProductService.delete_product")
+    def test_delete_product_success(self, mock_delete):
         """Test successful deletion of product returns 204."""
-        mock_product = MagicMock()
-        mock_objects.get.return_value = mock_product
-
         request = self.factory.delete("/product/1")
         response = product_endpoint(request, "1")
 
         self.assertEqual(response.status_code, 204)
+        mock_delete.assert_called_once_with("1")
 
-    @patch("src.controllers.product_controller.Product.objects")
-    def test_delete_product_not_found(self, mock_objects):
+    @patch("src.controllers.product_controller.ProductService.delete_product")
+    def test_delete_product_not_found(self, mock_delete):
         """Test deleting non-existent product returns 404."""
-        mock_objects.get.side_effect = DoesNotExist
+        mock_delete.side_effect = DoesNotExist
 
         request = self.factory.delete("/product/404")
         response = product_endpoint(request, "404")
 
         self.assertEqual(response.status_code, 404)
 
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=3)
     @patch("src.controllers.product_controller.Product.objects")
-    def test_get_paginated_products(self, mock_objects):
+    def test_get_paginated_products(self, mock_objects, _mock_count):
         """Test fetching paginated products returns 206 with data and navigation."""
-        mock_objects.count.return_value = 3
-        mock_qs = MagicMock()
-        mock_qs.to_json.return_value = json.dumps([
+        mock_qs = mock_objects.as_pymongo.return_value
+        mock_qs.order_by.return_value.__getitem__.return_value = [
             self.valid_product,
             self.valid_product,
             self.valid_product
-        ])
-        mock_objects.__getitem__.return_value = mock_qs
+        ]
 
         request = self.factory.get("/product?start=0&limit=2")
         response = product_endpoint(request)
@@ -196,6 +247,162 @@ class ProductEndpointTests(TestCase):
         self.assertIn("data", data)
         self.assertIn("navigation", data)
 
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=3)
+    @patch("src.controllers.product_controller.keyset_page")
+    @patch("src.controllers.product_controller.Product.objects")
+    def test_get_cursor_paginated_products(self, _mock_objects, mock_keyset_page, mock_count):
+        """Test fetching a page without start uses the cursor in the next navigation link, and
+        does not count the products unless asked to."""
+        mock_keyset_page.return_value = ([self.valid_product, self.valid_product], "abc")
+
+        request = self.factory.get("/product?limit=2&brand=Acme")
+        response = product_endpoint(request)
+
+        self.assertEqual(response.status_code, 206)
+        data = json.loads(response.content)
+        self.assertEqual(data["data"], [self.valid_product, self.valid_product])
+        self.assertEqual(data["navigation"]["next"], "/product?limit=2&brand=Acme&cursor=abc")
+        self.assertIsNone(data["navigation"]["prev"])
+        self.assertNotIn("pages", data["navigation"])
+        mock_count.assert_not_called()
+
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=3)
+    @patch("src.controllers.product_controller.ProductService.search_products")
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_get_products_text_search(self, mock_filtered, mock_search, _mock_count):
+        """Test the q param searches with the other filters, and pages by relevance."""
+        mock_search.return_value = ([self.valid_product], "abc")
+
+        request = self.factory.get("/product?limit=1&q=%20chair%20&price_less_than_e=500")
+        response = product_endpoint(request)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(mock_filtered.call_args.kwargs["search"], "chair")
+        self.assertEqual(mock_filtered.call_args.kwargs["price_less_than_e"], 500)
+        mock_search.assert_called_once_with(mock_filtered.return_value, 1, None)
+        data = json.loads(response.content)
+        self.assertIn("q=+chair+", data["navigation"]["next"])
+        self.assertIn("cursor=abc", data["navigation"]["next"])
+
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=3)
+    @patch("src.controllers.product_controller.keyset_page")
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_get_products_sorted(self, mock_filtered, mock_keyset_page, _mock_count):
+        """Test the sort param sorts cursor pages, completed to a declared sort, and is kept in
+        the navigation links."""
+        mock_keyset_page.return_value = ([self.valid_product], "abc")
+
+        request = self.factory.get("/product?limit=1&sort=-price")
+        response = product_endpoint(request)
+
+        self.assertEqual(response.status_code, 206)
+        mock_keyset_page.assert_called_once_with(mock_filtered.return_value, 1, None, \
+            [("price", -1), ("created_at", 1)])
+        self.assertIn("sort=-price", json.loads(response.content)["navigation"]["next"])
+
+    def test_get_products_invalid_sort(self):
+        """Test an unsupported sort, or a sort with a text search, returns 400."""
+        for query in ("sort=brand", "sort=price,created_at", "sort=price&q=chair"):
+            response = product_endpoint(self.factory.get(f"/product?{query}"))
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("sort", response.content.decode())
+
+    def test_get_paginated_invalid_cursor_param(self):
+        """Test invalid cursor param returns 400."""
+        request = self.factory.get("/product?cursor=abc")
+        with patch("src.controllers.product_controller.Product.objects"):
+            response = product_endpoint(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cursor", response.content.decode())
+
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=0)
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_get_paginated_products_with_fields(self, mock_filtered, _mock_count):
+        """Test the fields param is passed to the service as a projection."""
+        mock_filtered.return_value.order_by.return_value.__getitem__.return_value = []
+
+        request = self.factory.get("/product?start=0&fields=name,price,quantity")
+        response = product_endpoint(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_filtered.call_args.kwargs["fields"], ["name", "price", "quantity"])
+
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=3)
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_get_paginated_products_cached(self, mock_filtered, _mock_count):
+        """Test equivalent listing requests share a cached page, until the next product write."""
+        mock_filtered.return_value.order_by.return_value.__getitem__.return_value = [self.valid_product]
+
+        first = product_endpoint(self.factory.get("/product?start=0&limit=2&fields=name,price"))
+        second = product_endpoint(self.factory.get("/product?fields=price,name&limit=2&start=0"))
+
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(mock_filtered.call_count, 1)
+
+        product_generation.bump()
+        third = product_endpoint(self.factory.get("/product?start=0&limit=2&fields=name,price"))
+        self.assertEqual(third["X-Cache"], "MISS")
+        self.assertEqual(mock_filtered.call_count, 2)
+
+    def test_get_paginated_invalid_fields_param(self):
+        """Test unknown field in fields param returns 400."""
+        request = self.factory.get("/product?fields=name,secret")
+        response = product_endpoint(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.content.decode())
+
+    @patch("src.controllers.product_controller.ProductService.count_products")
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_get_paginated_products_without_total(self, mock_filtered, mock_count):
+        """Test include_total=false skips the count and leaves pages out of navigation, and the
+        next page is linked by the cursor of the last product, not by start."""
+        mock_filtered.return_value.order_by.return_value._loaded_fields = {}
+        mock_filtered.return_value.order_by.return_value.__getitem__.return_value = [
+            dict(self.valid_product, _id=1),
+            dict(self.valid_product, _id=2),
+            dict(self.valid_product, _id=3),
+        ]
+
+        request = self.factory.get("/product?start=0&limit=2&include_total=false")
+        response = product_endpoint(request)
+
+        mock_count.assert_not_called()
+        mock_filtered.return_value.order_by.assert_called_once_with("+id")
+        mock_filtered.return_value.order_by.return_value.__getitem__ \
+            .assert_called_once_with(slice(0, 3))
+        self.assertEqual(response.status_code, 206)
+        data = json.loads(response.content)
+        self.assertEqual(len(data["data"]), 2)
+        self.assertNotIn("pages", data["navigation"])
+        self.assertNotIn("start", data["navigation"]["next"])
+        cursor = data["navigation"]["next"].split("cursor=")[1].split("&")[0]
+        self.assertEqual(decode_cursor(cursor, [("id", 1)]), [2])
+        self.assertEqual(data["navigation"]["self"], "/product?start=0&limit=2")
+
+    @patch("src.controllers.product_controller.ProductService.count_products", return_value=5)
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_get_paginated_products_next_cursor_keeps_sort(self, mock_filtered, _mock_count):
+        """Test the next link of an offset page is a cursor for the sort of the page, fetched
+        along with the fields, and keeps the filters and the total."""
+        ordered = mock_filtered.return_value.order_by.return_value
+        ordered.only.return_value.__getitem__.return_value = [
+            {"_id": 1, "name": "A", "quantity": 4}, {"_id": 2, "name": "B", "quantity": 7},
+        ]
+
+        request = self.factory.get("/product?start=2&limit=2&fields=name&sort=-quantity&brand=X")
+        data = json.loads(product_endpoint(request).content)
+
+        mock_filtered.return_value.order_by.assert_called_once_with("-quantity", "-id")
+        ordered.only.assert_called_once_with("quantity", "id")
+        ordered.only.return_value.__getitem__.assert_called_once_with(slice(2, 4))
+        next_uri = data["navigation"]["next"]
+        self.assertIn("brand=X", next_uri)
+        self.assertIn("include_total=true", next_uri)
+        cursor = next_uri.split("cursor=")[1].split("&")[0]
+        self.assertEqual(decode_cursor(cursor, [("quantity", -1), ("id", -1)]), [7, 2])
+
     def test_get_paginated_invalid_start_param(self):
         """Test invalid start param returns 400."""
         request = self.factory.get("/product?start=abc")
@@ -210,6 +417,13 @@ class ProductEndpointTests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("limit", response.content.decode())
 
+    def test_get_paginated_invalid_filter_param(self):
+        """Test a numeric filter that is not an integer returns 400, in both page modes."""
+        for query in ("price_less_than_e=cheap", "start=0&quantity_greater_than_e=1.5"):
+            response = product_endpoint(self.factory.get(f"/product?{query}"))
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn(query.split("&")[-1].split("=")[0], response.content.decode())
+
     def test_get_paginated_limit_too_large(self):
         """Test exceeding max limit param returns 400."""
         request = self.factory.get("/product?limit=300")
@@ -222,3 +436,212 @@ class ProductEndpointTests(TestCase):
         request = self.factory.put("/product")
         response = product_endpoint(request)
         self.assertEqual(response.status_code, 405)
+
+    @patch("src.controllers.product_controller.ProductService.modify_stock", return_value=7)
+    def test_adjust_stock_success(self, mock_modify):
+        """Test adjusting stock returns 200 with the updated quantity."""
+        request = self.factory.post(
+            "/products/1/stock",
+            data=json.dumps({"delta": -3}),
+            content_type="application/json"
+        )
+        response = product_stock_endpoint(request, "1")
+
+        mock_modify.assert_called_once_with("1", -3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"id": "1", "quantity": 7})
+
+    @patch("src.controllers.product_controller.ProductService.modify_stock",
+           side_effect=ValueError("Stock cannot be negative."))
+    def test_adjust_stock_insufficient(self, _mock_modify):
+        """Test decreasing stock below zero returns 409."""
+        request = self.factory.post(
+            "/products/1/stock",
+            data=json.dumps({"delta": -300}),
+            content_type="application/json"
+        )
+        response = product_stock_endpoint(request, "1")
+        self.assertEqual(response.status_code, 409)
+
+    @patch("src.controllers.product_controller.ProductService.modify_stock",
+           side_effect=DoesNotExist)
+    def test_adjust_stock_not_found(self, _mock_modify):
+        """Test adjusting stock of a non-existent product returns 404."""
+        request = self.factory.post(
+            "/products/999/stock",
+            data=json.dumps({"delta": 1}),
+            content_type="application/json"
+        )
+        response = product_stock_endpoint(request, "999")
+        self.assertEqual(response.status_code, 404)
+
+    def test_adjust_stock_invalid_delta(self):
+        """Test a non-integer delta returns 400."""
+        request = self.factory.post(
+            "/products/1/stock",
+            data=json.dumps({"delta": "5"}),
+            content_type="application/json"
+        )
+        response = product_stock_endpoint(request, "1")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("delta", response.content.decode())
+
+    @patch("src.controllers.product_controller.ProductService.suggest_products")
+    def test_suggest_products(self, mock_suggest):
+        """Test suggestions are returned for a prefix, with the requested limit."""
+        mock_suggest.return_value = [{"_id": "1", "name": "Stapler Machine Set", "quantity": 85}]
+        request = self.factory.get("/products/suggest?prefix=sta&limit=5")
+        response = product_suggest_endpoint(request)
+
+        mock_suggest.assert_called_once_with("sta", 5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["data"][0]["name"], "Stapler Machine Set")
+
+    def test_suggest_products_invalid_params(self):
+        """Test a missing prefix, or a limit out of range, returns 400."""
+        for query in ("", "?prefix=%20", "?prefix=a&limit=0", "?prefix=a&limit=51",
+                      "?prefix=a&limit=x"):
+            response = product_suggest_endpoint(self.factory.get(f"/products/suggest{query}"))
+            self.assertEqual(response.status_code, 400, query)
+
+    @patch("src.models.product.Product._get_collection")
+    @patch("src.controllers.product_controller.ProductService.get_facets")
+    def test_facets(self, mock_facets, _mock_collection):
+        """Test facets are computed for the filtered queryset."""
+        mock_facets.return_value = {"total": 2, "category": [], "brand": [], "price": []}
+        request = self.factory.get("/products/facets?brand=Acme&price_less_than_e=500")
+        response = product_facets_endpoint(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["total"], 2)
+        data = mock_facets.call_args.args[0]
+        self.assertEqual(data._query, {"brand": "Acme", "price": {"$lte": 500}})
+
+    def test_facets_invalid_filter(self):
+        """Test a non-integer numeric filter returns 400."""
+        response = product_facets_endpoint(self.factory.get("/products/facets?price_less_than_e=x"))
+        self.assertEqual(response.status_code, 400)
+
+    @patch("src.controllers.product_controller.ProductService.create_products")
+    def test_bulk_create_partial_success(self, mock_create):
+        """Test bulk creation reports a result per item, and returns 207 on partial failure."""
+        mock_create.return_value = [{"id": "1"}, {"error": "Category 'Nope' does not exist"}]
+        items = [self.valid_product, {"price": 1, "quantity": 1}, self.valid_product]
+
+        request = self.factory.post(
+            "/products/bulk",
+            data=json.dumps(items),
+            content_type="application/json"
+        )
+        response = product_bulk_endpoint(request)
+
+        mock_create.assert_called_once_with([self.valid_product, self.valid_product])
+        self.assertEqual(response.status_code, 207)
+        data = json.loads(response.content)
+        self.assertEqual(data["created"], 1)
+        self.assertEqual(data["failed"], 2)
+        self.assertEqual([result["status"] for result in data["results"]], [201, 400, 400])
+        self.assertEqual(data["results"][0]["id"], "1")
+        self.assertIn("name", data["results"][1]["details"])
+
+    @patch("src.controllers.product_controller.ProductService.create_products")
+    def test_bulk_create_ndjson(self, mock_create):
+        """Test bulk creation accepts one product per line."""
+        mock_create.return_value = [{"id": "1"}, {"id": "2"}]
+        body = "\n".join(json.dumps(self.valid_product) for _ in range(2)) + "\n"
+
+        request = self.factory.post("/products/bulk", data=body, \
+            content_type="application/x-ndjson")
+        response = product_bulk_endpoint(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)["created"], 2)
+
+    def test_bulk_create_not_an_array(self):
+        """Test bulk creation with a body that is not an array returns 400."""
+        request = self.factory.post(
+            "/products/bulk",
+            data=json.dumps(self.valid_product),
+            content_type="application/json"
+        )
+        response = product_bulk_endpoint(request)
+        self.assertEqual(response.status_code, 400)
+
+    @patch("src.controllers.product_controller.ProductService.update_products")
+    def test_bulk_update(self, mock_update):
+        """Test bulk update returns a status per id, and 207 if some updates failed."""
+        mock_update.return_value = [
+            {"id": "1", "matched": True, "modified": True},
+            {"id": "2", "matched": False, "modified": False},
+            {"id": "3", "error": "Field sku is not a valid field."},
+        ]
+        updates = [
+            {"id": "1", "changes": {"price": 5}},
+            {"id": "2", "changes": {"price": 5}},
+            {"id": "3", "changes": {"sku": 5}},
+        ]
+
+        request = self.factory.patch(
+            "/products/bulk",
+            data=json.dumps(updates),
+            content_type="application/json"
+        )
+        response = product_bulk_endpoint(request)
+
+        mock_update.assert_called_once_with(updates)
+        self.assertEqual(response.status_code, 207)
+        data = json.loads(response.content)
+        self.assertEqual((data["matched"], data["modified"], data["failed"]), (1, 1, 2))
+        self.assertEqual([result["status"] for result in data["results"]], [200, 404, 400])
+
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_export_ndjson_streams_filtered_products(self, mock_filtered):
+        """Test export streams one line per product, from one cursor over the filtered products."""
+        stream = mock_filtered.return_value.order_by.return_value.no_cache.return_value
+        stream.batch_size.return_value = iter([{"name": "A"}, {"name": "B"}])
+
+        request = self.factory.get("/products/export?brand=Acme&fields=name")
+        response = product_export_endpoint(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(body, b'{"name":"A"}\n{"name":"B"}\n')
+        self.assertEqual(mock_filtered.call_args.kwargs["brand"], "Acme")
+        self.assertEqual(mock_filtered.call_args.kwargs["fields"], ["name"])
+
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_export_csv_gzip(self, mock_filtered):
+        """Test export as CSV is compressed when the client accepts gzip."""
+        stream = mock_filtered.return_value.order_by.return_value.no_cache.return_value
+        stream.batch_size.return_value = iter([{"_id": "1", "name": "A", "price": 5}])
+
+        request = self.factory.get(
+            "/products/export?format=csv&fields=name,price",
+            HTTP_ACCEPT_ENCODING="gzip"
+        )
+        response = product_export_endpoint(request)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, b"id,name,price\r\n1,A,5\r\n")
+
+    @patch("src.controllers.product_controller.ProductService.get_product_filtered")
+    def test_export_gzip_refused(self, mock_filtered):
+        """Test export is not compressed when the client refuses gzip with q=0."""
+        stream = mock_filtered.return_value.order_by.return_value.no_cache.return_value
+        stream.batch_size.return_value = iter([{"_id": "1", "name": "A"}])
+
+        request = self.factory.get("/products/export?fields=name",
+            HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        response = product_export_endpoint(request)
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertIn(b'"name":"A"', b"".join(response.streaming_content))
+
+    def test_export_invalid_format(self):
+        """Test export with an unsupported format returns 400."""
+        request = self.factory.get("/products/export?format=xml")
+        response = product_export_endpoint(request)
+        self.assertEqual(response.status_code, 400)
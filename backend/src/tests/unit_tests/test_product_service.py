@@ -8,8 +8,12 @@ by mocking database interactions using pytest and unittest.mock.
 
 import pytest
 from unittest.mock import patch, MagicMock
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from mongoengine.errors import DoesNotExist, ValidationError
 from src.services.product_service import ProductService
 from src.models.product import Product
+from src.utils.cache import product_generation, product_cache
 
 
 @pytest.fixture
@@ -43,71 +47,446 @@ def test_create_product_success(mock_product_class, sample_data):
     assert result == mock_product_instance
 
 
-@patch("src.services.product_service.Product.objects")
-def test_get_product_by_id_success(mock_objects):
-    """Test fetching a product by its ID."""
-    mock_product = MagicMock()
-    mock_objects.get.return_value = mock_product
+PRODUCT_ID = "65f1c2a4e13b0a6d2c8b4567"
 
-    result = ProductService.get_product_by_id("abc123")
-    mock_objects.get.assert_called_once_with(id="abc123")
-    assert result == mock_product
 
+@pytest.fixture(autouse=True)
+def empty_product_cache():
+    """Starts every test with an empty product cache."""
+    product_cache.clear()
 
-@patch("src.services.product_service.Product.objects")
-def test_update_product_calls_modify_fields(mock_objects):
-    """Test that update_product calls modify_fields on the fetched product."""
-    mock_product = MagicMock()
-    mock_objects.get.return_value = mock_product
 
-    update_data = {"price": 120}
-    result = ProductService.update_product("abc123", update_data)
+@patch("src.services.product_service.Product._get_collection")
+def test_get_product_by_id_success(mock_collection):
+    """Test fetching a product by its ID, then again from the product cache."""
+    mock_collection.return_value.find_one.return_value = {
+        "_id": ObjectId(PRODUCT_ID), "name": "Test Product", "price": 99, "quantity": 50
+    }
 
-    mock_product.modify_fields.assert_called_once_with(update_data)
-    assert result == mock_product
+    result = ProductService.get_product_by_id(PRODUCT_ID)
+    again = ProductService.get_product_by_id(PRODUCT_ID)
 
+    mock_collection.return_value.find_one.assert_called_once_with({"_id": ObjectId(PRODUCT_ID)})
+    assert isinstance(result, Product)
+    assert (result.id, result.price) == (ObjectId(PRODUCT_ID), 99)
+    assert again is not result
 
-@patch("src.services.product_service.Product.objects")
-def test_delete_product_calls_delete(mock_objects):
-    """Test that delete_product calls delete on the fetched product."""
-    mock_product = MagicMock()
-    mock_objects.get.return_value = mock_product
 
-    ProductService.delete_product("abc123")
-    mock_product.delete.assert_called_once()
+@patch("src.services.product_service.Product._get_collection")
+def test_product_cache_invalidated_on_write(mock_collection):
+    """Test that updating a product removes it from the product cache."""
+    mock_collection.return_value.find_one.return_value = {"_id": ObjectId(PRODUCT_ID), "price": 99}
+    mock_collection.return_value.update_one.return_value.matched_count = 1
 
+    ProductService.get_product_document(PRODUCT_ID)
+    ProductService.update_product(PRODUCT_ID, {"price": 120})
+    ProductService.get_product_document(PRODUCT_ID)
 
-@patch("src.services.product_service.Product.objects")
-def test_modify_stock_success(mock_objects):
-    """Test modifying stock of a product returns updated quantity."""
-    mock_product = MagicMock()
-    mock_product.modify_stock.return_value = 75
-    mock_objects.get.return_value = mock_product
-
-    result = ProductService.modify_stock("abc123", 5)
-    mock_product.modify_stock.assert_called_once_with(5)
+    assert mock_collection.return_value.find_one.call_count == 2
+
+
+def test_get_product_document_invalid_id():
+    """Test that an invalid id raises DoesNotExist without a query."""
+    with pytest.raises(DoesNotExist):
+        ProductService.get_product_document("abc123")
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_update_product_single_write(mock_collection):
+    """Test that update_product is one update_one with $set, without fetching the product."""
+    mock_collection.return_value.update_one.return_value.matched_count = 1
+    generation = product_generation.value
+
+    ProductService.update_product(PRODUCT_ID, {"price": 120})
+
+    query, update = mock_collection.return_value.update_one.call_args.args
+    assert query == {"_id": ObjectId(PRODUCT_ID)}
+    assert update["$set"]["price"] == 120
+    assert "modified_at" in update["$set"]
+    mock_collection.return_value.find_one.assert_not_called()
+    assert product_generation.value == generation + 1
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_update_product_not_found(mock_collection):
+    """Test that update_product raises DoesNotExist when no product matched."""
+    mock_collection.return_value.update_one.return_value.matched_count = 0
+
+    with pytest.raises(DoesNotExist):
+        ProductService.update_product(PRODUCT_ID, {"price": 120})
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_update_product_invalid_field(mock_collection):
+    """Test that update_product rejects unknown fields before writing."""
+    with pytest.raises(ValidationError):
+        ProductService.update_product(PRODUCT_ID, {"colour": "red"})
+
+    mock_collection.return_value.update_one.assert_not_called()
+
+
+@patch("src.services.product_service.update_category_counters")
+@patch("src.services.product_service.Product._get_collection")
+def test_update_product_category_change_counted(mock_collection, mock_counters):
+    """Test that moving a product returns its previous category and stock in the same write."""
+    mock_collection.return_value.find_one_and_update.return_value = \
+        {"category": "Furniture", "quantity": 4}
+
+    with patch("src.services.product_service.find_unknown_categories", return_value=set()):
+        ProductService.update_product(PRODUCT_ID, {"category": "Lighting"})
+
+    mock_collection.return_value.update_one.assert_not_called()
+    mock_counters.assert_called_once_with({"Furniture": [-1, -4], "Lighting": [1, 4]})
+
+
+@patch("src.services.product_service.update_category_counters")
+@patch("src.services.product_service.Product._get_collection")
+def test_delete_product_single_write(mock_collection, mock_counters):
+    """Test that delete_product is one find_one_and_delete, raising DoesNotExist if nothing was
+    deleted, and removes the product from the counters of its category."""
+    mock_collection.return_value.find_one_and_delete.return_value = \
+        {"category": "Furniture", "quantity": 4}
+    ProductService.delete_product(PRODUCT_ID)
+    mock_collection.return_value.find_one_and_delete.assert_called_once_with(
+        {"_id": ObjectId(PRODUCT_ID)}, projection={"category": True, "quantity": True})
+    mock_counters.assert_called_once_with({"Furniture": [-1, -4]})
+
+    mock_collection.return_value.find_one_and_delete.return_value = None
+    with pytest.raises(DoesNotExist):
+        ProductService.delete_product(PRODUCT_ID)
+
+
+@patch("src.services.product_service.update_category_counters")
+@patch("src.services.product_service.Product._get_collection")
+def test_modify_stock_success(mock_collection, mock_counters):
+    """Test modifying stock is one conditional $inc, returning the updated quantity."""
+    mock_collection.return_value.find_one_and_update.return_value = \
+        {"quantity": 80, "category": "Furniture"}
+
+    result = ProductService.modify_stock(PRODUCT_ID, -5)
+
+    query, update = mock_collection.return_value.find_one_and_update.call_args.args
+    assert query == {"_id": ObjectId(PRODUCT_ID), "quantity": {"$gte": 5}}
+    assert update["$inc"] == {"quantity": -5}
+    assert "modified_at" in update["$set"]
     assert result == 75
+    mock_counters.assert_called_once_with({"Furniture": [0, -5]})
 
 
-@patch("src.services.product_service.Product.objects")
-def test_set_stock_success(mock_objects):
+@patch("src.services.product_service.Product._get_collection")
+def test_modify_stock_insufficient_raises(mock_collection):
+    """Test that a decrement larger than the stock raises ValueError."""
+    mock_collection.return_value.find_one_and_update.return_value = None
+    mock_collection.return_value.count_documents.return_value = 1
+
+    with pytest.raises(ValueError, match="Stock cannot be negative."):
+        ProductService.modify_stock(PRODUCT_ID, -500)
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_modify_stock_missing_product_raises(mock_collection):
+    """Test that adjusting the stock of a missing product raises DoesNotExist."""
+    mock_collection.return_value.find_one_and_update.return_value = None
+    mock_collection.return_value.count_documents.return_value = 0
+
+    with pytest.raises(DoesNotExist):
+        ProductService.modify_stock(PRODUCT_ID, -5)
+
+
+def test_modify_stock_invalid_id_raises():
+    """Test that an invalid product ID raises ValidationError."""
+    with pytest.raises(ValidationError):
+        ProductService.modify_stock("abc123", 5)
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_set_stock_success(mock_collection):
     """Test setting stock of a product returns new quantity."""
-    mock_product = MagicMock()
-    mock_product.set_stock.return_value = 30
-    mock_objects.get.return_value = mock_product
+    mock_collection.return_value.find_one_and_update.return_value = {"quantity": 12}
+
+    result = ProductService.set_stock(PRODUCT_ID, 30)
 
-    result = ProductService.set_stock("abc123", 30)
-    mock_product.set_stock.assert_called_once_with(30)
+    query, update = mock_collection.return_value.find_one_and_update.call_args.args
+    assert query == {"_id": ObjectId(PRODUCT_ID)}
+    assert update["$set"]["quantity"] == 30
     assert result == 30
 
 
-@patch("src.services.product_service.Product.objects")
-def test_set_price_success(mock_objects):
+@patch("src.services.product_service.Product._get_collection")
+def test_set_price_success(mock_collection):
     """Test setting price of a product returns updated price."""
-    mock_product = MagicMock()
-    mock_product.set_price.return_value = 149
-    mock_objects.get.return_value = mock_product
+    mock_collection.return_value.find_one_and_update.return_value = {"price": 99}
 
-    result = ProductService.set_price("abc123", 149)
-    mock_product.set_price.assert_called_once_with(149)
+    result = ProductService.set_price(PRODUCT_ID, 149)
+
+    _, update = mock_collection.return_value.find_one_and_update.call_args.args
+    assert update["$set"]["price"] == 149
     assert result == 149
+
+
+def test_set_price_negative_raises():
+    """Test that a negative price raises ValueError without writing."""
+    with pytest.raises(ValueError, match="Price cannot be negative."):
+        ProductService.set_price(PRODUCT_ID, -1)
+
+
+@patch("src.services.product_service.Product.objects")
+def test_get_product_filtered_raw(mock_objects):
+    """Test that the raw read path filters, then skips Document construction via as_pymongo."""
+    result = ProductService.get_product_filtered("", "", "Acme", 100, -1, -1, -1, raw=True)
+
+    mock_objects.filter.assert_called_once_with(brand="Acme")
+    mock_objects.filter.return_value.filter.assert_called_once_with(price__lte=100)
+    assert result == mock_objects.filter.return_value.filter.return_value.as_pymongo.return_value
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_get_product_filtered_search(_mock_collection):
+    """Test that a search adds a $text condition to the filters, sorted by relevance."""
+    data = ProductService.get_product_filtered("", "Books", "", 500, -1, -1, -1, search="chair")
+
+    assert data._query == {"category": "Books", "price": {"$lte": 500}, \
+        "$text": {"$search": "chair"}}
+    assert data._ordering == [("_text_score", {"$meta": "textScore"})]
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_search_products_pages_by_score(mock_collection):
+    """Test that a search page is one aggregation, matching on $text first."""
+    documents = [{"_id": ObjectId(), "_text_score": 2.5}, {"_id": ObjectId(), "_text_score": 1.0}]
+    mock_collection.return_value.aggregate.return_value = iter(documents)
+    data = ProductService.get_product_filtered("", "", "", -1, -1, -1, -1, \
+        fields=["name"], search="chair")
+
+    page, next_cursor = ProductService.search_products(data, 1)
+
+    pipeline = mock_collection.return_value.aggregate.call_args.args[0]
+    assert pipeline[0] == {"$match": {"$text": {"$search": "chair"}}}
+    assert pipeline[2] == {"$sort": {"_text_score": -1, "_id": 1}}
+    assert pipeline[-1] == {"$project": {"name": True, "_text_score": True, "_id": True}}
+    assert page == documents[:1]
+    assert next_cursor is not None
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_count_products_unfiltered_uses_estimate(mock_collection):
+    """Test that an unfiltered count uses the collection's estimated document count."""
+    mock_collection.return_value.estimated_document_count.return_value = 42
+    data = MagicMock(_query={})
+
+    assert ProductService.count_products(data) == 42
+    data.count.assert_not_called()
+
+
+def test_count_products_filtered_is_cached_until_write():
+    """Test that filtered counts are cached per filter, and invalidated by writes."""
+    data = MagicMock(_query={"brand": "Acme"})
+    data.count.return_value = 7
+
+    assert ProductService.count_products(data) == 7
+    assert ProductService.count_products(data) == 7
+    data.count.assert_called_once()
+
+    product_generation.bump()
+    assert ProductService.count_products(data) == 7
+    assert data.count.call_count == 2
+
+
+def test_facet_pipeline_leaves_out_own_filter():
+    """Test that every facet is counted with the filters of the other facets only."""
+    query = {"category": "Books", "brand": "Acme", "price": {"$lte": 500},
+             "$text": {"$search": "chair"}}
+
+    match, facet = ProductService.facet_pipeline(query)
+
+    assert match == {"$match": {"$text": {"$search": "chair"}}}
+    assert facet["$facet"]["category"][0] == \
+        {"$match": {"brand": "Acme", "price": {"$lte": 500}}}
+    assert facet["$facet"]["price"][0] == {"$match": {"category": "Books", "brand": "Acme"}}
+    assert facet["$facet"]["total"][0] == \
+        {"$match": {"category": "Books", "brand": "Acme", "price": {"$lte": 500}}}
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_get_facets_is_one_cached_aggregation(mock_collection):
+    """Test that facets come from one aggregation, with every price bucket, and are cached."""
+    mock_collection.return_value.aggregate.side_effect = lambda pipeline: iter([{
+        "category": [{"_id": "Books", "count": 3}],
+        "brand": [{"_id": "Acme", "count": 2}, {"_id": "Zeta", "count": 1}],
+        "price": [{"_id": 500, "count": 2}, {"_id": 25000, "count": 1}],
+        "total": [{"count": 3}],
+    }])
+    data = MagicMock(_query={"category": "Books"})
+
+    facets = ProductService.get_facets(data)
+    assert ProductService.get_facets(data) == facets
+    mock_collection.return_value.aggregate.assert_called_once()
+
+    assert facets["total"] == 3
+    assert facets["brand"][0] == {"value": "Acme", "count": 2}
+    assert facets["price"][0] == {"min": 0, "max": 500, "count": 0}
+    assert facets["price"][1] == {"min": 500, "max": 1000, "count": 2}
+    assert facets["price"][-1] == {"min": 25000, "max": None, "count": 1}
+
+
+@patch("src.services.product_service.find_unknown_categories", return_value={"Nope"})
+@patch("src.services.product_service.Product._get_collection")
+def test_create_products_partial_success(mock_collection, mock_unknown, sample_data):
+    """Test that valid items are inserted in one batch, and invalid ones are reported."""
+    items = [
+        sample_data,
+        dict(sample_data, category="Nope"),
+        dict(sample_data, price=-1),
+        dict(sample_data, name="Second"),
+    ]
+
+    results = ProductService.create_products(items)
+
+    mock_unknown.assert_called_once_with({"Nope"})
+    (documents,), kwargs = mock_collection.return_value.insert_many.call_args
+    assert kwargs == {"ordered": False}
+    assert [document["name"] for document in documents] == ["Test Product", "Second"]
+    assert "error" in results[1] and "Nope" in results[1]["error"]
+    assert "error" in results[2]
+    assert "id" not in results[2]
+
+
+@patch("src.services.product_service.find_unknown_categories", return_value=set())
+@patch("src.services.product_service.Product._get_collection")
+def test_create_products_not_objects(mock_collection, mock_unknown, sample_data):
+    """Test that items that are not dictionaries are rejected by position, not raised on."""
+    results = ProductService.create_products([42, sample_data, "chair", None])
+
+    mock_unknown.assert_called_once_with(set())
+    (documents,), _ = mock_collection.return_value.insert_many.call_args
+    assert len(documents) == 1
+    assert "id" in results[1]
+    assert all(results[position] == {"error": "Product must be a json object"}
+        for position in (0, 2, 3))
+
+
+@patch("src.services.product_service.find_unknown_categories", return_value=set())
+@patch("src.services.product_service.Product._get_collection")
+def test_create_products_batches_and_write_errors(mock_collection, _mock_unknown, sample_data):
+    """Test that items are written in batches, and per-item write errors are reported."""
+    mock_collection.return_value.insert_many.side_effect = [
+        None,
+        BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "duplicate key"}]}),
+    ]
+
+    results = ProductService.create_products([sample_data] * 3, batch_size=2)
+
+    assert mock_collection.return_value.insert_many.call_count == 2
+    assert "id" in results[0] and "id" in results[1]
+    assert results[2] == {"error": "duplicate key"}
+
+
+@patch("src.services.product_service.find_unknown_categories", return_value=set())
+@patch("src.services.product_service.Product._get_collection")
+def test_update_products_single_bulk_write(mock_collection, _mock_unknown):
+    """Test that updates are written in one bulk_write without reading the products first,
+    with per-id statuses."""
+    other_id, missing_id = ObjectId(), ObjectId()
+    mock_collection.return_value.bulk_write.return_value.matched_count = 2
+    mock_collection.return_value.find.return_value = [
+        {"_id": ObjectId(PRODUCT_ID)}, {"_id": other_id},
+    ]
+    updates = [
+        {"id": PRODUCT_ID, "changes": {"price": 15}},
+        {"id": str(other_id), "changes": {"price": 20}},
+        {"id": str(missing_id), "changes": {"price": 5}},
+        {"id": PRODUCT_ID, "changes": {"sku": "X1"}},
+    ]
+
+    results = ProductService.update_products(updates)
+
+    (operations,), kwargs = mock_collection.return_value.bulk_write.call_args
+    assert kwargs == {"ordered": False}
+    assert len(operations) == 3
+    assert operations[0]._filter == {"_id": ObjectId(PRODUCT_ID)}
+    assert operations[1]._doc["$set"]["price"] == 20
+    assert "modified_at" in operations[1]._doc["$set"]
+    assert results[0] == {"id": PRODUCT_ID, "matched": True, "modified": True}
+    assert results[1] == {"id": str(other_id), "matched": True, "modified": True}
+    assert results[2] == {"id": str(missing_id), "matched": False, "modified": False}
+    assert results[3] == {"id": PRODUCT_ID, "error": "Field sku is not a valid field."}
+
+
+@patch("src.services.product_service.find_unknown_categories", return_value=set())
+@patch("src.services.product_service.Product._get_collection")
+def test_update_products_all_matched_no_lookup(mock_collection, _mock_unknown):
+    """Test that the products are not looked up when the bulk write matched all of them."""
+    mock_collection.return_value.bulk_write.return_value.matched_count = 1
+
+    results = ProductService.update_products([{"id": PRODUCT_ID, "changes": {"price": 15}}])
+
+    assert results == [{"id": PRODUCT_ID, "matched": True, "modified": True}]
+    mock_collection.return_value.find.assert_not_called()
+
+
+@patch("src.services.product_service.update_category_counters")
+@patch("src.services.product_service.find_unknown_categories", return_value=set())
+@patch("src.services.product_service.Product._get_collection")
+def test_update_products_counted(mock_collection, _mock_unknown, mock_counters):
+    """Test that moves and stock changes are counted from the product as it was right before
+    each write."""
+    missing_id = ObjectId()
+    mock_collection.return_value.find_one_and_update.side_effect = [
+        {"category": "Furniture", "quantity": 4},
+        {"category": "Lighting", "quantity": 4},
+        None,
+    ]
+
+    results = ProductService.update_products([
+        {"id": PRODUCT_ID, "changes": {"category": "Lighting"}},
+        {"id": PRODUCT_ID, "changes": {"quantity": 6}},
+        {"id": str(missing_id), "changes": {"quantity": 0}},
+    ])
+
+    mock_collection.return_value.bulk_write.assert_not_called()
+    assert [result["matched"] for result in results] == [True, True, False]
+    mock_counters.assert_called_once_with({"Furniture": [-1, -4], "Lighting": [1, 6]})
+
+
+@patch("src.services.product_service.find_unknown_categories", return_value=set())
+@patch("src.services.product_service.Product._get_collection")
+def test_update_products_invalid_values(mock_collection, _mock_unknown):
+    """Test that invalid ids and values are reported without writing."""
+    results = ProductService.update_products([
+        {"id": "abc123", "changes": {"price": 1}},
+        {"id": PRODUCT_ID, "changes": {"quantity": -1}},
+        {"id": PRODUCT_ID},
+    ])
+
+    assert all("error" in result for result in results)
+    mock_collection.return_value.bulk_write.assert_not_called()
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_get_product_version_projection(mock_collection):
+    """Test that the version of a product is read with a projection on modified_at only."""
+    mock_collection.return_value.find_one.return_value = {"_id": ObjectId(PRODUCT_ID)}
+
+    ProductService.get_product_version(PRODUCT_ID)
+
+    mock_collection.return_value.find_one.assert_called_once_with(
+        {"_id": ObjectId(PRODUCT_ID)}, projection={"modified_at": True})
+
+    mock_collection.return_value.find_one.return_value = None
+    with pytest.raises(DoesNotExist):
+        ProductService.get_product_version(PRODUCT_ID)
+    with pytest.raises(DoesNotExist):
+        ProductService.get_product_version("not-an-id")
+
+
+@patch("src.services.product_service.Product._get_collection")
+def test_get_product_version_ignores_process_cache(mock_collection):
+    """Test that the version of a product is not taken from a copy cached in process, which can
+    miss the writes of other processes."""
+    mock_collection.return_value.find_one.return_value = {"_id": ObjectId(PRODUCT_ID)}
+    ProductService.get_product_document(PRODUCT_ID)
+
+    ProductService.get_product_version(PRODUCT_ID)
+
+    mock_collection.return_value.find_one.assert_called_with(
+        {"_id": ObjectId(PRODUCT_ID)}, projection={"modified_at": True})
@@ -0,0 +1,28 @@
+"""
+Unit tests for sparse fieldset parsing in src.utils.projection.
+"""
+
+import pytest
+from src.utils.projection import parse_fields
+
+
+def test_parse_fields_empty_means_all():
+    """Test that an empty or blank parameter requests all fields."""
+    assert parse_fields("") is None
+    assert parse_fields(" , ") is None
+
+
+def test_parse_fields_keeps_order_and_drops_duplicates():
+    """Test that fields are returned in request order, without duplicates or the implied id."""
+    assert parse_fields("name, price,quantity,name,id")== ["name", "price", "quantity"]
+
+
+def test_parse_fields_only_id():
+    """Test that requesting only the id projects on the id alone."""
+    assert parse_fields("id")== ["id"]
+
+
+def test_parse_fields_unknown_field_raises():
+    """Test that an unknown field raises ValueError naming the field."""
+    with pytest.raises(ValueError, match="'password' is not a valid field"):
+        parse_fields("name,password")
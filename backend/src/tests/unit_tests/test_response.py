@@ -0,0 +1,49 @@
+"""
+Unit tests for the JSON response renderer in src.utils.response.
+
+Checks that documents, querysets, and BSON types are rendered in one pass with the same
+shape mongoengine's to_json() produces.
+"""
+
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+from bson import ObjectId
+from mongoengine.queryset import QuerySet
+from src.models.product import Product
+from src.utils.response import dumps, json_response
+
+OID= ObjectId("65f1c2a4e13b0a6d2c8b4567")
+TIME= datetime(2025, 3, 5, 18, 54, 48, 326000)
+
+
+def test_dumps_bson_types():
+    """Test that ObjectId and datetime are written as legacy extended JSON."""
+    assert json.loads(dumps({"_id": OID, "created_at": TIME}))== {
+        "_id": {"$oid": str(OID)},
+        "created_at": {"$date": 1741200888326},
+    }
+
+
+def test_dumps_document_matches_to_json():
+    """Test that a Document renders exactly like its to_json() output."""
+    product= Product(name= "Chair", price= 10, quantity= 2, created_at= TIME, modified_at= TIME)
+    product.id= OID
+    assert json.loads(dumps(product))== json.loads(product.to_json())
+
+
+def test_dumps_queryset_uses_raw_documents():
+    """Test that a QuerySet is rendered from its raw documents."""
+    queryset= MagicMock(spec= QuerySet)
+    queryset.as_pymongo.return_value= [{"_id": OID, "name": "Chair"}]
+    assert json.loads(dumps({"data": queryset}))== {
+        "data": [{"_id": {"$oid": str(OID)}, "name": "Chair"}]
+    }
+
+
+def test_json_response():
+    """Test that json_response sets the content type and status code."""
+    response= json_response([1, 2], status= 201)
+    assert response.status_code== 201
+    assert response["Content-Type"]== "application/json"
+    assert response.content== b"[1,2]"
@@ -0,0 +1,36 @@
+"""
+Unit tests for the /stats endpoints in src.controllers.stats_controller.
+"""
+
+import json
+from unittest.mock import patch
+from django.test import RequestFactory
+from src.controllers.stats_controller import cache_stats_endpoint, connection_stats_endpoint
+
+
+def test_cache_stats():
+    """Test that every cache reports its size, hits, and misses."""
+    response= cache_stats_endpoint(RequestFactory().get("/stats/caches"))
+
+    assert response.status_code== 200
+    data= json.loads(response.content)
+    assert set(data)== {"product_pages", "product_counts", "product_facets", "products",
+        "category_titles"}
+    assert all({"size", "hits", "misses"} <= set(stats) for stats in data.values())
+
+
+def test_cache_stats_get_only():
+    """Test that other methods return 405."""
+    response= cache_stats_endpoint(RequestFactory().post("/stats/caches"))
+    assert response.status_code== 405
+
+
+def test_connection_stats():
+    """Test that the pools of both clients are reported, with the client options."""
+    with patch("src.controllers.stats_controller.pool_stats") as mock_stats:
+        mock_stats.return_value= {"options": {"maxPoolSize": 100}, "sync": {"open": 5}, \
+            "async": {"open": 0}}
+        response= connection_stats_endpoint(RequestFactory().get("/stats/connections"))
+
+    assert response.status_code== 200
+    assert json.loads(response.content)["sync"]== {"open": 5}
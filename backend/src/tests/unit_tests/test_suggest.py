@@ -0,0 +1,100 @@
+"""
+Unit tests for the prefix index behind product suggestions, in src.utils.suggest.
+"""
+
+from unittest.mock import patch
+from src.utils import suggest
+from src.utils.suggest import PrefixIndex, normalize
+
+DOCUMENTS= [
+    {"_id": 1, "name": "Chair", "quantity": 5},
+    {"_id": 2, "name": "Charger", "quantity": 40},
+    {"_id": 3, "name": "Chandelier", "quantity": 5},
+    {"_id": 4, "name": "Table", "quantity": 100},
+    {"_id": 5, "quantity": 3},
+]
+
+
+def build_index(**kwargs)-> PrefixIndex:
+    index= PrefixIndex(**kwargs)
+    index.build(DOCUMENTS)
+    return index
+
+
+def ids(results: list)-> list:
+    return [product_id for product_id, _, _ in results]
+
+
+def test_normalize():
+    """Test that case, accents, and whitespace do not matter."""
+    assert normalize("  Crème   BRÛLÉE ")== "creme brulee"
+
+
+def test_query_ranks_by_stock():
+    """Test that matches are ranked by stock, ties alphabetically, and nameless products skipped."""
+    index= build_index()
+
+    assert ids(index.query("CH"))== [2, 1, 3]
+    assert ids(index.query("cha", limit= 1))== [2]
+    assert index.query("x")== []
+    assert len(index)== 4
+
+
+def test_update_rename_and_remove():
+    """Test that writes move, re-rank, add, and remove entries."""
+    index= build_index()
+
+    index.update(4, name= "Chaise")
+    index.update(1, quantity= 50)
+    index.update(6, name= "Chest")
+    index.update(7, quantity= 9)
+    index.remove(2)
+
+    assert ids(index.query("ch"))== [4, 1, 3, 6]
+    assert index.query("cha")[0]== (4, "Chaise", 100)
+    assert index.query("table")== []
+    assert len(index)== 4
+
+
+def test_add_many():
+    """Test that new products are added at once, and known ones left alone."""
+    index= build_index()
+
+    index.add_many([(6, "Chest", 1), (7, "Lamp", 2), (1, "Stool", 9)])
+
+    assert ids(index.query("ch"))== [2, 1, 3, 6]
+    assert ids(index.query("lamp"))== [7]
+
+
+def test_writes_before_build_are_ignored():
+    """Test that an index that was never built stays empty."""
+    index= PrefixIndex()
+    index.update(1, name= "Chair")
+    index.add_many([(2, "Table", 1)])
+
+    assert not index.built
+    assert len(index)== 0
+
+
+@patch.object(suggest, "SCAN_LIMIT", 1)
+def test_cached_top_matches_invalidated_on_write():
+    """Test that the cached top matches of a prefix are dropped when a matching name changes."""
+    index= build_index()
+    assert ids(index.query("ch"))== [2, 1, 3]
+    assert "ch" in index._top
+
+    index.update(3, quantity= 90)
+    assert "ch" not in index._top
+    assert ids(index.query("ch"))== [3, 2, 1]
+
+
+@patch("src.utils.suggest.time")
+def test_claim_rebuild(mock_time):
+    """Test that only the first caller claims the rebuild of an old index."""
+    mock_time.monotonic.return_value= 0
+    index= build_index(max_age= 10)
+    assert not index.claim_rebuild()
+
+    mock_time.monotonic.return_value= 11
+    assert index.claim_rebuild()
+    assert not index.claim_rebuild()
@@ -0,0 +1,64 @@
+"""
+Unit tests for category validation in src.utils.validation.
+
+The category title cache is cleared before every test, and the category collection is mocked,
+so the number of queries made can be checked.
+"""
+
+import pytest
+from unittest.mock import patch
+from mongoengine.errors import ValidationError
+from src.utils.validation import (
+    validate_category,
+    find_unknown_categories,
+    invalidate_category_titles,
+)
+
+TITLES= ["Electronics", "Groceries"]
+
+
+@pytest.fixture(autouse=True)
+def mock_objects():
+    """Empties the title cache, and mocks the category collection."""
+    invalidate_category_titles()
+    with patch("src.utils.validation.ProductCategory.objects") as mock:
+        mock.distinct.return_value= TITLES
+        yield mock
+    invalidate_category_titles()
+
+
+def test_validate_category_uses_cache(mock_objects):
+    """Test that repeated validations are served from the cache after one query."""
+    for _ in range(5):
+        validate_category("Electronics")
+    mock_objects.distinct.assert_called_once_with("title")
+
+
+def test_validate_category_unknown_raises(mock_objects):
+    """Test that an unknown title raises ValidationError, after reloading the titles once."""
+    validate_category("Electronics")
+    with pytest.raises(ValidationError, match="does not exist"):
+        validate_category("Furniture")
+    assert mock_objects.distinct.call_count== 2
+
+
+def test_validate_category_not_string_raises():
+    """Test that a title which is not a string raises ValidationError."""
+    with pytest.raises(ValidationError, match="must be a string"):
+        validate_category(42)
+
+
+def test_find_unknown_categories_single_query(mock_objects):
+    """Test that many titles are resolved with a single query."""
+    unknown= find_unknown_categories(["Electronics", "Groceries", "Furniture", "Toys"])
+    assert unknown== {"Furniture", "Toys"}
+    assert mock_objects.distinct.call_count== 2  # Initial load, and one reload for the misses
+
+
+def test_invalidate_category_titles(mock_objects):
+    """Test that invalidating the cache makes the next validation reload the titles."""
+    validate_category("Electronics")
+    mock_objects.distinct.return_value= TITLES+ ["Furniture"]
+    invalidate_category_titles()
+    validate_category("Furniture")
+    assert mock_objects.distinct.call_count== 2
@@ -2,8 +2,12 @@ from django.contrib import admin
 from django.urls import path
 from django.http import HttpResponse
 
-from src.controllers.product_controller import product_endpoint
-from src.controllers.product_category_controller import category_product_endpoint
+from src.controllers.product_controller import product_endpoint, product_stock_endpoint, \
+    product_bulk_endpoint, product_export_endpoint, product_suggest_endpoint, \
+    product_facets_endpoint
+from src.controllers.product_category_controller import category_product_endpoint, \
+    category_list_endpoint
+from src.controllers.stats_controller import cache_stats_endpoint, connection_stats_endpoint
 
 def hello_world(request):
     return HttpResponse("Hello, world! This is our interneers-lab Django server.")
@@ -12,6 +16,14 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('hello/', hello_world),
     path('products', product_endpoint),
+    path('products/bulk', product_bulk_endpoint),
+    path('products/export', product_export_endpoint),
+    path('products/suggest', product_suggest_endpoint),
+    path('products/facets', product_facets_endpoint),
     path('products/<slug:request_id>', product_endpoint),
+    path('products/<slug:request_id>/stock', product_stock_endpoint),
+    path('categories', category_list_endpoint),
     path('categories/<slug:category_title>', category_product_endpoint),
+    path('stats/caches', cache_stats_endpoint),
+    path('stats/connections', connection_stats_endpoint),
 ]
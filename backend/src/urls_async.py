@@ -0,0 +1,29 @@
+"""
+URL configuration of the ASGI stack.
+
+The routes are those of src.urls, with the product and category endpoints served by the async
+views, which query the database without blocking the event loop, and stream exports without
+reading them to the end first. See src/settings_asgi.py.
+"""
+
+from django.urls import path
+
+from src.urls import urlpatterns as sync_urlpatterns
+from src.controllers import async_product_controller, async_product_category_controller
+
+# Async views, by the route they serve
+ASYNC_VIEWS= {
+    'products': async_product_controller.product_endpoint,
+    'products/suggest': async_product_controller.product_suggest_endpoint,
+    'products/facets': async_product_controller.product_facets_endpoint,
+    'products/export': async_product_controller.product_export_endpoint,
+    'products/<slug:request_id>': async_product_controller.product_endpoint,
+    'products/<slug:request_id>/stock': async_product_controller.product_stock_endpoint,
+    'categories/<slug:category_title>': async_product_category_controller.category_product_endpoint,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[str(pattern.pattern)]) \
+        if str(pattern.pattern) in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,244 @@
+"""
+Contains all logic for loading large numbers of products into the database.
+
+Products are read as a stream, either from a JSON array (parsed incrementally, one product at a
+time) or from NDJSON, or generated synthetically. They are then written in batches with
+ProductService.create_products, which checks all the categories of a batch in one query and
+writes it with unordered insert_many calls. Batches are written by a pool of worker threads, with
+a bounded number of batches in flight, so the memory used does not grow with the input.
+"""
+
+import json
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+import orjson
+from src.services.product_service import ProductService
+
+READ_SIZE= 1 << 16
+MAX_ERRORS_KEPT= 20
+
+# Typical price (median) of a product in each category, in rupees
+CATEGORY_PRICES= {
+    "Electronics": 4999,
+    "Home & Kitchen": 1499,
+    "Health & Personal Care": 399,
+    "Fashion & Apparel": 999,
+    "Books & Stationery": 299,
+    "Sports & Outdoors": 1299,
+    "Beauty & Cosmetics": 499,
+    "Toys & Games": 799,
+    "Automotive": 1999,
+    "Office Supplies": 249,
+    "Pet Supplies": 599,
+    "Baby Products": 699,
+    "Groceries": 149,
+    "Tools & Hardware": 899,
+    "Art & Crafts": 349,
+}
+DEFAULT_PRICE= 999
+
+BRAND_PREFIXES= ("Nova", "Apex", "Zen", "Orbit", "Terra", "Luma", "Vivo", "Kiro", "Sol", "Aero",
+    "Bolt", "Crest", "Pico", "Rivo", "Astra", "Mira")
+BRAND_SUFFIXES= ("tech", "ware", "ly", "co", "works", "home", "labs", "craft", "mart", "gear")
+ADJECTIVES= ("Classic", "Premium", "Compact", "Smart", "Eco", "Ultra", "Pro", "Mini", "Deluxe",
+    "Essential", "Portable", "Advanced")
+NOUNS= ("Kit", "Set", "Pack", "Edition", "Series", "Bundle", "Model", "Collection")
+
+
+def iter_json_array(file, read_size: int= READ_SIZE):
+    """
+    Parses a JSON array incrementally, yielding its elements one at a time.
+
+    The file is read read_size characters at a time, so only the element being parsed (and
+    the rest of the current read) is held in memory.
+
+    Args:
+        file: a text file object, containing a JSON array.
+        read_size: number of characters read from the file at a time.
+
+    Yields:
+        The elements of the array.
+
+    Raises:
+        ValueError: If the file does not contain a valid JSON array.
+    """
+    decoder= json.JSONDecoder()
+    buffer, position, eof= "", 0, False
+
+    def next_char()-> str:
+        """Returns the next character that is not whitespace, reading input if needed."""
+        nonlocal buffer, position, eof
+        while True:
+            while position< len(buffer) and buffer[position].isspace():
+                position+= 1
+            if position< len(buffer) or eof:
+                return buffer[position:position+ 1]
+            buffer, position= file.read(read_size), 0
+            eof= not buffer
+
+    def decode():
+        """Decodes the value starting at the current position, reading input if needed."""
+        nonlocal buffer, position, eof
+        next_char()
+        while True:
+            try:
+                value, end= decoder.raw_decode(buffer, position)
+                # A value ending the buffer might continue in the input (e.g. a number)
+                if end< len(buffer) or eof:
+                    position= end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            chunk= file.read(read_size)
+            eof= not chunk
+            buffer, position= buffer[position:]+ chunk, 0
+
+    if next_char()!= "[":
+        raise ValueError("Input is not a JSON array")
+    position+= 1
+    if next_char()== "]":
+        return
+
+    while True:
+        yield decode()
+        char= next_char()
+        if char== "]":
+            return
+        if char!= ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {char or 'end of input'}")
+        position+= 1
+
+
+def iter_ndjson(file):
+    """
+    Parses newline delimited JSON, yielding one value per non-empty line.
+    """
+    for line in file:
+        line= line.strip()
+        if line:
+            yield orjson.loads(line)
+
+
+def read_products(path: str):
+    """
+    Streams the products in a file, either a JSON array or NDJSON.
+
+    The format is detected from the first character of the file that is not whitespace.
+
+    Args:
+        path: path of the file.
+
+    Yields:
+        dict, the products in the file.
+    """
+    with open(path, "r", encoding= "utf-8") as file:
+        first= ""
+        while True:
+            first= file.read(1)
+            if not first.isspace():
+                break
+        file.seek(0)
+
+        if first== "[":
+            yield from iter_json_array(file)
+        else:
+            yield from iter_ndjson(file)
+
+
+def generate_products(count: int, categories: list, seed: int= None):
+    """
+    Generates synthetic products, for load testing.
+
+    The distributions are skewed like a real catalog: a few categories hold most of the
+    products (Zipf weights), each category has a pool of brands of which a few are popular,
+    prices are log-normally distributed around a typical price per category, and about one
+    product in ten is out of stock.
+
+    Args:
+        count: number of products to generate.
+        categories: titles of the categories to use, in order of popularity.
+        seed: seed of the random generator, to generate the same products again.
+
+    Yields:
+        dict, the generated products, as accepted by ProductService.create_products.
+    """
+    rng= random.Random(seed)
+    category_weights= [1/ (rank+ 1)** 1.1 for rank in range(len(categories))]
+    brands= {
+        category: [rng.choice(BRAND_PREFIXES)+ rng.choice(BRAND_SUFFIXES) for _ in range(12)]
+        for category in categories
+    }
+    brand_weights= [1/ (rank+ 1) for rank in range(12)]
+
+    for i in range(count):
+        category= rng.choices(categories, category_weights)[0]
+        brand= rng.choices(brands[category], brand_weights)[0]
+        median= CATEGORY_PRICES.get(category, DEFAULT_PRICE)
+        price= rng.lognormvariate(math.log(median), 0.8)
+        step= 100 if price>= 1000 else 10
+        quantity= 0 if rng.random()< 0.1 else int(rng.expovariate(1/ 60))+ 1
+
+        yield {
+            "name": f"{brand} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i+ 1}",
+            "price": max(step, round(price/ step)* step)- 1,
+            "quantity": quantity,
+            "brand": brand,
+            "description": f"{rng.choice(ADJECTIVES)} {category.lower()} product by {brand}",
+            "category": category,
+        }
+
+
+def batched(items, size: int):
+    """
+    Splits an iterable into lists of at most size items, lazily.
+    """
+    iterator= iter(items)
+    while batch:= list(islice(iterator, size)):
+        yield batch
+
+
+def load_products(products, batch_size: int= 1000, workers: int= 4, on_progress= None)-> dict:
+    """
+    Writes products to the database in batches, from a pool of worker threads.
+
+    At most twice as many batches as workers are held in memory at a time, the input is only
+    read further once a batch has been written.
+
+    Args:
+        products: iterable of product dicts, as accepted by ProductService.create_products.
+        batch_size: number of products per insert_many call.
+        workers: number of batches written concurrently.
+        on_progress: optional function called with the running stats after every batch.
+
+    Returns:
+        dict of the form {"created": <int>, "failed": <int>, "errors": <list>}, errors holding
+        the first MAX_ERRORS_KEPT error messages.
+    """
+    stats= {"created": 0, "failed": 0, "errors": []}
+
+    def collect(done):
+        for future in done:
+            for result in future.result():
+                if "error" in result:
+                    stats["failed"]+= 1
+                    if len(stats["errors"])< MAX_ERRORS_KEPT:
+                        stats["errors"].append(result["error"])
+                else:
+                    stats["created"]+= 1
+            if on_progress:
+                on_progress(stats)
+
+    with ThreadPoolExecutor(max_workers= workers) as executor:
+        pending= set()
+        for batch in batched(products, batch_size):
+            if len(pending)>= 2* workers:
+                done, pending= wait(pending, return_when= FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(ProductService.create_products, batch, batch_size))
+        collect(wait(pending).done)
+
+    return stats
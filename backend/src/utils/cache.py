@@ -0,0 +1,349 @@
+"""
+Contains the building blocks for the in-process caches of the services.
+
+TTLCache is a bounded, thread-safe mapping whose entries expire after a fixed time, evicting
+the least recently used entry when full. Generation is a write counter for a collection:
+cache keys that include the current generation are invalidated all at once by bumping it,
+without having to find and delete the entries.
+
+Since these caches live in the memory of one process, writes made by other processes are only
+seen once the entries expire, so the TTL bounds how stale a cached value can get.
+
+TieredCache builds a read-through cache on top of a TTLCache, optionally backed by a shared
+Django cache backend (e.g. Redis), and can serve expired entries while they are reloaded.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from mongoengine.errors import DoesNotExist
+
+_MISSING= object()
+
+logger= logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    A bounded mapping with per-entry expiry and least recently used eviction.
+    """
+
+    def __init__(self, ttl: float, max_size: int= 1024):
+        """
+        Args:
+            ttl: seconds after which an entry expires.
+            max_size: maximum number of entries kept.
+        """
+        self.ttl= ttl
+        self.max_size= max_size
+        self._entries= OrderedDict()
+        self._lock= threading.Lock()
+        self.hits= 0
+        self.misses= 0
+
+    def get(self, key, default= None):
+        """
+        Returns the value cached for key, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry= self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses+= 1
+                return default
+            expires_at, value= entry
+            if expires_at< time.monotonic():
+                del self._entries[key]
+                self.misses+= 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits+= 1
+            return value
+
+    def set(self, key, value, ttl: float= None):
+        """
+        Caches value for key, evicting the least recently used entry if the cache is full.
+
+        Args:
+            ttl: seconds after which this entry expires, the ttl of the cache if None.
+        """
+        with self._lock:
+            self._entries[key]= (time.monotonic()+ (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries)> self.max_size:
+                self._entries.popitem(last= False)
+
+    def delete(self, key):
+        """
+        Removes the entry for key, if it exists.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self)-> dict:
+        """
+        Returns the number of entries, and of hits and misses since the cache was created.
+        """
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class Generation:
+    """
+    A counter of the writes made to a collection, from this process.
+    """
+
+    def __init__(self):
+        self._value= 0
+        self._lock= threading.Lock()
+
+    @property
+    def value(self)-> int:
+        return self._value
+
+    def bump(self)-> int:
+        """
+        Marks the collection as written to, invalidating every key made with an older value.
+
+        Returns:
+            int, the new generation.
+        """
+        with self._lock:
+            self._value+= 1
+            return self._value
+
+
+class TieredCache:
+    """
+    A read-through cache, with an in-process tier and an optional shared tier.
+
+    Values are loaded with the loader given to get, and are fresh for ttl seconds. With a
+    stale_ttl, an expired value is still served for stale_ttl more seconds while it is reloaded
+    in the background, so a slow database does not slow down reads of cached values. With a
+    stale_setting, stale_ttl is read from that setting instead, and only applies when there is
+    a shared tier.
+
+    The shared tier is the Django cache named by the setting backend_setting (if set), so the
+    values loaded by one process can be read by the others. Deletes remove the value from the
+    shared tier, and from the in-process tier of the deleting process only: the other processes
+    keep their in-process copy for up to local_ttl seconds, before reading the shared tier again.
+    Without a shared tier, a value written by another process is served until it expires, i.e.
+    for up to ttl+ stale_ttl seconds.
+
+    peek_shared only reads the shared tier, for answers that must not come from a copy that
+    misses the writes of other processes, such as conditional requests.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float= 0, max_size: int= 1024,
+        backend_setting: str= None, generation: Generation= None, local_ttl: float= 1,
+        stale_setting: str= None):
+        """
+        Args:
+            name: prefix of the keys in the shared tier.
+            ttl: seconds during which a loaded value is fresh.
+            stale_ttl: seconds during which an expired value is served while being reloaded.
+            max_size: maximum number of entries kept in process.
+            backend_setting: name of the setting holding the alias of the shared cache.
+            generation: if given, values loaded while the generation changed are not cached,
+                as a write may have happened after they were read.
+            local_ttl: seconds during which an in-process copy is served without reading the
+                shared tier, when there is one. Bounds how long deletes made by other processes
+                go unseen.
+            stale_setting: name of the setting holding the stale_ttl, in place of stale_ttl.
+                It is ignored without a shared tier, where a stale value may be one written
+                over by another process long before.
+        """
+        self.name= name
+        self.ttl= ttl
+        self.stale_ttl= stale_ttl
+        self.backend_setting= backend_setting
+        self.generation= generation
+        self.local_ttl= local_ttl
+        self.stale_setting= stale_setting
+        self.local= TTLCache(ttl, max_size)
+        self.stats= {"hits": 0, "stale_hits": 0, "misses": 0}
+        self._refreshing= set()
+        self._lock= threading.Lock()
+
+    def shared(self):
+        """
+        Returns the Django cache of the shared tier, or None if there is none.
+        """
+        try:
+            alias= getattr(settings, self.backend_setting, None) if self.backend_setting else None
+        except ImproperlyConfigured:  # Used outside of django, e.g. by scripts
+            return None
+        return caches[alias] if alias else None
+
+    def stale_window(self, shared)-> float:
+        """
+        Returns the seconds during which an expired value is served while being reloaded.
+        """
+        if not self.stale_setting:
+            return self.stale_ttl
+        if shared is None:
+            return 0
+        return getattr(settings, self.stale_setting, 0) or 0
+
+    def get(self, key, loader):
+        """
+        Returns the value for key, loading it with loader(key) if it is not cached.
+
+        Cached values are shared, and must not be modified by the caller.
+
+        Raises:
+            Any exception raised by loader, when the value has to be loaded.
+        """
+        shared= self.shared()
+        entry= self._local_entry(key, shared)
+        if entry is None and shared is not None:
+            entry= shared.get(f"{self.name}:{key}")
+            if entry is not None:
+                self._set_local(key, entry, shared)
+
+        if entry is not None:
+            fresh_until, value= entry[:2]
+            if time.time()< fresh_until:
+                self.stats["hits"]+= 1
+                return value
+            if self.stale_window(shared):
+                self.stats["stale_hits"]+= 1
+                self._refresh_in_background(key, loader)
+                return value
+
+        self.stats["misses"]+= 1
+        return self.load(key, loader)
+
+    def peek(self, key):
+        """
+        Returns the value for key if it is cached and fresh, None otherwise, without loading it.
+        """
+        shared= self.shared()
+        entry= self._local_entry(key, shared)
+        if entry is None and shared is not None:
+            entry= shared.get(f"{self.name}:{key}")
+        if entry is not None and time.time()< entry[0]:
+            return entry[1]
+        return None
+
+    def peek_shared(self, key):
+        """
+        Returns the value for key if it is fresh in the shared tier, None otherwise, or if there
+        is no shared tier. In-process copies are never used, as they can miss the writes of
+        other processes.
+        """
+        shared= self.shared()
+        entry= shared.get(f"{self.name}:{key}") if shared is not None else None
+        if entry is not None and time.time()< entry[0]:
+            return entry[1]
+        return None
+
+    def _local_entry(self, key, shared):
+        """
+        Returns the in-process entry for key, or None if there is none, or if it has to be read
+        again from the shared tier.
+        """
+        entry= self.local.get(key)
+        if entry is not None and shared is not None and time.time()>= entry[2]:
+            return None
+        return entry
+
+    def _set_local(self, key, entry: tuple, shared):
+        """
+        Keeps an entry (fresh_until, value) in process, until when it can be served without
+        reading the shared tier.
+        """
+        local_until= time.time()+ self.local_ttl if shared is not None else float("inf")
+        self.local.set(key, (*entry, local_until), self.ttl+ self.stale_window(shared))
+
+    def load(self, key, loader):
+        """
+        Loads the value for key with loader(key), and caches it.
+        """
+        generation= self.generation.value if self.generation else None
+        value= loader(key)
+        self.put(key, value, generation)
+        return value
+
+    def put(self, key, value, generation: int= None):
+        """
+        Caches a value loaded by the caller, e.g. with an async driver.
+
+        Args:
+            key: the key of the value.
+            value: the loaded value.
+            generation: the value of the generation before the value was read. The value is
+                not cached if the generation changed since.
+        """
+        if self.generation is not None and self.generation.value!= generation:
+            return
+        entry= (time.time()+ self.ttl, value)
+        shared= self.shared()
+        self._set_local(key, entry, shared)
+        if shared is not None:
+            shared.set(f"{self.name}:{key}", entry, self.ttl+ self.stale_window(shared))
+
+    def _refresh_in_background(self, key, loader):
+        """
+        Reloads the value for key in a separate thread, unless it is already being reloaded.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.load(key, loader)
+            except DoesNotExist:
+                self.delete(key)
+            except Exception:  #pylint: disable=broad-exception-caught
+                # The stale value keeps being served until it expires
+                logger.exception("Could not refresh %s:%s in the background", self.name, key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target= refresh, daemon= True).start()
+
+    def delete(self, key):
+        """
+        Removes the value for key from both tiers. To be called whenever it is written.
+        """
+        self.local.delete(key)
+        if (shared:= self.shared()) is not None:
+            shared.delete(f"{self.name}:{key}")
+
+    def clear(self):
+        """
+        Removes all the values cached in process.
+        """
+        self.local.clear()
+
+
+# Bumped on every write to the product collection
+product_generation= Generation()
+
+# Raw product documents by id, invalidated on every write to a product. Expired documents are
+# only served while reloaded if PRODUCT_CACHE_STALE_TTL is set, and there is a shared tier
+product_cache= TieredCache(
+    "product",
+    ttl= 30,
+    max_size= 10000,
+    backend_setting= "PRODUCT_CACHE_ALIAS",
+    generation= product_generation,
+    stale_setting= "PRODUCT_CACHE_STALE_TTL",
+)
@@ -0,0 +1,61 @@
+"""
+Contains the upkeep of the category counters: the number of products of every category, and
+their total stock, stored on the category documents (ProductCategory.product_count and
+total_stock), so categories are listed without aggregating the products.
+
+Every write that creates or deletes a product, moves it to another category, or changes its
+stock, collects what it changes in the counters with count_product, as differences keyed by
+category title, and applies them with $inc in one bulk_write. Products without a category are
+not counted.
+
+Products written outside the services and the Product model (e.g., imported with mongoimport)
+are not counted. Migration 0002 recounts every category from the products.
+"""
+
+from pymongo import UpdateOne
+from src.models.product_category import ProductCategory
+
+#pylint: disable=no-member
+
+
+def count_product(deltas: dict, category: str, quantity: int, sign: int= 1):
+    """
+    Adds a product to the counter differences of its category, or removes it.
+
+    Moving a product, or changing its stock, is counted as removing it as it was, then adding
+    it as it is.
+
+    Args:
+        deltas: dict of {title: [product count difference, stock difference]}, updated in place.
+        category: title of the category of the product, None or empty if it has none.
+        quantity: stock of the product.
+        sign: 1 to add the product, -1 to remove it.
+    """
+    if not category:
+        return
+    counts= deltas.setdefault(category, [0, 0])
+    counts[0]+= sign
+    counts[1]+= sign* (quantity or 0)
+
+
+def counter_updates(deltas: dict)-> list:
+    """
+    Builds the $inc updates of the categories whose counters change.
+
+    Returns:
+        list of UpdateOne operations, for bulk_write on the categories collection.
+    """
+    return [
+        UpdateOne({"title": title}, {"$inc": {"product_count": count, "total_stock": stock}})
+        for title, (count, stock) in deltas.items() if count or stock
+    ]
+
+
+def update_category_counters(deltas: dict):
+    """
+    Applies counter differences to the categories, in one unordered bulk_write, if any changes.
+    """
+    operations= counter_updates(deltas)
+    if operations:
+        ProductCategory._get_collection().bulk_write(operations, ordered= False)
+
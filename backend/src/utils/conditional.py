@@ -0,0 +1,76 @@
+"""
+Contains all logic for conditional requests (ETag, Last-Modified, and 304 responses).
+
+The validators of a document are derived from its id and modification timestamp, which is
+refreshed on every write, so they can be computed from a projection of those two fields
+without loading (or rendering) the document.
+"""
+
+import calendar
+from datetime import datetime
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+CONDITIONAL_HEADERS= ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+def is_conditional(request: HttpRequest)-> bool:
+    """
+    Checks if a request asks to be answered with 304 when the client's copy is still valid.
+    """
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def make_etag(document_id, modified_at: datetime)-> str:
+    """
+    Builds the strong ETag of a document version.
+
+    Args:
+        document_id: id of the document.
+        modified_at: modification timestamp of the document, naive datetimes are taken as UTC.
+
+    Returns:
+        str, the quoted ETag, such as "65f1c2a4e13b0a6d2c8b4567-18e0d1b4a3c".
+    """
+    millis= calendar.timegm(modified_at.utctimetuple())* 1000+ modified_at.microsecond// 1000
+    return f'"{document_id}-{millis:x}"'
+
+
+def set_validators(response: HttpResponse, document_id, modified_at: datetime)-> HttpResponse:
+    """
+    Sets the ETag and Last-Modified headers of a response for a document.
+
+    Nothing is set if the document has no modification timestamp.
+    """
+    if modified_at is not None:
+        response.headers["ETag"]= make_etag(document_id, modified_at)
+        response.headers["Last-Modified"]= http_date(calendar.timegm(modified_at.utctimetuple()))
+    return response
+
+
+def conditional_response(request: HttpRequest, document_id, modified_at: datetime):
+    """
+    Evaluates the preconditions of a request against the current version of a document.
+
+    Args:
+        request: An HttpRequest instance created by django.
+        document_id: id of the document.
+        modified_at: modification timestamp of the document.
+
+    Returns:
+        HttpResponse with status 304 (or 412 for a failed If-Match), carrying the validators
+        of the document, or None if the full response is to be sent.
+    """
+    if modified_at is None:
+        return None
+    validators= set_validators(HttpResponse(), document_id, modified_at)
+    response= get_conditional_response(
+        request,
+        etag= validators.headers["ETag"],
+        last_modified= calendar.timegm(modified_at.utctimetuple()),
+        response= validators,
+    )
+    # The response given is returned as is when all the preconditions pass
+    return None if response is validators else response
@@ -10,7 +10,8 @@ ERROR_CODES={
     401: "UNAUTHORIZED",
     403: "FORBIDDEN",
     404: "NOT_FOUND",
-    405: "METHOD_NOT_FOUND"
+    405: "METHOD_NOT_FOUND",
+    409: "CONFLICT",
 }
 
 ERROR_MESSAGES={
@@ -18,7 +19,8 @@ ERROR_MESSAGES={
     401: "Need Authorization to process this request",
     403: "The request is forbidden",
     404: "The requested resource was not found",
-    405: "The resource does not support this method"
+    405: "The resource does not support this method",
+    409: "The request conflicts with the current state of the resource",
 }
 
 def generate_error_response(request: HttpRequest, code: int, details: str, suggestion: str) \
@@ -0,0 +1,155 @@
+"""
+Contains all logic for rendering streamed exports of raw documents.
+
+Every renderer is a generator that consumes documents one at a time (as fetched from a database
+cursor) and yields encoded chunks, so the memory used does not grow with the number of documents.
+Rows are grouped into chunks of about CHUNK_SIZE bytes, instead of one write per row. Streams
+are gzip compressed for the clients that accept it, as checked by accepts_gzip.
+
+The ASGI stack reads documents from an async cursor, one batch at a time: it renders every batch
+with the same renderers (csv_chunks without the header after the first batch), and compresses
+the resulting async stream with async_gzip_chunks.
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from bson import ObjectId
+from src.utils.response import dumps
+
+CHUNK_SIZE= 64* 1024
+
+
+def ndjson_chunks(documents, chunk_size: int= CHUNK_SIZE):
+    """
+    Renders documents as newline delimited JSON, one document per line.
+
+    Args:
+        documents: iterable of raw documents (dicts).
+        chunk_size: minimum size in bytes of the yielded chunks (except the last one).
+
+    Yields:
+        bytes, chunks of complete lines.
+    """
+    buffer= bytearray()
+    for document in documents:
+        buffer+= dumps(document)
+        buffer+= b"\n"
+        if len(buffer)>= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def csv_value(value):
+    """
+    Converts a value of a raw document to its CSV representation.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(documents, columns: list, chunk_size: int= CHUNK_SIZE, header: bool= True):
+    """
+    Renders documents as CSV, with a header row.
+
+    Args:
+        documents: iterable of raw documents (dicts).
+        columns: names of the fields to write, in order. "id" is read from the _id of documents.
+        chunk_size: minimum size in bytes of the yielded chunks (except the last one).
+        header: whether to start with the header row, False to continue a CSV stream.
+
+    Yields:
+        bytes, UTF-8 encoded chunks of complete rows.
+    """
+    buffer= io.StringIO()
+    writer= csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    keys= ["_id" if column== "id" else column for column in columns]
+
+    for document in documents:
+        writer.writerow([csv_value(document.get(key)) for key in keys])
+        if buffer.tell()>= chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks, level: int= 6):
+    """
+    Compresses a stream of chunks into a single gzip stream.
+
+    Args:
+        chunks: iterable of bytes.
+        level: compression level, from 1 (fastest) to 9 (smallest).
+
+    Yields:
+        bytes, chunks of the gzip stream.
+    """
+    compressor= zlib.compressobj(level, zlib.DEFLATED, 16+ zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed= compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def async_gzip_chunks(chunks, level: int= 6):
+    """
+    Compresses an async stream of chunks into a single gzip stream, as gzip_chunks.
+
+    Args:
+        chunks: async iterable of bytes.
+        level: compression level, from 1 (fastest) to 9 (smallest).
+
+    Yields:
+        bytes, chunks of the gzip stream.
+    """
+    compressor= zlib.compressobj(level, zlib.DEFLATED, 16+ zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed= compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str)-> bool:
+    """
+    Checks if an Accept-Encoding header allows a gzip response.
+
+    gzip (or x-gzip) is allowed if listed with a q-value above 0, or if not listed, if * is.
+    gzip;q=0 refuses it, and a malformed q-value counts as 0.
+
+    Args:
+        accept_encoding: value of the Accept-Encoding header, empty if not sent.
+    """
+    qualities= {}
+    for coding in accept_encoding.split(","):
+        name, *params= [part.strip() for part in coding.split(";")]
+        if not name:
+            continue
+        quality= 1.0
+        for param in params:
+            key, _, value= param.partition("=")
+            if key.strip().lower()== "q":
+                try:
+                    quality= float(value)
+                except ValueError:
+                    quality= 0.0
+        qualities[name.lower()]= quality
+
+    for name in ("gzip", "x-gzip", "*"):
+        if name in qualities:
+            return qualities[name]> 0
+    return False
@@ -0,0 +1,243 @@
+"""
+Contains the index advisor, which explains the product list queries for every combination of
+filters, and suggests indexes for the ones the existing indexes do not serve well.
+
+The list filters products on equalities (name, brand, category) and ranges (price, quantity).
+Cursor pages are sorted by _id. Counts and offset pages are not sorted. An index serves a sorted
+query best when its keys follow the equality-sort-range rule: the equality fields, then the sort
+key, then the range fields. The sort is then read from the index instead of done in memory, and
+the ranges are checked on the index keys. Unsorted queries are served by the equality fields
+followed by the range fields, which bound the scan to the matching keys.
+
+A plan is flagged if it scans the collection, sorts in memory, or examines many more keys or
+documents than it returns.
+
+Indexes removed from Product.meta['indexes'] are not dropped by mongoengine, and every write
+keeps paying for them. superseded_indexes lists the undeclared indexes that are safe to drop:
+the ones whose keys are a prefix of a declared index, which serves all their queries, and the
+ones retired in Product.RETIRED_INDEXES. Other undeclared indexes, such as those created by
+hand, are never dropped.
+"""
+
+import itertools
+
+from src.models.product import Product
+from src.services.product_service import ProductService
+from src.utils.pagination import db_field
+
+#pylint: disable=no-member
+
+EQUALITY_FILTERS= ("name", "brand", "category")
+RANGE_FILTERS= ("price", "quantity")
+# Plans examining more keys or documents than this, per product returned, are flagged
+MAX_EXAMINED_RATIO= 10
+
+
+def filter_combinations()-> list:
+    """
+    Lists every non-empty combination of the list filters, equality filters first.
+    """
+    filters= EQUALITY_FILTERS+ RANGE_FILTERS
+    return [combination for size in range(1, len(filters)+ 1)
+        for combination in itertools.combinations(filters, size)]
+
+
+def sample_values(collection)-> dict:
+    """
+    Picks filter values from a product of the most common category, so every combination of
+    filters matches at least that product, and the category matches as many as any.
+
+    Returns:
+        dict of the product's name, brand, category, price, and quantity, or None if there are no
+        products.
+    """
+    common= list(collection.aggregate([
+        {"$sortByCount": "$category"},
+        {"$limit": 1},
+    ]))
+    query= {"category": common[0]["_id"]} if common else {}
+    projection= {"name": 1, "brand": 1, "category": 1, "price": 1, "quantity": 1}
+    # Preferably one with a brand, so the brand filter is not left out
+    return collection.find_one({**query, "brand": {"$gt": ""}}, projection) or \
+        collection.find_one(query, projection)
+
+
+def filter_kwargs(combination: tuple, sample: dict)-> dict:
+    """
+    Builds the arguments of ProductService.get_product_filtered for a combination of filters.
+
+    Prices are filtered on a range around the price of the sample, and quantities on a minimum
+    stock, as the list is most often filtered.
+    """
+    kwargs= {
+        "name": "", "category": "", "brand": "",
+        "price_less_than_e": -1, "price_greater_than_e": -1,
+        "quantity_less_than_e": -1, "quantity_greater_than_e": -1,
+    }
+    for field in EQUALITY_FILTERS:
+        if field in combination:
+            kwargs[field]= sample.get(field) or ""
+    if "price" in combination:
+        kwargs["price_greater_than_e"]= sample.get("price", 0)// 2
+        kwargs["price_less_than_e"]= sample.get("price", 0)* 2
+    if "quantity" in combination:
+        kwargs["quantity_greater_than_e"]= sample.get("quantity", 0)// 2
+    return kwargs
+
+
+def plan_summary(explain: dict)-> dict:
+    """
+    Summarizes the output of explain() in executionStats (or allPlansExecution) mode.
+
+    Returns:
+        dict with the stages of the winning plan (outermost first), the name of the index it
+        uses (None if none), and the numbers of keys examined, documents examined, and
+        documents returned.
+    """
+    plan= explain["queryPlanner"]["winningPlan"]
+    # Plans run by the slot-based engine are nested one level deeper
+    plan= plan.get("queryPlan", plan)
+    stages, index= [], None
+    pending= [plan]
+    while pending:
+        stage= pending.pop(0)
+        stages.append(stage["stage"])
+        index= index or stage.get("indexName")
+        pending.extend([stage["inputStage"]] if "inputStage" in stage else \
+            stage.get("inputStages", []))
+
+    stats= explain["executionStats"]
+    return {
+        "stages": stages,
+        "index": index,
+        "keys_examined": stats["totalKeysExamined"],
+        "docs_examined": stats["totalDocsExamined"],
+        "returned": stats["nReturned"],
+    }
+
+
+def plan_problems(summary: dict)-> list:
+    """
+    Lists what is wrong with a plan, as summarized by plan_summary. Empty if nothing is.
+    """
+    problems= []
+    if "COLLSCAN" in summary["stages"]:
+        problems.append("scans the whole collection")
+    if "SORT" in summary["stages"]:
+        problems.append("sorts in memory")
+    examined= max(summary["keys_examined"], summary["docs_examined"])
+    if examined> MAX_EXAMINED_RATIO* max(summary["returned"], 1):
+        problems.append(f"examines {examined} keys or documents for {summary['returned']} " \
+            "products")
+    return problems
+
+
+def suggest_index(combination: tuple, sorted_by_id: bool)-> tuple:
+    """
+    Suggests the index for a combination of filters, in equality-sort-range order, in the
+    notation of Document.meta['indexes'].
+    """
+    equalities= [field for field in combination if field in EQUALITY_FILTERS]
+    ranges= [field for field in combination if field in RANGE_FILTERS]
+    return tuple(equalities+ (["id"] if sorted_by_id else [])+ ranges)
+
+
+def has_index(collection, keys: tuple)-> bool:
+    """
+    Checks if an index of the collection starts with the given keys, in ascending order.
+    """
+    wanted= [(db_field(key), 1) for key in keys]
+    return any(index["key"][:len(wanted)]== wanted
+        for index in collection.index_information().values())
+
+
+def index_keys(spec: tuple)-> list:
+    """
+    Converts an index in the notation of Document.meta['indexes'] to its keys in the database,
+    e.g. ('price', '-created_at', 'id') to [("price", 1), ("created_at", -1), ("_id", 1)].
+    """
+    return [(db_field(field.lstrip("+-")), -1 if field.startswith("-") else 1) for field in spec]
+
+
+def undeclared_indexes(collection)-> dict:
+    """
+    Lists the indexes of the collection that are not declared in Product.meta['indexes'], other
+    than the _id index. Text indexes are compared on the fields they search.
+
+    Returns:
+        dict of {index name: list of (field, direction) keys}.
+    """
+    declared= [list(key) for key in Product.list_indexes()]
+    declared_text= [{field for field, kind in key if kind== "text"} for key in declared]
+    undeclared= {}
+    for name, index in collection.index_information().items():
+        key= [tuple(part) for part in index["key"]]
+        if name== "_id_":
+            continue
+        if key[0][0]== "_fts":
+            if set(index.get("weights", {})) not in declared_text:
+                undeclared[name]= key
+        elif key not in declared:
+            undeclared[name]= key
+    return undeclared
+
+
+def superseded_indexes(collection)-> list:
+    """
+    Lists the undeclared indexes of the collection that are safe to drop: those whose keys are
+    a prefix of the keys of a declared index, and those in Product.RETIRED_INDEXES.
+
+    Returns:
+        list of index names.
+    """
+    declared= [list(key) for key in Product.list_indexes()]
+    retired= [index_keys(spec) for spec in Product.RETIRED_INDEXES]
+    return [name for name, key in undeclared_indexes(collection).items()
+        if key in retired or any(index[:len(key)]== key for index in declared)]
+
+
+def drop_superseded_indexes(collection)-> list:
+    """
+    Drops the indexes of the collection listed by superseded_indexes.
+
+    Returns:
+        list of the names of the dropped indexes.
+    """
+    superseded= superseded_indexes(collection)
+    for name in superseded:
+        collection.drop_index(name)
+    return superseded
+
+
+def advise(limit: int= 20)-> list:
+    """
+    Explains the queries of the product list, for every combination of filters.
+
+    Every combination is explained twice: as the first cursor page of limit products, sorted by
+    _id, and as the unsorted query of counts and offset pages.
+
+    Returns:
+        list of reports, dicts with the filters, query ("page" or "unsorted"), the plan summary,
+        its problems, and for plans with problems, the suggested index and whether an index
+        starting with it already exists.
+    """
+    collection= Product._get_collection()
+    sample= sample_values(collection)
+    if sample is None:
+        return []
+
+    reports= []
+    for combination in filter_combinations():
+        data= ProductService.get_product_filtered(**filter_kwargs(combination, sample))
+        for query, queryset in (
+            ("page", data.order_by("id").limit(limit+ 1)),
+            ("unsorted", data),
+        ):
+            summary= plan_summary(queryset.explain())
+            report= {"filters": combination, "query": query, **summary,
+                "problems": plan_problems(summary)}
+            if report["problems"]:
+                report["suggestion"]= suggest_index(combination, query== "page")
+                report["exists"]= has_index(collection, report["suggestion"])
+            reports.append(report)
+    return reports
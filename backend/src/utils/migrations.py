@@ -0,0 +1,267 @@
+"""
+Contains the runner for versioned, resumable data migrations.
+
+A migration selects the documents it has to change with a query, and changes them either with a
+single update document (applied with update_many), or with a transform of every document (applied
+with one unordered bulk_write per batch). Documents are visited in _id order, in batches keyed by
+_id instead of skip/limit, so documents fixed by an earlier batch do not shift the later ones.
+
+After every batch, the _id of its last document is checkpointed in the migrations collection, so
+an interrupted run resumes after the last completed batch. A batch may be applied twice if the
+process dies between the write and the checkpoint, so migrations must be idempotent.
+
+Documents with a modification timestamp get a new one with every change, so conditional requests
+see migrated products as modified. After every batch of products, their cached documents are
+dropped (from the shared tier too, if there is one) and the write generation is bumped. Once a
+migration that modified products is done, the category counters are recounted from the products.
+Server processes without a shared cache tier see migrated products once their cached copies
+expire.
+"""
+
+import datetime
+import time
+
+from pymongo import UpdateOne
+from src.models.migration import MigrationState
+from src.models.product import Product
+from src.models.product_category import ProductCategory
+from src.utils.cache import product_generation, product_cache
+
+#pylint: disable=no-member
+
+
+class Migration:
+    """
+    Base class of data migrations.
+
+    Subclasses set version, name, document (the Document class whose collection is migrated),
+    and query, and implement either update or transform.
+    """
+
+    version: str= None
+    name: str= ""
+    document= None
+    query: dict= {}
+    # Fields to fetch for transform, None to fetch whole documents
+    projection: dict= None
+
+    def update(self)-> dict:
+        """
+        Returns the update document applied to every selected document, or None if the
+        migration uses transform.
+        """
+        return None
+
+    def transform(self, document: dict)-> dict:
+        """
+        Returns the update document to apply to one document, or None to leave it unchanged.
+
+        Args:
+            document: the raw document, with the fields in projection.
+        """
+        raise NotImplementedError
+
+
+class Throttle:
+    """
+    Limits the rate of operations, by sleeping until the target rate is no longer exceeded.
+    """
+
+    def __init__(self, ops_per_second: float= None):
+        """
+        Args:
+            ops_per_second: target rate, None for no limit.
+        """
+        self.ops_per_second= ops_per_second
+        self.started= time.monotonic()
+        self.ops= 0
+
+    def wait(self, ops: int):
+        """
+        Records ops operations, then sleeps as long as needed to stay at the target rate.
+        """
+        self.ops+= ops
+        if not self.ops_per_second:
+            return
+        delay= self.ops/ self.ops_per_second- (time.monotonic()- self.started)
+        if delay> 0:
+            time.sleep(delay)
+
+
+def count_categories()-> dict:
+    """
+    Counts the products and total stock of every category, with one aggregation of the products.
+
+    Returns:
+        dict of {title: (product count, total stock)}, only for titles held by products.
+    """
+    return {
+        group["_id"]: (group["products"], group["stock"])
+        for group in Product._get_collection().aggregate([
+            {"$match": {"category": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$category", "products": {"$sum": 1},
+                "stock": {"$sum": "$quantity"}}},
+        ])
+    }
+
+
+def recount_categories()-> int:
+    """
+    Sets the counters of every category from the products, in one bulk_write.
+
+    Returns:
+        int, the number of categories whose counters changed.
+    """
+    counts= count_categories()
+    collection= ProductCategory._get_collection()
+    operations= [
+        UpdateOne({"_id": category["_id"]}, {"$set": dict(zip(("product_count", "total_stock"),
+            counts.get(category["title"], (0, 0))))})
+        for category in collection.find({}, {"title": 1})
+    ]
+    if not operations:
+        return 0
+    return collection.bulk_write(operations, ordered= False).modified_count
+
+
+def stamped(migration: Migration, update: dict, now: datetime.datetime)-> dict:
+    """
+    Adds the modification timestamp to an update document, if the migrated documents have one.
+    """
+    if "modified_at" not in migration.document._fields:
+        return update
+    return {**update, "$set": {**update.get("$set", {}), "modified_at": now}}
+
+
+def get_state(migration: Migration)-> MigrationState:
+    """
+    Returns the checkpoint of a migration, creating it if the migration never ran.
+    """
+    return MigrationState.objects(version= migration.version).modify(
+        upsert= True,
+        new= True,
+        set_on_insert__name= migration.name,
+    )
+
+
+def count_pending(migration: Migration, state: MigrationState= None)-> int:
+    """
+    Counts the documents a migration would still examine, starting after its checkpoint.
+    """
+    query= dict(migration.query)
+    if state is not None and state.last_id is not None:
+        query["_id"]= {"$gt": state.last_id}
+    return migration.document._get_collection().count_documents(query)
+
+
+def apply_batch(migration: Migration, documents: list)-> int:
+    """
+    Applies a migration to one batch of documents.
+
+    Returns:
+        int, the number of documents modified.
+    """
+    collection= migration.document._get_collection()
+    now= datetime.datetime.now(datetime.timezone.utc)
+    update= migration.update()
+    if update is not None:
+        ids= [document["_id"] for document in documents]
+        modified= collection.update_many({**migration.query, "_id": {"$in": ids}},
+            stamped(migration, update, now)).modified_count
+    else:
+        operations= []
+        for document in documents:
+            changes= migration.transform(document)
+            if changes:
+                operations.append(UpdateOne({"_id": document["_id"]},
+                    stamped(migration, changes, now)))
+        modified= collection.bulk_write(operations, ordered= False).modified_count \
+            if operations else 0
+
+    if modified and migration.document is Product:
+        product_generation.bump()
+        for document in documents:
+            product_cache.delete(str(document["_id"]))
+    return modified
+
+
+def run_migration(migration: Migration, batch_size: int= 1000, ops_per_second: float= None,
+    dry_run: bool= False, on_progress= None)-> dict:
+    """
+    Runs a migration to completion, resuming from its checkpoint.
+
+    Args:
+        migration: the migration to run.
+        batch_size: number of documents per batch.
+        ops_per_second: maximum number of documents written per second, None for no limit.
+        dry_run: if True, only counts the documents that would be examined, without writing.
+        on_progress: optional function called with the checkpoint after every batch.
+
+    Returns:
+        dict of the form {"version", "name", "status", "pending"} for a dry run, or
+        {"version", "name", "status", "processed", "modified"} otherwise.
+    """
+    report= {"version": migration.version, "name": migration.name}
+
+    if dry_run:
+        state= MigrationState.objects(version= migration.version).first()
+        if state is not None and state.status== "done":
+            return {**report, "status": "done", "pending": 0}
+        return {**report, "status": "pending", "pending": count_pending(migration, state)}
+
+    state= get_state(migration)
+    if state.status== "done":
+        return {**report, "status": "done", "processed": state.processed, "modified": state.modified}
+
+    collection= migration.document._get_collection()
+    # Only the _id is needed when the same update is applied to every document
+    projection= {"_id": 1} if migration.update() is not None else migration.projection
+    throttle= Throttle(ops_per_second)
+
+    while True:
+        query= dict(migration.query)
+        if state.last_id is not None:
+            query["_id"]= {"$gt": state.last_id}
+        documents= list(collection.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not documents:
+            break
+
+        modified= apply_batch(migration, documents)
+        state= MigrationState.objects(version= migration.version).modify(
+            new= True,
+            set__last_id= documents[-1]["_id"],
+            inc__processed= len(documents),
+            inc__modified= modified,
+        )
+        if on_progress:
+            on_progress(state)
+        throttle.wait(len(documents))
+
+    if migration.document is Product and state.modified:
+        recount_categories()
+    state= MigrationState.objects(version= migration.version).modify(
+        new= True,
+        set__status= "done",
+        set__finished_at= datetime.datetime.now(datetime.timezone.utc),
+    )
+    return {**report, "status": "done", "processed": state.processed, "modified": state.modified}
+
+
+def run_migrations(migrations: list, target: str= None, **options)-> list:
+    """
+    Runs migrations in version order, up to and including the target version.
+
+    Args:
+        migrations: list of Migration instances.
+        target: the last version to run, None to run all.
+        options: passed on to run_migration.
+
+    Returns:
+        list of the reports of run_migration, one per migration run.
+    """
+    reports= []
+    for migration in sorted(migrations, key= lambda migration: migration.version):
+        if target is not None and migration.version> target:
+            break
+        reports.append(run_migration(migration, **options))
+    return reports
@@ -0,0 +1,326 @@
+"""
+Contains all logic for keyset (cursor) pagination over mongoengine querysets, collections, and
+aggregation pipelines.
+
+A cursor is an opaque, url-safe token that encodes the sort key values of the last item of a
+page, always ending with the item's _id as a tiebreaker, along with the sort they were taken
+for, so a cursor is never replayed under another sort. The next page is then fetched with a
+range condition on the sort key instead of a skip, so every page costs one index seek no matter
+how deep it is.
+"""
+
+import base64
+import binascii
+
+from bson import json_util
+
+DEFAULT_SORT= [("id", 1)]
+# Relevance score of a text search, under the name mongoengine gives it
+TEXT_SCORE_FIELD= "_text_score"
+SEARCH_SORT= [(TEXT_SCORE_FIELD, -1), ("id", 1)]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor token cannot be decoded, or does not match the requested sort."""
+
+
+def db_field(field: str)-> str:
+    """
+    Converts a mongoengine field name to the name used in the database document.
+    """
+    return "_id" if field in ("id", "pk") else field
+
+
+def with_tiebreaker(sort: list)-> list:
+    """
+    Appends the _id tiebreaker to a sort specification, if it does not already end with it.
+
+    The tiebreaker goes in the direction of the first key, so a sort and the same sort in the
+    opposite directions are both served by one index (read backwards for the latter).
+
+    Args:
+        sort: list of (field, direction) tuples, direction being 1 or -1.
+
+    Returns:
+        list of (field, direction) tuples, guaranteed to end with the id field.
+    """
+    if sort and db_field(sort[-1][0])== "_id":
+        return list(sort)
+    sort= [(field, direction) for field, direction in sort if db_field(field)!= "_id"]
+    return sort+ [("id", sort[0][1] if sort else 1)]
+
+
+def parse_sort(value: str, sorts: tuple)-> list:
+    """
+    Parses the value of a 'sort' query parameter.
+
+    Only the declared sorts, and the same sorts in the opposite directions, are accepted, so
+    every sort is served by an index, and never done in memory. A sort that is the beginning of
+    a declared sort is completed to it, as the index of the declared sort serves it in that
+    order only.
+
+    Args:
+        value: comma separated field names, each prefixed with '-' for descending order, such
+            as "price,-created_at". An empty string means the default sort.
+        sorts: the declared sorts, tuples of field names in the same notation.
+
+    Returns:
+        list of (field, direction) tuples, or None for the default sort.
+
+    Raises:
+        ValueError: If the sort is not one of the declared sorts.
+    """
+    keys= tuple(key.strip().lstrip("+") for key in value.split(",") if key.strip())
+    if not keys:
+        return None
+
+    opposite= lambda declared: tuple(key[1:] if key.startswith("-") else f"-{key}"
+        for key in declared)
+    candidates= [candidate for declared in sorts for candidate in (declared, opposite(declared))]
+    matches= [candidate for candidate in candidates if candidate== keys] or \
+        [candidate for candidate in candidates if candidate[:len(keys)]== keys]
+    if not matches:
+        raise ValueError(f"'{value}' is not a supported sort, choose from " \
+            f"{', '.join(','.join(candidate) for candidate in candidates)}")
+    return [(key.lstrip("-"), -1 if key.startswith("-") else 1) for key in matches[0]]
+
+
+def order_by_keys(sort: list)-> list:
+    """
+    Converts a sort specification to the keys accepted by QuerySet.order_by.
+    """
+    return [f"{'+' if direction> 0 else '-'}{field}" for field, direction in sort]
+
+
+def sort_signature(sort: list)-> str:
+    """
+    Names a sort specification, e.g. "quantity,_id" or "-price,created_at,-_id".
+    """
+    return ",".join(f"{'-' if direction< 0 else ''}{db_field(field)}" for field, direction in sort)
+
+
+def encode_cursor(values: list, sort: list)-> str:
+    """
+    Encodes the sort key values of an item into an opaque cursor token.
+
+    Values are serialized as MongoDB extended JSON, so ObjectId and datetime values survive
+    the round trip with their types intact. The token is of the form
+    {"s": <sort signature>, "v": [<values>]}.
+
+    Args:
+        values: list of sort key values, in the order of the sort specification.
+        sort: the sort specification (with tiebreaker) the values were taken for.
+
+    Returns:
+        str, url-safe base64 token without padding.
+    """
+    raw= json_util.dumps({"s": sort_signature(sort), "v": values},
+        json_options= json_util.CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: list)-> list:
+    """
+    Decodes a cursor token created by encode_cursor.
+
+    Args:
+        token: the cursor token received in the request.
+        sort: the sort specification (with tiebreaker) the cursor must match.
+
+    Returns:
+        list of sort key values.
+
+    Raises:
+        InvalidCursorError: If the token is malformed, or was made for a different sort.
+    """
+    try:
+        raw= base64.urlsafe_b64decode(token+ "="* (-len(token)% 4))
+        cursor= json_util.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursorError("Cursor token could not be decoded.") from e
+
+    if not isinstance(cursor, dict) or not isinstance(cursor.get("v"), list):
+        raise InvalidCursorError("Cursor token could not be decoded.")
+    if cursor.get("s")!= sort_signature(sort) or len(cursor["v"])!= len(sort):
+        raise InvalidCursorError("Cursor token does not match the requested sort order.")
+    return cursor["v"]
+
+
+def cursor_values(item, sort: list)-> list:
+    """
+    Extracts the sort key values from an item of a page.
+
+    Args:
+        item: a Document instance, or a raw document (dict) as returned by as_pymongo().
+        sort: the sort specification (with tiebreaker).
+
+    Returns:
+        list of sort key values, in the order of the sort specification.
+    """
+    if isinstance(item, dict):
+        return [item.get(db_field(field)) for field, _ in sort]
+    return [getattr(item, "pk" if db_field(field)== "_id" else field) for field, _ in sort]
+
+
+def keyset_filter(sort: list, values: list)-> dict:
+    """
+    Builds the raw MongoDB filter selecting the items strictly after the given key values.
+
+    For a sort (a, b, _id) this is equivalent to the tuple comparison (a, b, _id) > values,
+    expanded as: a > va OR (a == va AND b > vb) OR (a == va AND b == vb AND _id > vid), with
+    the comparison operators flipped for descending fields.
+
+    Args:
+        sort: the sort specification (with tiebreaker).
+        values: the sort key values of the last item of the previous page.
+
+    Returns:
+        dict, raw query to be used with QuerySet.filter(__raw__= ...).
+    """
+    clauses= []
+    for position, (field, direction) in enumerate(sort):
+        clause= {db_field(prev_field): values[i] for i, (prev_field, _) in enumerate(sort[:position])}
+        clause[db_field(field)]= {"$gt" if direction> 0 else "$lt": values[position]}
+        clauses.append(clause)
+
+    return clauses[0] if len(clauses)== 1 else {"$or": clauses}
+
+
+def keyset_page(queryset, limit: int, cursor: str= None, sort: list= None):
+    """
+    Fetches one page of a queryset using keyset pagination.
+
+    One extra item is requested to find out if a next page exists, without counting.
+
+    Args:
+        queryset: the (filtered) mongoengine QuerySet to paginate.
+        limit: the maximum number of items in the page.
+        cursor: the cursor token of the previous page, None for the first page.
+        sort: list of (field, direction) tuples, defaults to sorting by id.
+
+    Returns:
+        tuple (items, next_cursor), next_cursor being None on the last page.
+
+    Raises:
+        InvalidCursorError: If the cursor token is invalid.
+    """
+    sort= with_tiebreaker(sort or DEFAULT_SORT)
+
+    if queryset._loaded_fields:
+        # The sort key of the last item makes the next cursor, so it is never projected away
+        queryset= queryset.only(*[field for field, _ in sort])
+    if cursor:
+        queryset= queryset.filter(__raw__= keyset_filter(sort, decode_cursor(cursor, sort)))
+
+    items= list(queryset.order_by(*order_by_keys(sort))[:limit+ 1])
+    return page_result(items, limit, sort)
+
+
+def page_result(items: list, limit: int, sort: list)-> tuple:
+    """
+    Splits the limit+ 1 items fetched for a page into the page and the cursor of the next page.
+
+    Args:
+        items: the items fetched, at most limit+ 1.
+        limit: the maximum number of items in the page.
+        sort: the sort specification (with tiebreaker).
+
+    Returns:
+        tuple (items, next_cursor), next_cursor being None on the last page.
+    """
+    if len(items)<= limit:
+        return items, None
+
+    items= items[:limit]
+    return items, encode_cursor(cursor_values(items[-1], sort), sort)
+
+
+def keyset_stages(sort: list, limit: int, cursor: str= None, projection: dict= None)-> list:
+    """
+    Builds the aggregation stages that select one page of the documents of a pipeline.
+
+    This is how pages are fetched when the sort key is computed by the pipeline (such as the
+    relevance score of a text search), so it cannot be filtered on with find.
+
+    Args:
+        sort: the sort specification (with tiebreaker).
+        limit: the maximum number of documents in the page.
+        cursor: the cursor token of the previous page, None for the first page.
+        projection: raw inclusion projection of the documents, None to keep all fields. The
+            fields of the sort key are always kept, to build the next cursor.
+
+    Returns:
+        list of stages, to be appended to the pipeline.
+
+    Raises:
+        InvalidCursorError: If the cursor token is invalid.
+    """
+    stages= []
+    if cursor:
+        stages.append({"$match": keyset_filter(sort, decode_cursor(cursor, sort))})
+    stages.append({"$sort": {db_field(field): direction for field, direction in sort}})
+    stages.append({"$limit": limit+ 1})
+    if projection:
+        stages.append({"$project": {**projection, **{db_field(field): True for field, _ in sort}}})
+    return stages
+
+
+def aggregate_keyset_page(collection, pipeline: list, limit: int, cursor: str= None,
+    sort: list= None, projection: dict= None):
+    """
+    Fetches one page of the documents of an aggregation pipeline using keyset pagination.
+
+    Args:
+        collection: the pymongo Collection to aggregate.
+        pipeline: the stages producing the documents to paginate, with their sort key.
+        limit: the maximum number of documents in the page.
+        cursor: the cursor token of the previous page, None for the first page.
+        sort: list of (field, direction) tuples, defaults to sorting by id.
+        projection: raw inclusion projection of the documents, None to keep all fields.
+
+    Returns:
+        tuple (documents, next_cursor), next_cursor being None on the last page.
+
+    Raises:
+        InvalidCursorError: If the cursor token is invalid.
+    """
+    sort= with_tiebreaker(sort or DEFAULT_SORT)
+    documents= list(collection.aggregate(pipeline+ keyset_stages(sort, limit, cursor, projection)))
+    return page_result(documents, limit, sort)
+
+
+async def async_keyset_page(collection, query: dict, limit: int, cursor: str= None,
+    sort: list= None, projection: dict= None):
+    """
+    Fetches one page of a collection using keyset pagination, with an async driver.
+
+    This is keyset_page for the async views, working on raw documents of a pymongo
+    AsyncCollection instead of a QuerySet.
+
+    Args:
+        collection: the AsyncCollection to paginate.
+        query: raw filter of the documents to paginate.
+        limit: the maximum number of documents in the page.
+        cursor: the cursor token of the previous page, None for the first page.
+        sort: list of (field, direction) tuples, defaults to sorting by id.
+        projection: raw inclusion projection of the documents, None to fetch whole documents.
+            The fields of the sort key are always kept, to build the next cursor.
+
+    Returns:
+        tuple (documents, next_cursor), next_cursor being None on the last page.
+
+    Raises:
+        InvalidCursorError: If the cursor token is invalid.
+    """
+    sort= with_tiebreaker(sort or DEFAULT_SORT)
+
+    if cursor:
+        after= keyset_filter(sort, decode_cursor(cursor, sort))
+        query= {"$and": [query, after]} if query else after
+    if projection:
+        projection= {**projection, **{db_field(field): True for field, _ in sort}}
+
+    documents= await collection.find(query, projection) \
+        .sort([(db_field(field), direction) for field, direction in sort]) \
+        .limit(limit+ 1).to_list()
+    return page_result(documents, limit, sort)
@@ -0,0 +1,51 @@
+"""
+Contains all logic for sparse fieldsets, i.e., the 'fields' query parameter.
+
+The requested fields are turned into a server-side projection (QuerySet.only), so fields that
+are not needed are neither sent over the network by MongoDB, nor decoded and rendered here.
+The id of a product is always included.
+"""
+
+PROJECTABLE_FIELDS= (
+    "id",
+    "name",
+    "price",
+    "brand",
+    "quantity",
+    "description",
+    "category",
+    "created_at",
+    "modified_at",
+)
+
+
+def parse_fields(value: str)-> list:
+    """
+    Parses the value of a 'fields' query parameter.
+
+    Args:
+        value: comma separated field names, such as "name,price,quantity". An empty string
+        means that all fields are requested.
+
+    Returns:
+        list of field names to project on, without duplicates, or None if all fields are
+        requested. The id field is implied, so it is only part of the list if it is the
+        only field requested.
+
+    Raises:
+        ValueError: If a field name is not one of PROJECTABLE_FIELDS.
+    """
+    fields= []
+    for field in value.split(","):
+        field= field.strip()
+        if field== "":
+            continue
+        if field not in PROJECTABLE_FIELDS:
+            raise ValueError(f"'{field}' is not a valid field, choose from " \
+                f"{', '.join(PROJECTABLE_FIELDS)}")
+        if field not in fields:
+            fields.append(field)
+
+    if not fields:
+        return None
+    return [field for field in fields if field!= "id"] or ["id"]
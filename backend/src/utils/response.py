@@ -0,0 +1,61 @@
+"""
+Contains all logic for rendering JSON response payloads.
+
+Documents and querysets are serialized straight into response bytes with orjson, in a single
+pass. The output has the same shape as mongoengine's to_json(), i.e., BSON types are written in
+MongoDB extended JSON (legacy mode): ObjectId as {"$oid": <str>}, and datetime as
+{"$date": <milliseconds since epoch>}.
+"""
+
+import orjson
+from bson import json_util
+from django.http import HttpResponse
+from mongoengine.base import BaseDocument
+from mongoengine.queryset import QuerySet
+
+_OPTIONS= orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(obj):
+    """
+    Converts the objects orjson cannot serialize by itself.
+
+    Called by orjson for every object of an unsupported type, and for datetime objects.
+    """
+    if isinstance(obj, BaseDocument):
+        return obj.to_mongo()
+    if isinstance(obj, QuerySet):
+        return list(obj.as_pymongo())
+    return json_util.default(obj, json_options= json_util.LEGACY_JSON_OPTIONS)
+
+
+def dumps(payload)-> bytes:
+    """
+    Serializes a payload to JSON bytes.
+
+    Args:
+        payload: any JSON serializable object, that can also contain Documents, QuerySets, and
+        BSON types such as ObjectId and datetime, at any depth.
+
+    Returns:
+        bytes, the UTF-8 encoded JSON representation of the payload.
+    """
+    return orjson.dumps(payload, default= _default, option= _OPTIONS)
+
+
+def json_response(payload, status: int= 200)-> HttpResponse:
+    """
+    Creates an HttpResponse object with a JSON payload.
+
+    This is to be used instead of JsonResponse whenever the payload contains Documents,
+    QuerySets, or raw documents fetched from the database, so they are not encoded to JSON,
+    parsed back, and then encoded again.
+
+    Args:
+        payload: As accepted by dumps.
+        status: The status code of the response.
+
+    Returns:
+        HttpResponse instance with the JSON payload.
+    """
+    return HttpResponse(dumps(payload), content_type= "application/json", status= status)
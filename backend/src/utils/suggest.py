@@ -0,0 +1,206 @@
+"""
+Contains the in-memory prefix index behind product name suggestions (autocomplete).
+
+Names are normalized (case folded, accents removed, whitespace collapsed) and kept in a sorted
+array, so the names starting with a prefix are found with two binary searches, as a contiguous
+range. The best matches of a range are those with the most stock. Short prefixes match large
+ranges, so their top matches are cached, and only the cached prefixes of a changed name are
+dropped on writes.
+
+The index lives in the memory of one process: it is built from one projected scan of the
+products, kept current by the writes of this process, and rebuilt once it is older than
+max_age, to pick up the writes of other processes.
+"""
+
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Ranges longer than this are ranked once, and the result cached by prefix
+SCAN_LIMIT= 256
+
+
+def normalize(text: str)-> str:
+    """
+    Normalizes a name or a prefix for matching: accents removed, case folded, and runs of
+    whitespace collapsed into one space.
+    """
+    decomposed= unicodedata.normalize("NFKD", text)
+    stripped= "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+class PrefixIndex:
+    """
+    A sorted array of normalized names, answering prefix queries with the top matches by stock.
+    """
+
+    def __init__(self, max_results: int= 50, max_age: float= 600, cached_prefixes: int= 4096):
+        """
+        Args:
+            max_results: the most matches a query can ask for, and the number of top matches
+                cached for a prefix.
+            max_age: seconds after which the index is to be rebuilt.
+            cached_prefixes: maximum number of prefixes whose top matches are cached.
+        """
+        self.max_results= max_results
+        self.max_age= max_age
+        self.cached_prefixes= cached_prefixes
+        self.built_at= None
+        # Sorted (normalized name, id) keys, and (key, name, quantity) by id
+        self._keys= []
+        self._entries= {}
+        self._top= OrderedDict()
+        self._lock= threading.Lock()
+
+    @property
+    def built(self)-> bool:
+        return self.built_at is not None
+
+    def is_stale(self)-> bool:
+        """
+        Checks if the index was never built, or is older than max_age.
+        """
+        return self.built_at is None or time.monotonic()- self.built_at> self.max_age
+
+    def claim_rebuild(self)-> bool:
+        """
+        Checks if a built index is older than max_age, and if so, marks it as fresh again, so
+        only the caller rebuilds it.
+        """
+        with self._lock:
+            if not self.built or not self.is_stale():
+                return False
+            self.built_at= time.monotonic()
+            return True
+
+    def build(self, documents):
+        """
+        Replaces the contents of the index.
+
+        Args:
+            documents: iterable of raw documents, with _id, name, and quantity.
+        """
+        entries= {}
+        for document in documents:
+            name= document.get("name")
+            if name:
+                key= (normalize(name), document["_id"])
+                entries[document["_id"]]= (key, name, document.get("quantity") or 0)
+        keys= sorted(entry[0] for entry in entries.values())
+
+        with self._lock:
+            self._keys, self._entries= keys, entries
+            self._top.clear()
+            self.built_at= time.monotonic()
+
+    def update(self, product_id, name: str= None, quantity: int= None):
+        """
+        Adds or changes the entry of a product, after it was written.
+
+        Only the changed fields need to be given. A product that is not indexed yet is only
+        added if its name is given. Nothing is done if the index was never built.
+        """
+        if not self.built:
+            return
+        with self._lock:
+            entry= self._entries.get(product_id)
+            if entry is None:
+                if not name:
+                    return
+                old_key, old_quantity= None, 0
+            else:
+                old_key, old_name, old_quantity= entry
+                name= name or old_name
+
+            key= (normalize(name), product_id)
+            quantity= old_quantity if quantity is None else quantity
+            if old_key!= key:
+                if old_key is not None:
+                    del self._keys[bisect.bisect_left(self._keys, old_key)]
+                bisect.insort(self._keys, key)
+            self._entries[product_id]= (key, name, quantity)
+            self._forget(old_key, key)
+
+    def add_many(self, products: list):
+        """
+        Adds the entries of many new products at once, with a single sort.
+
+        Args:
+            products: list of (id, name, quantity) tuples.
+        """
+        if not self.built or not products:
+            return
+        with self._lock:
+            for product_id, name, quantity in products:
+                if name and product_id not in self._entries:
+                    key= (normalize(name), product_id)
+                    self._entries[product_id]= (key, name, quantity or 0)
+                    self._keys.append(key)
+            self._keys.sort()
+            self._top.clear()
+
+    def remove(self, product_id):
+        """
+        Removes the entry of a deleted product, if it is indexed.
+        """
+        if not self.built:
+            return
+        with self._lock:
+            entry= self._entries.pop(product_id, None)
+            if entry is not None:
+                del self._keys[bisect.bisect_left(self._keys, entry[0])]
+                self._forget(entry[0])
+
+    def query(self, prefix: str, limit: int= 10)-> list:
+        """
+        Finds the products whose normalized name starts with the normalized prefix.
+
+        Args:
+            prefix: the start of the name, as typed.
+            limit: the maximum number of matches, at most max_results.
+
+        Returns:
+            list of (id, name, quantity) tuples, the ones with the most stock first.
+        """
+        prefix= normalize(prefix)
+        limit= min(limit, self.max_results)
+        with self._lock:
+            top= self._top.get(prefix)
+            if top is not None:
+                self._top.move_to_end(prefix)
+                return top[:limit]
+
+            start= bisect.bisect_left(self._keys, (prefix,))
+            end= bisect.bisect_left(self._keys, (prefix+ "\U0010ffff",), start)
+            # Ties are kept in key order, i.e., alphabetical
+            ranked= heapq.nlargest(
+                limit if end- start<= SCAN_LIMIT else self.max_results,
+                (self._entries[self._keys[i][1]] for i in range(start, end)),
+                key= lambda entry: entry[2],
+            )
+            top= [(key[1], name, quantity) for key, name, quantity in ranked]
+            if end- start> SCAN_LIMIT:
+                self._top[prefix]= top
+                while len(self._top)> self.cached_prefixes:
+                    self._top.popitem(last= False)
+            return top[:limit]
+
+    def _forget(self, *keys):
+        """
+        Drops the cached top matches of every prefix of the given keys.
+        """
+        for key in keys:
+            if key is not None:
+                for length in range(len(key[0])+ 1):
+                    self._top.pop(key[0][:length], None)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# Suggestions of product names, kept current by the writes to the products
+product_suggestions= PrefixIndex()
@@ -1,8 +1,62 @@
 from src.models.product_category import ProductCategory
-from mongoengine.errors import ValidationError, DoesNotExist
+from src.utils.cache import TTLCache
+from mongoengine.errors import ValidationError
 
 #pylint: disable=no-member
 
+# Titles of all categories, loaded at startup, and reloaded when categories are written,
+# or at the latest every 5 minutes (for categories written by other processes)
+CATEGORY_TITLES= TTLCache(ttl= 300, max_size= 1)
+
+
+def load_category_titles()-> frozenset:
+    """
+    Loads the titles of all categories into the category title cache, in one query.
+
+    Returns:
+        frozenset of all category titles.
+    """
+    titles= frozenset(ProductCategory.objects.distinct("title"))
+    CATEGORY_TITLES.set("titles", titles)
+    return titles
+
+
+def get_category_titles()-> frozenset:
+    """
+    Returns the titles of all categories, from the cache if possible.
+    """
+    titles= CATEGORY_TITLES.get("titles")
+    if titles is None:
+        titles= load_category_titles()
+    return titles
+
+
+def invalidate_category_titles():
+    """
+    Empties the category title cache. To be called whenever a category is written.
+    """
+    CATEGORY_TITLES.clear()
+
+
+def find_unknown_categories(category_titles)-> set:
+    """
+    Finds the titles that do not correspond to any category in the database.
+
+    Titles are checked against the category title cache. If some are not found, the cache is
+    reloaded once (as they may have been created by another process), so at most one query
+    is made for any number of titles.
+
+    Args:
+        - category_titles: iterable of category titles
+    Returns:
+        set of the titles that are not in the database.
+    """
+    unknown= set(category_titles)- get_category_titles()
+    if unknown:
+        unknown-= load_category_titles()
+    return unknown
+
+
 def validate_category(category_title: str):
     """
     Validates if the input string is a valid category title.
@@ -15,7 +69,5 @@ def validate_category(category_title: str):
     """
     if not isinstance(category_title, str):
         raise ValidationError("Category title must be a string.")
-    try:
-        ProductCategory.objects.get(title= category_title)
-    except DoesNotExist as e:
-        raise ValidationError("Category does not exist in the database.") from e
\ No newline at end of file
+    if find_unknown_categories([category_title]):
+        raise ValidationError("Category does not exist in the database.")
@@ -3,6 +3,12 @@ WSGI config for backend project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+Run it with e.g.
+
+    gunicorn src.wsgi:application --workers 4 --threads 8
+
+gunicorn.conf.py fills the connection pool of every worker once it has started.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
@@ -10,7 +16,9 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from src.db.db_init import init_db
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.settings")
 
+init_db()
 application = get_wsgi_application()